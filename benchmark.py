@@ -0,0 +1,765 @@
+"""
+Teljesítménymérések a projekt egyes lépéseihez, szintetikus, a KSH táblázat szerkezetét követő adatokon.
+Futtatás például: python benchmark.py load --rows 2000000
+A teljes folyamat lépésenkénti mérése, JSON kimenettel és két mérés összehasonlításával:
+python benchmark.py pipeline --rows 35 100000 10000000 --json eredmeny.json
+python benchmark.py compare regi.json uj.json
+A tárolt eredmények mentése és betöltése pickle-lel és a serialization modullal:
+python benchmark.py serialize --rows 2000000
+Nagy sorozatok ritkításának sebessége és a kép hűsége a teljes felbontáshoz képest:
+python benchmark.py downsample --rows 10000 1000000
+A Gantt-diagram rajzolása soronkénti barh hívásokkal, egyetlen barh hívással és a gantdiagramm modullal:
+python benchmark.py gantt --tasks 1000 10000 50000
+Az importálási idő ellenőrzése (hiba esetén 1-es kilépési kóddal, pl. CI-ban):
+python benchmark.py imports --max-seconds 0.5
+"""
+import argparse
+import cProfile
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from itertools import cycle, islice
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+import datasets
+import derived
+import ksh_data
+
+try:
+    import resource  # csak Unix rendszereken érhető el, a memóriacsúcs méréséhez
+except ImportError:
+    resource = None
+
+
+def make_synthetic_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    A gyorsítótárba kerülő táblázattal (ksh_data.cleanup és a származtatott mutatók) azonos szerkezetű,
+    véletlen adatokkal feltöltött DataFrame
+    :param n_rows: a sorok száma
+    :param seed: seed a véletlenszám-generátor számára
+    :return: a szintetikus DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    year_start = 1990 + np.arange(n_rows, dtype=np.int64)  # minden sor egy újabb tanév
+    df = pd.DataFrame({
+        "school_year": [f"{year}/{year + 1}" for year in year_start],
+        "school_number": rng.integers(3_000, 4_000, n_rows),
+        "classroom_number": rng.integers(40_000, 50_000, n_rows),
+        "number_of_teachers": rng.integers(70_000, 90_000, n_rows),
+        "number_of_students": rng.integers(700_000, 1_200_000, n_rows),
+        "year_start": year_start,
+        "year_end": year_start + 1,
+    })
+    return derived.add_derived_metrics(df, datasets.get_dataset(datasets.DEFAULT_DATASET)["derived"])
+
+
+def drop_file_cache(path: str) -> None:
+    """
+    A file (vagy egy könyvtár összes file-jának) kiürítése az operációs rendszer lap-gyorsítótárából,
+    így a következő olvasás valóban a lemezről történik. Ahol ez nem támogatott, nem csinál semmit.
+    :param path: file vagy könyvtár elérési útja
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return  # pl. Windows alatt nincs ilyen lehetőség
+    paths = [path]
+    if os.path.isdir(path):
+        paths = [os.path.join(path, file_name) for file_name in os.listdir(path)]
+    for file_path in paths:
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def time_call(func, *args) -> float:
+    """
+    Egy függvényhívás időtartamának mérése
+    :param func: a meghívandó függvény
+    :param args: a függvény paraméterei
+    :return: az eltelt idő másodpercben
+    """
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def bench_load(n_rows: int, repeat: int = 3) -> list[dict]:
+    """
+    A csv és a bináris (npy) gyorsítótár betöltési idejének összehasonlítása hideg és meleg lap-gyorsítótárral.
+    A "load" csak a betöltést, a "load+scan" a betöltést és egy numerikus oszlop végigolvasását méri,
+    mert a memory-mappelt oszlopok csak használatkor kerülnek ténylegesen beolvasásra.
+    :param n_rows: a szintetikus táblázat sorainak száma
+    :param repeat: a meleg mérések ismétlésszáma, ezek közül a legjobb számít
+    :return: a mérési eredmények listája
+    """
+    df = make_synthetic_frame(n_rows)
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        name = os.path.join(temp_dir, "school")
+        ksh_data.save_content_as_csv(df, name)
+        ksh_data.save_content_as_npy(df, name)
+        formats = {
+            "csv": (ksh_data.load_csv, ksh_data.get_full_file_name(name, "csv")),
+            "npy": (ksh_data.load_npy, ksh_data.get_full_file_name(name, ksh_data.CACHE_EXTENSION)),
+        }
+        for format_name, (load, path) in formats.items():
+            def load_and_scan():
+                return load(name)["number_of_students"].sum()
+
+            for mode, func in (("load", lambda: load(name)), ("load+scan", load_and_scan)):
+                drop_file_cache(path)
+                cold = time_call(func)  # az első olvasás a lemezről
+                warm = min(time_call(func) for _ in range(repeat))  # ismételt olvasás a lap-gyorsítótárból
+                results.append({"format": format_name, "mode": mode, "rows": n_rows, "cold_s": cold, "warm_s": warm})
+    return results
+
+
+def bench_serialization(n_rows: int, repeat: int = 3) -> list[dict]:
+    """
+    A pickle és a serialization modul összehasonlítása a tárolt eredményeken (tisztított adatok, együtthatók,
+    predikciók). A "load" a teljes objektumot, a "load+scan" ezen felül egy oszlop végigolvasását, a "load key"
+    csak az együttható-táblázatot tölti be. A serialization mérései ellenőrzőösszeg-vizsgálattal és anélkül is
+    lefutnak. Mindegyik mérés meleg lap-gyorsítótárral, a legjobb ismétlés számít.
+    :param n_rows: a szintetikus táblázat sorainak száma
+    :param repeat: az ismétlések száma
+    :return: a mérési eredmények listája
+    """
+    import pickle
+
+    import models
+    import serialization
+
+    data = make_synthetic_frame(n_rows)
+    coefficients = models.fit_linear_models(data, "year_start")
+    artifacts = {"data": data, "coefficients": coefficients,
+                 "predictions": models.predict_linear_models(coefficients, data["year_start"])}
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pickle_name = os.path.join(temp_dir, "artifacts.pickle")
+        container_name = os.path.join(temp_dir, f"artifacts.{serialization.EXTENSION}")
+
+        def pickle_save():
+            with open(pickle_name, "wb") as f:
+                pickle.dump(artifacts, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        def pickle_load():
+            with open(pickle_name, "rb") as f:
+                return pickle.load(f)
+
+        formats = {
+            "pickle": (pickle_save, pickle_load, lambda: pickle_load()["coefficients"], pickle_name),
+            "container": (lambda: serialization.save(artifacts, container_name),
+                          lambda: serialization.load(container_name),
+                          lambda: serialization.load(container_name, "coefficients"), container_name),
+            "container (no verify)": (lambda: serialization.save(artifacts, container_name),
+                                      lambda: serialization.load(container_name, verify=False),
+                                      lambda: serialization.load(container_name, "coefficients", verify=False),
+                                      container_name),
+        }
+        for format_name, (save, load, load_key, path) in formats.items():
+            timings = {"save": save, "load": load, "load+scan": lambda: load()["data"]["number_of_students"].sum(),
+                       "load key": load_key}
+            for mode, func in timings.items():
+                seconds = min(time_call(func) for _ in range(repeat))
+                results.append({"format": format_name, "mode": mode, "rows": n_rows, "seconds": seconds,
+                                "bytes": os.path.getsize(path)})
+    return results
+
+
+def make_long_series(n_rows: int, seed: int = 0) -> tuple[np.ndarray, pd.DataFrame]:
+    """
+    Hosszú, havi vagy területi bontású idősorokat utánzó adat: véletlen bolyongás ritka, egyetlen pontos csúcsokkal,
+    amelyeknek a ritkítás után is látszaniuk kell
+    :param n_rows: a pontok száma
+    :param seed: seed a véletlenszám-generátor számára
+    :return: (x értékek, két oszlopos DataFrame) pár
+    """
+    rng = np.random.default_rng(seed)
+    walk = np.cumsum(rng.normal(0, 1, (n_rows, 2)), axis=0)
+    spikes = rng.choice(n_rows, size=max(n_rows // 100_000, 3), replace=False)
+    walk[spikes, 0] += 50 * walk[:, 0].std()  # kiugró értékek az első oszlopban
+    return np.arange(n_rows, dtype=np.float64), pd.DataFrame(walk, columns=["first", "second"])
+
+
+def render_pixels(fig) -> np.ndarray:
+    """
+    Egy diagram kirajzolása a memóriába és bezárása
+    :param fig: a diagram
+    :return: a kép RGB képpontjai
+    """
+    import matplotlib.pyplot as plt
+
+    fig.canvas.draw()
+    pixels = np.asarray(fig.canvas.buffer_rgba())[..., :3].copy()
+    plt.close(fig)
+    return pixels
+
+
+def bench_downsample(row_counts: list[int], repeat: int = 3) -> list[dict]:
+    """
+    A nagy sorozatok ritkításának mérése: a vonaldiagram elkészítésének és kirajzolásának ideje ritkítás nélkül és a
+    diagrams.DOWNSAMPLE_METHODS módszereivel, valamint a kép hűsége a teljes felbontású képhez képest.
+    A pixel_diff az eltérő képpontok aránya a két kép valamelyikén rajzolt (nem fehér) képpontok között,
+    a peaks_kept pedig azt mutatja, hogy az összes kiugró érték (és a szélsőértékek) megmaradt-e.
+    :param row_counts: a mérendő pontszámok
+    :param repeat: az ismétlések száma, a legjobb számít
+    :return: a mérési eredmények listája
+    """
+    import diagrams
+
+    diagrams.use_batch_backend()
+    results = []
+    for n_rows in row_counts:
+        x_values, y_columns = make_long_series(n_rows)
+        reference = None
+        for method in (None,) + diagrams.DOWNSAMPLE_METHODS:
+            def draw():
+                return diagrams.draw_line_diagram(x_values, y_columns, x_label="x", y_label="y", downsample=method)
+
+            seconds = min(time_call(lambda: render_pixels(draw())) for _ in range(repeat))
+            fig = draw()
+            kept = fig.axes[0].lines[0].get_ydata()  # az első oszlop ténylegesen kirajzolt pontjai
+            pixels = render_pixels(fig)
+            if reference is None:
+                reference = pixels  # a teljes felbontású kép
+            changed = np.abs(pixels.astype(np.int16) - reference).max(axis=-1) > 48
+            ink = (pixels.min(axis=-1) < 200) | (reference.min(axis=-1) < 200)
+            column = y_columns["first"].to_numpy()
+            extremes = {column.max(), column.min()} | set(column[column > column.mean() + 10 * column.std()])
+            results.append({"rows": n_rows, "method": method or "full", "seconds": seconds, "points": len(kept),
+                            "pixel_diff": changed.sum() / max(ink.sum(), 1), "peaks_kept": extremes <= set(kept)})
+    return results
+
+
+def make_spans(n_tasks: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Futási naplót utánzó feladatok: egy nap alatt induló, néhány másodperctől egy óráig tartó lépések,
+    a lépésnevek tizedével, így egy sorba több futás is kerül
+    :param n_tasks: a feladatok száma
+    :param seed: seed a véletlenszám-generátor számára
+    :return: DataFrame Task, Start, End és Group oszlopokkal
+    """
+    rng = np.random.default_rng(seed)
+    starts = pd.Timestamp("2024-11-01") + pd.to_timedelta(np.sort(rng.uniform(0, 86_400, n_tasks)), unit="s")
+    durations = pd.to_timedelta(rng.lognormal(4, 1.5, n_tasks).clip(1, 3_600), unit="s")
+    steps = rng.integers(0, max(n_tasks // 10, 1), n_tasks)
+    return pd.DataFrame({"Task": [f"step_{step}" for step in steps], "Start": starts, "End": starts + durations,
+                         "Group": [f"stage_{step % 5}" for step in steps]})
+
+
+def draw_gantt_bars(spans: pd.DataFrame, single_call: bool):
+    """
+    Gantt-diagram barh hívásokkal, összehasonlításként: soronként egy hívással (a gantdiagramm.py korábbi
+    megoldása) vagy egyetlen hívással, amely ugyanúgy soronként egy Rectangle objektumot hoz létre
+    :param spans: a make_spans által létrehozott feladatok
+    :param single_call: ha igaz, egyetlen barh hívás készül
+    :return: a diagram
+    """
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+
+    starts = mdates.date2num(spans["Start"].to_numpy())
+    durations = mdates.date2num(spans["End"].to_numpy()) - starts
+    fig, ax = plt.subplots(figsize=(10, 6))
+    if single_call:
+        ax.barh(spans["Task"], durations, left=starts, color="skyblue")
+    else:
+        for task, duration, start in zip(spans["Task"], durations, starts):
+            ax.barh(task, duration, left=start, color="skyblue")
+    ax.xaxis_date()
+    return fig
+
+
+def bench_gantt(task_counts: list[int], loop_limit: int = 10_000) -> list[dict]:
+    """
+    A Gantt-diagram elkészítésének és kirajzolásának ideje, valamint a futási napló (metrics JSON lines)
+    beolvasásának ideje
+    :param task_counts: a feladatok száma
+    :param loop_limit: ennél több feladatnál a soronkénti barh hívások mérése kimarad, mert percekig tart
+    :return: a mérési eredmények listája
+    """
+    import diagrams
+    import gantdiagramm
+
+    diagrams.use_batch_backend()
+    results = []
+    for n_tasks in task_counts:
+        spans = make_spans(n_tasks)
+        methods = {"barh_loop": lambda: draw_gantt_bars(spans, False), "barh": lambda: draw_gantt_bars(spans, True),
+                   "collection": lambda: gantdiagramm.draw_gantt(spans, x_label="Időpont", y_label="Lépések")}
+        for method, draw in methods.items():
+            if method == "barh_loop" and n_tasks > loop_limit:
+                continue
+            results.append({"tasks": n_tasks, "method": method, "seconds": time_call(lambda: render_pixels(draw()))})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, "metrics.jsonl")
+            start = (spans["Start"] - pd.Timestamp(0)).dt.total_seconds()  # Unix idő, ahogy a metrics írja
+            events = pd.DataFrame({"type": "timer", "name": spans["Group"], "value": (spans["End"] - spans["Start"])
+                                   .dt.total_seconds(), "labels": [{"step": task} for task in spans["Task"]],
+                                   "start": start})
+            events.to_json(file_name, orient="records", lines=True)
+            results.append({"tasks": n_tasks, "method": "read_jsonl",
+                            "seconds": time_call(gantdiagramm.read_spans, file_name)})
+    return results
+
+
+def make_chart_jobs(n_charts: int) -> list[dict]:
+    """
+    A main.py diagramjai szintetikus adatokon, a megadott darabszámig ismételve
+    :param n_charts: a diagramok száma
+    :return: a diagrams.chart_job által összeállított feladatok listája, egyedi nevekkel
+    """
+    import main  # csak itt van rá szükség, a main a diagrams modult is betölti
+
+    data = make_synthetic_frame(35)  # a valós táblázat méretének megfelelő adat
+    base_jobs = main.build_chart_jobs(data, main.build_prediction_frame(data))
+    return [dict(job, name=f"{job['name']}_{idx}") for idx, job in enumerate(islice(cycle(base_jobs), n_charts))]
+
+
+def render_in_process(mode: str, n_charts: int, workers: int | None, out_dir: str) -> dict:
+    """
+    Egy renderelési mód mérése, külön folyamatban futtatva, hogy a memóriacsúcs ne keveredjen a többi méréssel.
+    "current": a show_* függvények eddigi működése, a diagramok nem záródnak be (plt.show helyett mentéssel);
+    "batch": diagrams.render_batch, lezárt diagramokkal, a megadott számú folyamattal
+    :param mode: "current" vagy "batch"
+    :param n_charts: a diagramok száma
+    :param workers: a kötegelt mód folyamatainak száma
+    :param out_dir: a kimeneti könyvtár
+    :return: a mérés eredménye
+    """
+    import diagrams
+
+    warnings.simplefilter("ignore")  # a sok nyitva hagyott diagramra figyelmeztetne a matplotlib
+    jobs = make_chart_jobs(n_charts)
+    start = time.perf_counter()
+    if mode == "current":
+        diagrams.use_batch_backend()
+        for job in jobs:
+            fig = diagrams.DRAW_FUNCTIONS[job["kind"]](*job["args"], **job["kwargs"])
+            fig.savefig(os.path.join(out_dir, f"{job['name']}.png"))  # a diagram nyitva marad
+    else:
+        diagrams.render_batch(jobs, out_dir, max_workers=workers)
+    elapsed = time.perf_counter() - start
+    peak_self = peak_children = None  # memóriacsúcs, ahol nem mérhető, ott None
+    if resource is not None:  # Linuxon a ru_maxrss kilobájtban értendő
+        peak_self = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        peak_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {"mode": mode, "workers": workers or os.cpu_count(), "charts": n_charts, "seconds": elapsed,
+            "charts_per_s": n_charts / elapsed, "peak_rss_mb": peak_self, "peak_worker_rss_mb": peak_children}
+
+
+def bench_render(n_charts: int, workers: int | None = None) -> list[dict]:
+    """
+    A megjelenítő nélküli, kötegelt renderelés összehasonlítása a diagramokat nyitva hagyó, eddigi módszerrel.
+    Minden mód egy új folyamatban fut.
+    :param n_charts: a diagramok száma
+    :param workers: a kötegelt mód folyamatainak száma, alapértelmezetten a processzormagok száma
+    :return: a mérési eredmények listája
+    """
+    results = []
+    for mode, mode_workers in (("current", 1), ("batch", 1), ("batch", workers)):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                results.append(executor.submit(render_in_process, mode, n_charts, mode_workers, temp_dir).result())
+    return results
+
+
+def bench_charts(n_updates: int) -> list[dict]:
+    """
+    Az újrafelhasználható diagramok (diagrams.LineChart, ScatterChart, MixedChart) frissítésének összehasonlítása
+    a minden hívásra új diagramot építő draw_* függvényekkel. Mindkét esetben a canvasra rajzolás számít,
+    file-ba írás nélkül. Az "autoscale" a minden frissítéskor változó tengelyhatárokat (teljes újrarajzolás),
+    a "fixed" a rögzített tengelyhatárokat (blitting) jelenti.
+    :param n_updates: a frissítések (adatkészletek) száma diagramtípusonként
+    :return: a mérési eredmények listája
+    """
+    import matplotlib.pyplot as plt
+
+    import diagrams
+    import main
+
+    diagrams.use_batch_backend()
+    frames = [make_synthetic_frame(35, seed) for seed in range(n_updates)]  # a frissített adatkészletek
+    predictions = [main.build_prediction_frame(frame) for frame in frames]
+    mixed_columns = ["student_real_and_predicted", "student_predicted",
+                     "teacher_real_and_predicted", "teacher_predicted"]
+    mixed_args = ("Diákok és tanárok száma", ["diákok", "tanárok"], ["blue", "lightblue", "red", "orange"])
+    layouts = {
+        "line": (lambda frame, pred: diagrams.draw_line_diagram(frame["year_start"], frame[main.COLUMNS_NEEDED],
+                                                                x_label="Tanév kezdete", y_label="Értékek"),
+                 lambda autoscale: diagrams.LineChart(main.COLUMNS_NEEDED, x_label="Tanév kezdete",
+                                                      y_label="Értékek", autoscale=autoscale),
+                 lambda chart, frame, pred: chart.update(frame["year_start"], frame)),
+        "scatter": (lambda frame, pred: diagrams.draw_scatter_diagram(frame["number_of_students"],
+                                                                      frame["number_of_teachers"], "Diákok", "Tanárok"),
+                    lambda autoscale: diagrams.ScatterChart("Diákok", "Tanárok", autoscale=autoscale),
+                    lambda chart, frame, pred: chart.update(frame["number_of_students"], frame["number_of_teachers"])),
+        "mixed": (lambda frame, pred: diagrams.draw_mixed_diagram(pred["year_start"], pred[mixed_columns], *mixed_args),
+                  lambda autoscale: diagrams.MixedChart(mixed_columns, *mixed_args, autoscale=autoscale),
+                  lambda chart, frame, pred: chart.update(pred["year_start"], pred)),
+    }
+
+    results = []
+    for kind, (draw, create, update) in layouts.items():
+        start = time.perf_counter()
+        for frame, pred in zip(frames, predictions):
+            fig = draw(frame, pred)
+            fig.canvas.draw()  # a teljes diagram kirajzolása
+            plt.close(fig)
+        results.append({"chart": kind, "method": "construct", "updates": n_updates,
+                        "updates_per_s": n_updates / (time.perf_counter() - start)})
+        for autoscale in (True, False):
+            start = time.perf_counter()
+            chart = create(autoscale)
+            for frame, pred in zip(frames, predictions):
+                update(chart, frame, pred)
+            results.append({"chart": kind, "method": "reuse-autoscale" if autoscale else "reuse-fixed",
+                            "updates": n_updates, "updates_per_s": n_updates / (time.perf_counter() - start),
+                            "full_draws": chart.full_draws, "blits": chart.blits})
+    return results
+
+
+PIPELINE_STAGES = ("load", "clean", "derive", "fit", "render")  # a main.py folyamatának lépései
+
+
+def write_raw_csv(file_name: str, n_rows: int, seed: int = 0) -> None:
+    """
+    A KSH által letölthető nyers csv szerkezetét követő szintetikus file készítése: egy címsor, egy fejléc,
+    ;-vel tagolt oszlopok, "1990/1991" alakú tanév és szóközzel tagolt ezresek
+    :param file_name: a file teljes neve
+    :param n_rows: az adatsorok száma
+    :param seed: seed a véletlenszám-generátor számára
+    """
+    def with_thousands(values: np.ndarray) -> np.ndarray:
+        # vektorizált ezres tagolás: 1234567 -> "1 234 567"
+        text = (values % 1000).astype(str)
+        rest = values // 1000
+        while rest.any():
+            padded = np.char.zfill(text, 3) if text.dtype.kind == "U" else text
+            text = np.where(rest > 0, np.char.add(np.char.add((rest % 1000).astype(str), " "), padded), text)
+            rest = rest // 1000
+        return text
+
+    df = make_synthetic_frame(n_rows, seed)
+    raw = pd.DataFrame({
+        "Tanév": df["school_year"],
+        "Iskolák": with_thousands(df["school_number"].to_numpy()),
+        "Osztálytermek": with_thousands(df["classroom_number"].to_numpy()),
+        "Pedagógusok": with_thousands(df["number_of_teachers"].to_numpy()),
+        "Tanulók": with_thousands(df["number_of_students"].to_numpy()),
+    })
+    with open(file_name, "w", encoding="utf-8") as f:
+        f.write("Szintetikus KSH táblázat;;;;\n")  # a valódi file első sora a táblázat címe
+        raw.to_csv(f, sep=";", index=False)
+
+
+def pipeline_stages(raw_file: str) -> dict:
+    """
+    A main.py folyamatának lépései függvényekként, a lépések egymás eredményeit használják
+    :param raw_file: a write_raw_csv által készített nyers csv file
+    :return: lépésnév -> paraméter nélküli függvény, a PIPELINE_STAGES sorrendjében hívandók
+    """
+    import matplotlib.pyplot as plt
+
+    import diagrams
+    import models
+
+    state = {}
+
+    def load():
+        state["raw"] = pd.read_csv(raw_file, sep=";", header=1)
+
+    def clean():
+        state["data"] = ksh_data.cleanup(state["raw"])
+
+    def derive():
+        state["data"] = derived.add_derived_metrics(state["data"],
+                                                    datasets.get_dataset(datasets.DEFAULT_DATASET)["derived"])
+
+    def fit():
+        data = state["data"]
+        coefficients = models.fit_linear_models(data, "year_start", ["number_of_students", "number_of_teachers"])
+        models.predict_linear_models(coefficients, range(data["year_start"].min(), data["year_start"].max() + 10))
+        models.calculate_multiple_models(data, "year_start", "number_of_teachers")
+
+    def render():
+        data = state["data"]
+        fig = diagrams.draw_line_diagram(data["year_start"], data[["number_of_students", "number_of_teachers"]],
+                                         x_label="Tanév kezdete", y_label="Értékek")
+        fig.canvas.draw()  # a tényleges kirajzolás
+        plt.close(fig)
+
+    return {"load": load, "clean": clean, "derive": derive, "fit": fit, "render": render}
+
+
+def bench_pipeline(row_counts: list[int], stages=PIPELINE_STAGES, memory: bool = True) -> list[dict]:
+    """
+    A folyamat lépéseinek külön-külön mérése különböző méretű szintetikus adatokon.
+    Az időmérés nyomkövetés nélkül történik, a memóriacsúcs és a lefoglalt memóriablokkok száma egy második
+    futásból, tracemalloc segítségével (ez lassabb, ezért nem számít bele az időbe).
+    :param row_counts: a mérendő sorszámok listája (pl. 35-től 10 millióig)
+    :param stages: a mérendő lépések, a PIPELINE_STAGES elemei közül, a sorrend a PIPELINE_STAGES szerinti
+    :param memory: mérje-e a memóriát is
+    :return: a mérési eredmények listája, soronként egy (sorszám, lépés) pár
+    """
+    import diagrams
+
+    diagrams.use_batch_backend()
+    # a fit és a render a tisztított adatot használja, ezért a betöltés és a tisztítás mindig lefut,
+    # de csak a kért lépések kerülnek az eredmények közé
+    required = [stage for stage in PIPELINE_STAGES if stage in stages or stage in ("load", "clean")]
+    results = []
+    for n_rows in row_counts:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            raw_file = os.path.join(temp_dir, "raw.csv")
+            write_raw_csv(raw_file, n_rows)
+            timings = {}
+            functions = pipeline_stages(raw_file)
+            for stage in required:
+                timings[stage] = time_call(functions[stage])
+
+            memory_usage = {}
+            if memory:
+                functions = pipeline_stages(raw_file)
+                for stage in required:
+                    tracemalloc.start()
+                    functions[stage]()
+                    _, peak = tracemalloc.get_traced_memory()
+                    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+                    tracemalloc.stop()
+                    memory_usage[stage] = (peak, blocks)
+
+            for stage in stages:
+                result = {"rows": n_rows, "stage": stage, "seconds": timings[stage]}
+                if memory:
+                    result["peak_mb"] = memory_usage[stage][0] / 1024 / 1024
+                    result["allocated_blocks"] = memory_usage[stage][1]
+                results.append(result)
+    return results
+
+
+def profile_pipeline(n_rows: int, file_name: str) -> None:
+    """
+    Egy teljes futás profilozása cProfile-lal. Az eredmény pstats formátumú, megnyitható pl. snakeviz-zel,
+    vagy flameprof-fal lángdiagrammá (flame graph) alakítható.
+    :param n_rows: a szintetikus adat sorainak száma
+    :param file_name: a kimeneti .prof file neve
+    """
+    import diagrams
+
+    diagrams.use_batch_backend()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        raw_file = os.path.join(temp_dir, "raw.csv")
+        write_raw_csv(raw_file, n_rows)
+        functions = pipeline_stages(raw_file)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        for stage in PIPELINE_STAGES:
+            functions[stage]()
+        profiler.disable()
+    profiler.dump_stats(file_name)
+
+
+# a main.py parancsai által betöltött modulok, és azok a lassú csomagok, amelyeket nem szabad betölteniük
+IMPORT_SCENARIOS = {
+    "cli": (["main"], ["pandas", "matplotlib", "sklearn", "requests"]),
+    "fetch": (["main", "downloader"], ["pandas", "matplotlib", "sklearn"]),
+    "stats": (["main", "ksh_data"], ["matplotlib", "sklearn", "requests"]),
+    "fit": (["main", "ksh_data", "models"], ["matplotlib", "sklearn", "requests"]),
+    "plot": (["main", "ksh_data", "models", "diagrams"], ["sklearn", "requests"]),
+}
+
+
+def parse_importtime(output: str) -> dict[str, tuple[int, int]]:
+    """
+    A python -X importtime kimenetének feldolgozása
+    :param output: a folyamat hibakimenete
+    :return: modulonként (saját idő, kumulált idő) mikroszekundumban
+    """
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue  # más kimenet vagy a fejléc
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def measure_imports(modules: list[str], repeat: int = 5) -> dict[str, tuple[int, int]]:
+    """
+    A megadott modulok importálási ideje egy új Python folyamatban, -X importtime kapcsolóval.
+    A mérés többször ismétlődik, és a leggyorsabb futás számít, így a lemez gyorsítótár hatása kisebb.
+    :param modules: az importálandó modulok
+    :param repeat: az ismétlések száma
+    :return: a leggyorsabb futás parse_importtime eredménye
+    """
+    best = None
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+                                   capture_output=True, text=True, check=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        times = parse_importtime(completed.stderr)
+        if best is None or sum(t for t, _ in times.values()) < sum(t for t, _ in best.values()):
+            best = times
+    return best
+
+
+def bench_imports(scenarios: list[str], repeat: int = 5, max_seconds: float | None = None) -> list[dict]:
+    """
+    A main.py parancsainak importálási ideje, és annak ellenőrzése, hogy egyik parancs sem tölt be olyan lassú
+    csomagot, amire nincs szüksége
+    :param scenarios: az IMPORT_SCENARIOS kulcsai
+    :param repeat: az ismétlések száma parancsonként
+    :param max_seconds: ha meg van adva, az ennél lassabb importálás is hibának számít
+    :return: parancsonként az importálás ideje, a modulok száma, a leglassabb csomagok és a tiltott csomagok
+    """
+    results = []
+    for scenario in scenarios:
+        modules, forbidden = IMPORT_SCENARIOS[scenario]
+        times = measure_imports(modules, repeat)
+        seconds = sum(self_us for self_us, _ in times.values()) / 1e6
+        packages = {}  # csomagonként a saját idők összege
+        for module, (self_us, _) in times.items():
+            packages[module.split(".")[0]] = packages.get(module.split(".")[0], 0) + self_us
+        slowest = sorted(packages, key=packages.get, reverse=True)[:3]
+        loaded = sorted(package for package in forbidden if package in packages)
+        results.append({"scenario": scenario, "seconds": seconds, "modules": len(times),
+                        "slowest": ", ".join(f"{package} {packages[package] / 1e6:.3f}s" for package in slowest),
+                        "forbidden": ", ".join(loaded),
+                        "ok": not loaded and (max_seconds is None or seconds <= max_seconds)})
+    return results
+
+
+def environment_info() -> dict:
+    """
+    A mérés környezetének adatai, a különböző commitok méréseinek összehasonlításához
+    :return: commit azonosító, időpont, Python és könyvtárverziók
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:  # nincs git
+        commit = None
+    return {"commit": commit, "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "machine": platform.machine(), "cpu_count": os.cpu_count()}
+
+
+def save_results(results: list[dict], file_name: str) -> None:
+    """
+    Mérési eredmények kimentése JSON formátumban, a környezet adataival együtt
+    :param results: a mérési eredmények listája
+    :param file_name: a kimeneti file neve
+    """
+    with open(file_name, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment_info(), "results": results}, f, indent=1, default=float)
+
+
+def compare_results(old_file_name: str, new_file_name: str) -> pd.DataFrame:
+    """
+    Két, a save_results által mentett pipeline mérés összehasonlítása lépésenként és sorszámonként
+    :param old_file_name: a korábbi mérés file-ja
+    :param new_file_name: az új mérés file-ja
+    :return: táblázat a régi és új időkkel és azok arányával (1-nél nagyobb arány lassulást jelent)
+    """
+    tables = []
+    for file_name in (old_file_name, new_file_name):
+        with open(file_name, encoding="utf-8") as f:
+            tables.append(pd.DataFrame(json.load(f)["results"]).set_index(["rows", "stage"])["seconds"])
+    comparison = pd.concat(tables, axis=1, keys=["old_seconds", "new_seconds"]).dropna()
+    comparison["ratio"] = comparison["new_seconds"] / comparison["old_seconds"]
+    return comparison.reset_index()
+
+
+def print_results(results: list[dict]) -> None:
+    """
+    Mérési eredmények kiírása táblázatként
+    :param results: a mérési eredmények listája
+    """
+    print(pd.DataFrame(results).to_string(index=False))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Teljesítménymérések")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    load_parser = subparsers.add_parser("load", help="csv és npy gyorsítótár betöltési ideje")
+    load_parser.add_argument("--rows", type=int, default=2_000_000, help="a szintetikus táblázat sorainak száma")
+    load_parser.add_argument("--repeat", type=int, default=3, help="a meleg mérések ismétlésszáma")
+    serialize_parser = subparsers.add_parser("serialize", help="a pickle és a serialization modul összehasonlítása")
+    serialize_parser.add_argument("--rows", type=int, default=2_000_000, help="a szintetikus táblázat sorainak száma")
+    serialize_parser.add_argument("--repeat", type=int, default=3, help="az ismétlések száma")
+    downsample_parser = subparsers.add_parser("downsample", help="nagy sorozatok ritkításának sebessége és hűsége")
+    downsample_parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                                   help="a sorozatok pontszámai")
+    downsample_parser.add_argument("--repeat", type=int, default=3, help="az ismétlések száma")
+    gantt_parser = subparsers.add_parser("gantt", help="a Gantt-diagram rajzolásának sebessége sok feladattal")
+    gantt_parser.add_argument("--tasks", type=int, nargs="+", default=[1_000, 10_000, 50_000],
+                              help="a feladatok száma")
+    gantt_parser.add_argument("--loop-limit", type=int, default=10_000,
+                              help="ennél több feladatnál a soronkénti barh hívások mérése kimarad")
+    render_parser = subparsers.add_parser("render", help="kötegelt diagramkészítés sebessége és memóriaigénye")
+    render_parser.add_argument("--charts", type=int, default=90, help="a diagramok száma")
+    render_parser.add_argument("--workers", type=int, default=None, help="a párhuzamos folyamatok száma")
+    charts_parser = subparsers.add_parser("charts", help="újrafelhasználható diagramok frissítési sebessége")
+    charts_parser.add_argument("--updates", type=int, default=50, help="a frissítések száma diagramtípusonként")
+    pipeline_parser = subparsers.add_parser("pipeline", help="a folyamat lépéseinek mérése (load, clean, fit, render)")
+    pipeline_parser.add_argument("--rows", type=int, nargs="+", default=[35, 10_000, 1_000_000],
+                                 help="a szintetikus adatok sorszámai")
+    pipeline_parser.add_argument("--stages", nargs="+", choices=PIPELINE_STAGES, default=list(PIPELINE_STAGES),
+                                 help="a mérendő lépések")
+    pipeline_parser.add_argument("--no-memory", action="store_true", help="a memóriamérés kihagyása")
+    pipeline_parser.add_argument("--json", help="az eredmények kimentése ebbe a JSON file-ba")
+    pipeline_parser.add_argument("--profile", help="egyetlen futás cProfile kimenete ebbe a file-ba (az első sorszámmal)")
+    imports_parser = subparsers.add_parser("imports", help="a main.py parancsainak importálási ideje (-X importtime)")
+    imports_parser.add_argument("--scenarios", nargs="+", choices=IMPORT_SCENARIOS, default=list(IMPORT_SCENARIOS),
+                                help="a mérendő parancsok")
+    imports_parser.add_argument("--repeat", type=int, default=5, help="az ismétlések száma, a leggyorsabb számít")
+    imports_parser.add_argument("--max-seconds", type=float, help="ennél lassabb importálás esetén hibával lép ki")
+    imports_parser.add_argument("--json", help="az eredmények kimentése ebbe a JSON file-ba")
+    compare_parser = subparsers.add_parser("compare", help="két JSON pipeline mérés összehasonlítása")
+    compare_parser.add_argument("old", help="a korábbi mérés JSON file-ja")
+    compare_parser.add_argument("new", help="az új mérés JSON file-ja")
+    arguments = parser.parse_args()
+
+    if arguments.benchmark == "load":
+        print_results(bench_load(arguments.rows, arguments.repeat))
+    elif arguments.benchmark == "serialize":
+        print_results(bench_serialization(arguments.rows, arguments.repeat))
+    elif arguments.benchmark == "downsample":
+        print_results(bench_downsample(arguments.rows, arguments.repeat))
+    elif arguments.benchmark == "gantt":
+        print_results(bench_gantt(arguments.tasks, arguments.loop_limit))
+    elif arguments.benchmark == "render":
+        print_results(bench_render(arguments.charts, arguments.workers))
+    elif arguments.benchmark == "charts":
+        print_results(bench_charts(arguments.updates))
+    elif arguments.benchmark == "pipeline":
+        if arguments.profile:
+            profile_pipeline(arguments.rows[0], arguments.profile)
+            print(f"A profil elkészült: {arguments.profile}")
+        else:
+            pipeline_results = bench_pipeline(arguments.rows, arguments.stages, not arguments.no_memory)
+            print_results(pipeline_results)
+            if arguments.json:
+                save_results(pipeline_results, arguments.json)
+    elif arguments.benchmark == "imports":
+        import_results = bench_imports(arguments.scenarios, arguments.repeat, arguments.max_seconds)
+        print_results(import_results)
+        if arguments.json:
+            save_results(import_results, arguments.json)
+        if not all(result["ok"] for result in import_results):
+            sys.exit(1)  # a tiltott csomag betöltése vagy a túl lassú importálás hibának számít
+    elif arguments.benchmark == "compare":
+        print_results(compare_results(arguments.old, arguments.new).to_dict("records"))
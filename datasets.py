@@ -0,0 +1,169 @@
+"""
+A feldolgozott KSH táblázatok nyilvántartása (registry).
+Minden adatkészlethez egy leírás tartozik: honnan kell letölteni, hogyan kell elnevezni az oszlopokat, melyik
+oszlopot kell szétvágni, melyik marad szöveg, és a modellekhez melyik az x oszlop és melyek a célváltozók.
+A ksh_data.cleanup ezek alapján tisztít, a scheduler pedig ezeken fut végig. Újabb táblázatok (pl. területi
+bontások) felvehetők a register függvénnyel vagy egy JSON file-ból a load_registry függvénnyel, pl.:
+[{"name": "okt0010", "url": "https://...", "columns": ["region", "school_year", ...],
+  "split": [["school_year", ["year_start", "year_end"], "/"]], "text_columns": ["region"], "x_col": "year_start"}]
+A tisztítás után számolt származtatott mutatók (arányok, növekedés, mozgóátlag) is itt adhatók meg, a ratio,
+growth és rolling_mean függvényekkel, a számításukat a derived modul végzi.
+A modul csak a standard könyvtárat használja, így a betöltése nem lassítja a parancssort.
+"""
+import json
+
+DEFAULT_DATASET = "okt0008"  # a main.py által használt táblázat
+METRIC_KINDS = ("ratio", "growth", "rolling_mean")  # a származtatott mutatók fajtái
+
+DATASETS = {}  # név -> adatkészlet leírás
+
+
+def ratio(name: str, numerator: str, denominator: str) -> dict:
+    """
+    Két oszlop hányadosa soronként (pl. egy tanárra jutó diákok száma)
+    :param name: az új oszlop neve
+    :param numerator: a számláló oszlop
+    :param denominator: a nevező oszlop, 0 esetén az eredmény NaN
+    :return: a mutató leírása
+    """
+    return {"name": name, "kind": "ratio", "numerator": numerator, "denominator": denominator}
+
+
+def growth(name: str, column: str, periods: int = 1, by: str | None = None) -> dict:
+    """
+    Relatív változás az előző sorhoz képest, éves adatoknál az éves növekedés (0.05 = 5%)
+    :param name: az új oszlop neve
+    :param column: a vizsgált oszlop
+    :param periods: hány sorral korábbihoz képest
+    :param by: opcionálisan egy csoportosító oszlop (pl. régió), ekkor csoportonként számol
+    :return: a mutató leírása
+    """
+    return {"name": name, "kind": "growth", "column": column, "periods": periods, "by": by}
+
+
+def rolling_mean(name: str, column: str, window: int, by: str | None = None) -> dict:
+    """
+    Mozgóátlag az utolsó window sorra, az első window-1 sorban NaN
+    :param name: az új oszlop neve
+    :param column: a vizsgált oszlop
+    :param window: az ablak mérete sorokban
+    :param by: opcionálisan egy csoportosító oszlop (pl. régió), ekkor csoportonként számol
+    :return: a mutató leírása
+    """
+    return {"name": name, "kind": "rolling_mean", "column": column, "window": window, "by": by}
+
+
+def metric_columns(metric: dict) -> list[str]:
+    """
+    :param metric: egy származtatott mutató leírása
+    :return: a mutató által használt oszlopok
+    """
+    return [metric[key] for key in ("numerator", "denominator", "column", "by") if metric.get(key)]
+
+
+def derived_names(spec: dict) -> list[str]:
+    """
+    :param spec: az adatkészlet leírása
+    :return: a származtatott mutatók oszlopnevei
+    """
+    return [metric["name"] for metric in spec["derived"]]
+
+
+def dataset(name: str, url: str, columns: list[str], split=(), text_columns=(), x_col: str | None = None,
+            targets: list[str] | None = None, cache_name: str | None = None, title: str = "",
+            derived=()) -> dict:
+    """
+    Egy adatkészlet leírásának összeállítása és ellenőrzése
+    :param name: az adatkészlet egyedi neve (pl. a STADAT táblázat kódja)
+    :param url: a ;-vel tagolt csv export URL-je
+    :param columns: az első len(columns) oszlop új neve, a többi oszlop törlésre kerül
+    :param split: (forrásoszlop, [céloszlopok], elválasztó) hármasok, pl. "1990/1991" -> year_start, year_end
+    :param text_columns: a szövegként megtartandó oszlopok, a szétvágott forrásoszlopokon felül (pl. régió neve)
+    :param x_col: a modellek x oszlopa, ha nincs megadva, nem készül modell és diagram
+    :param targets: a prediktálandó oszlopok, alapértelmezetten az összes numerikus oszlop
+    :param cache_name: a gyorsítótár neve kiterjesztés nélkül, alapértelmezetten a name
+    :param title: a diagramok címe
+    :param derived: a tisztítás után számolt mutatók (ratio, growth, rolling_mean), a megadás sorrendjében, így
+                    egy mutató a korábbiakat is használhatja
+    :return: az adatkészlet leírása
+    """
+    split = [(source, list(target_columns), separator) for source, target_columns, separator in split]
+    produced = list(columns) + [column for _, target_columns, _ in split for column in target_columns]
+    if len(set(produced)) != len(produced):
+        raise ValueError(f"{name}: az oszlopnevek nem egyediek.")
+    unknown = [column for column in [source for source, _, _ in split] + list(text_columns) + list(targets or [])
+               if column not in produced]
+    if x_col is not None and x_col not in produced:
+        unknown.append(x_col)
+    for metric in derived:
+        if metric.get("kind") not in METRIC_KINDS:
+            raise ValueError(f"{name}: ismeretlen mutató: {metric.get('kind')}. Választható: {', '.join(METRIC_KINDS)}.")
+        unknown += [column for column in metric_columns(metric) if column not in produced]
+        if metric["name"] in produced:
+            raise ValueError(f"{name}: a mutató neve már foglalt: {metric['name']}")
+        produced.append(metric["name"])  # a későbbi mutatók már használhatják
+    if unknown:
+        raise ValueError(f"{name}: ismeretlen oszlop: {', '.join(unknown)}")
+    return {"name": name, "url": url, "columns": list(columns), "split": split, "text_columns": list(text_columns),
+            "x_col": x_col, "targets": list(targets) if targets is not None else None,
+            "cache_name": cache_name or name, "title": title, "derived": [dict(metric) for metric in derived]}
+
+
+def text_columns(spec: dict) -> set[str]:
+    """
+    A tisztításkor szövegként megmaradó oszlopok
+    :param spec: az adatkészlet leírása
+    :return: a szétvágott forrásoszlopok és a megadott szöveges oszlopok
+    """
+    return {source for source, _, _ in spec["split"]} | set(spec["text_columns"])
+
+
+def register(spec: dict) -> dict:
+    """
+    Egy adatkészlet felvétele a nyilvántartásba, azonos név esetén a régit lecseréli
+    :param spec: a dataset függvény által összeállított leírás
+    :return: a leírás
+    """
+    DATASETS[spec["name"]] = spec
+    return spec
+
+
+def get_dataset(name: str) -> dict:
+    """
+    :param name: az adatkészlet neve
+    :return: a nyilvántartott leírás
+    """
+    if name not in DATASETS:
+        raise KeyError(f"Ismeretlen adatkészlet: {name}. Választható: {', '.join(DATASETS)}.")
+    return DATASETS[name]
+
+
+def load_registry(file_name: str) -> list[dict]:
+    """
+    Adatkészletek felvétele egy JSON file-ból, amely a dataset függvény paramétereit tartalmazó objektumok listája
+    :param file_name: a JSON file neve
+    :return: a felvett leírások
+    """
+    with open(file_name, encoding="utf-8") as f:
+        return [register(dataset(**spec)) for spec in json.load(f)]
+
+
+# Menü jobb felső sarkából
+# forrás: https://www.ksh.hu/stadat_files/okt/hu/okt0008.html
+register(dataset(
+    "okt0008", "https://www.ksh.hu/stadat_files/okt/hu/okt0008.csv",
+    columns=["school_year", "school_number", "classroom_number", "number_of_teachers", "number_of_students"],
+    # az első oszlop eredeti adata "1990/1991" szerkezetű, ezért a / jelnél szétvágásra kerül
+    split=[("school_year", ["year_start", "year_end"], "/")],
+    x_col="year_start",
+    targets=["number_of_students", "number_of_teachers", "school_number", "classroom_number"],
+    cache_name="school", title="Oktatási adatok",
+    derived=[
+        ratio("students_per_teacher", "number_of_students", "number_of_teachers"),
+        ratio("students_per_classroom", "number_of_students", "classroom_number"),
+        growth("students_growth", "number_of_students"),
+        growth("teachers_growth", "number_of_teachers"),
+        rolling_mean("students_rolling_5", "number_of_students", 5),
+        rolling_mean("teachers_rolling_5", "number_of_teachers", 5),
+    ],
+))
@@ -0,0 +1,131 @@
+"""
+A tisztított adatokból számolt származtatott mutatók (arányok, növekedés, mozgóátlag).
+A mutatók leírása az adatkészlet nyilvántartásában van (datasets.ratio, datasets.growth, datasets.rolling_mean).
+A mutatók a tisztítás után egyszer számolódnak ki, és közönséges float64 oszlopként kerülnek a gyorsítótárba,
+így a models és a diagrams függvényei a többi oszlophoz hasonlóan használhatják őket.
+A sorok sorrendje időrendi, a növekedés és a mozgóátlag a korábbi sorokból számol. Új sorok hozzáfűzésekor csak az
+új sorok értékei számolódnak ki, az ehhez szükséges utolsó néhány korábbi sor (lookback) és azok tárolt mutatói
+alapján.
+"""
+import numpy as np
+import pandas as pd
+
+import metrics
+
+
+def metric_lookback(metric: dict) -> int:
+    """
+    :param metric: egy származtatott mutató leírása
+    :return: hány korábbi sorra van szükség egy új sor értékéhez
+    """
+    if metric["kind"] == "growth":
+        return metric["periods"]
+    if metric["kind"] == "rolling_mean":
+        return metric["window"] - 1
+    return 0  # az arány soronként számol
+
+
+def lookback(specs: list[dict]) -> int:
+    """
+    :param specs: a származtatott mutatók leírása
+    :return: a hozzáfűzéshez szükséges korábbi sorok száma (csoportonként, ha van csoportosítás). A korábbi sorok
+             tárolt mutatói miatt az egymásra épülő mutatóknál sem kell a lookback értékeket összeadni.
+    """
+    return max((metric_lookback(metric) for metric in specs), default=0)
+
+
+def compute_metric(df: pd.DataFrame, metric: dict) -> np.ndarray:
+    """
+    Egy mutató kiszámítása vektorosan a teljes DataFrame-re
+    :param df: a tisztított adatok, a korábban számolt mutatókkal együtt
+    :param metric: a mutató leírása
+    :return: a mutató értékei float64 tömbként, a nem értelmezhető helyeken (pl. 0-val osztás) NaN
+    """
+    if metric["kind"] == "ratio":
+        numerator = df[metric["numerator"]].to_numpy(dtype="float64")
+        denominator = df[metric["denominator"]].to_numpy(dtype="float64")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = numerator / denominator
+    else:
+        column = df[metric["column"]].astype("float64")
+        source = column.groupby(df[metric["by"]], sort=False) if metric.get("by") else column
+        if metric["kind"] == "growth":
+            previous = source.shift(metric["periods"]).to_numpy()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values = column.to_numpy() / previous - 1
+        else:
+            window = metric["window"]
+            if metric.get("by"):
+                # a groupby().rolling() csoportonként rendezett indexet ad, ezért a transform marad az eredeti sorrendben
+                values = source.transform(lambda group: group.rolling(window, min_periods=window).mean()).to_numpy()
+            else:
+                values = source.rolling(window, min_periods=window).mean().to_numpy()
+    values = np.asarray(values, dtype="float64")
+    return np.where(np.isinf(values), np.nan, values)  # a 0-val osztás se kerüljön végtelenként a modellekbe
+
+
+def add_derived_metrics(df: pd.DataFrame, specs: list[dict], table: str = "") -> pd.DataFrame:
+    """
+    A származtatott mutatók kiszámítása a megadás sorrendjében, így egy mutató a korábbiakat is használhatja
+    :param df: a tisztított adatok, nem módosul
+    :param specs: a mutatók leírása (az adatkészlet "derived" eleme)
+    :param table: a táblázat neve a mérőpontok címkéjéhez
+    :return: új DataFrame a mutatókkal kiegészítve, a meglévő azonos nevű oszlopok felülíródnak
+    """
+    if not specs:
+        return df
+    result = df.copy(deep=False)  # az oszlopok hozzáadása ne módosítsa a hívó DataFrame-jét
+    with metrics.timer("derived_metrics_seconds", table=table, mode="full"):
+        for metric in specs:
+            result[metric["name"]] = compute_metric(result, metric)
+    return result
+
+
+def history_tail(df: pd.DataFrame, specs: list[dict]) -> pd.DataFrame:
+    """
+    Az új sorok mutatóihoz szükséges utolsó sorok: a lookback darab utolsó sor, csoportosított mutatóknál
+    csoportonként is, az eredeti sorrendben
+    :param df: a már feldolgozott adatok
+    :param specs: a mutatók leírása
+    :return: a DataFrame szükséges sorai
+    """
+    rows = lookback(specs)
+    if rows == 0 or df.empty:
+        return df.iloc[:0]
+    positions = np.arange(len(df))
+    keep = set(positions[-rows:].tolist())  # a csoportosítás nélküli mutatókhoz
+    for by in {metric["by"] for metric in specs if metric.get("by")}:
+        keep.update(pd.Series(positions).groupby(df[by].to_numpy(), sort=False).tail(rows).tolist())
+    return df.iloc[sorted(keep)]
+
+
+def extend_derived_metrics(history: pd.DataFrame | None, new_rows: pd.DataFrame, specs: list[dict],
+                           table: str = "") -> pd.DataFrame:
+    """
+    A hozzáfűzött sorok mutatóinak kiszámítása. Csak az új sorok és a lookback darab korábbi sor kerül feldolgozásra,
+    az eredmény megegyezik a teljes adatra való újraszámolással.
+    A korábbi sorok mutatói nem számolódnak újra, hanem a history tárolt értékei maradnak, így a korábbi mutatókat
+    használó mutatóknak (pl. a növekedés mozgóátlaga) sem kell a láncon összeadódó számú korábbi sor.
+    :param history: a már feldolgozott adatok a mutatókkal együtt (elég a history_tail eredménye), vagy None, ha nincs
+                    korábbi adat. Ha a mutatók hiányoznak belőle, előbb a teljes history-ra kiszámolódnak.
+    :param new_rows: a hozzáfűzött, tisztított sorok
+    :param specs: a mutatók leírása
+    :param table: a táblázat neve a mérőpontok címkéjéhez
+    :return: az új sorok a mutatókkal kiegészítve, az eredeti oszlopok és típusok változatlanok
+    """
+    if not specs:
+        return new_rows
+    names = [metric["name"] for metric in specs]
+    if history is not None and not set(names) <= set(history.columns):
+        history = add_derived_metrics(history, specs, table)  # régi gyorsítótár, a mutatók még nincsenek benne
+    tail = history_tail(history, specs) if history is not None else new_rows.iloc[:0]
+    with metrics.timer("derived_metrics_seconds", table=table, mode="append"):
+        # a korábbi sorok tárolt mutatói maradnak, az új sorok mutatói NaN-ról indulnak
+        combined = pd.concat([tail.reindex(columns=list(new_rows.columns) + names), new_rows], ignore_index=True)
+        result = new_rows.copy(deep=False)
+        for metric in specs:
+            values = combined[metric["name"]].to_numpy(dtype="float64", copy=True)
+            values[len(tail):] = compute_metric(combined, metric)[len(tail):]
+            combined[metric["name"]] = values
+            result[metric["name"]] = values[len(tail):]
+    return result
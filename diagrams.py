@@ -1,4 +1,25 @@
+import inspect
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.image import imsave
+
+import metrics
+
+BATCH_BACKEND = "Agg"  # kötegelt módban használt, megjelenítő nélküli backend
+BATCH_FORMATS = ("png", "svg", "pdf")  # kötegelt módban választható fileformátumok
+# a nagy sorozatok ritkítása rajzolás előtt: "minmax" (szakaszonként az első, utolsó, legkisebb és legnagyobb pont,
+# a csúcsok biztosan megmaradnak) vagy "lttb" (Largest-Triangle-Three-Buckets, szakaszonként egy pont)
+DOWNSAMPLE_METHODS = ("minmax", "lttb")
+DEFAULT_DOWNSAMPLE = "minmax"  # a rajzoló függvények alapértelmezése, None esetén minden pont kirajzolásra kerül
+DOWNSAMPLE_THRESHOLD = 5_000  # ennél több pontból álló sorozat ritkításra kerül, és jelölők nélkül rajzolódik
+BUCKETS_PER_PIXEL = 2  # a ritkítás szakaszainak száma a tengely egy képpontnyi szélességére (1 esetén ~10% eltérő képpont)
 
 
 def go_max():
@@ -36,46 +57,173 @@ def set_diagram_labels(x_label="", y_label="", title="") -> None:
         plt.ylabel(y_label)  # y tengely feliratának beállítása, ha nem üres
 
 
-def show_line_diagram(x_values, y_columns, colors=None, x_label="", y_label="", title="") -> None:
+def axes_pixel_width(ax) -> int:
     """
-    Vonaldiagram létrehozása és kirajzolása
+    :param ax: a tengely (Axes)
+    :return: a tengely szélessége képpontban, a diagram méretéből és felbontásából
+    """
+    return max(int(ax.get_window_extent().width), 1)
+
+
+def numeric_values(values: np.ndarray) -> np.ndarray:
+    """
+    :param values: x értékek (szám vagy dátum)
+    :return: az értékek float64 tömbként, dátum esetén nanoszekundumban
+    """
+    if values.dtype.kind == "M":
+        return values.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return values.astype(np.float64)  # szöveges x érték esetén ValueError
+
+
+def minmax_indices(y_values: np.ndarray, n_buckets: int) -> np.ndarray:
+    """
+    Ritkítás egyenlő méretű szakaszokkal: szakaszonként az első, az utolsó, a legkisebb és a legnagyobb pont marad meg,
+    így a vonal képe és a csúcsok is megmaradnak. A szakaszok keresése vektorosan, egy átrendezett mátrixon történik.
+    :param y_values: az y értékek, float64
+    :param n_buckets: a szakaszok száma
+    :return: a megtartott pontok indexei, növekvő sorrendben
+    """
+    n = len(y_values)
+    size = -(-n // n_buckets)  # a szakaszok mérete, felfelé kerekítve
+    starts = np.arange(0, n, size)
+    full = n // size  # a teljes szakaszok száma, a maradék az utolsó, rövidebb szakasz
+    lows = np.where(np.isnan(y_values), np.inf, y_values)  # a NaN értékek ne legyenek minimumok és maximumok
+    highs = np.where(np.isnan(y_values), -np.inf, y_values)
+    mins = lows[:full * size].reshape(full, size).argmin(axis=1) + starts[:full]
+    maxs = highs[:full * size].reshape(full, size).argmax(axis=1) + starts[:full]
+    if full * size < n:
+        mins = np.append(mins, lows[full * size:].argmin() + full * size)
+        maxs = np.append(maxs, highs[full * size:].argmax() + full * size)
+    return np.unique(np.concatenate([starts, np.minimum(starts + size, n) - 1, mins, maxs]))
+
+
+def lttb_indices(x_values: np.ndarray, y_values: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets ritkítás: szakaszonként az a pont marad meg, amely az előzőleg megtartott ponttal
+    és a következő szakasz átlagával a legnagyobb területű háromszöget adja. Az első és az utolsó pont mindig megmarad.
+    A szakaszok átlagai vektorosan, a pontok kiválasztása szakaszonként egy-egy numpy művelettel történik.
+    :param x_values: az x értékek, float64, növekvő sorrendben
+    :param y_values: az y értékek, float64
+    :param n_out: a megtartott pontok száma
+    :return: a megtartott pontok indexei, növekvő sorrendben
+    """
+    n = len(y_values)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # a belső pontok n_out - 2 szakasza
+    counts = np.diff(edges)
+    # a szakaszok átlagai, a következő szakasz átlaga az utolsó szakasznál az utolsó pont
+    next_x = np.append(np.add.reduceat(x_values[:n - 1], edges[:-1]) / counts, x_values[-1])[1:]
+    next_y = np.append(np.add.reduceat(y_values[:n - 1], edges[:-1]) / counts, y_values[-1])[1:]
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    selected = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        x_a, y_a = x_values[selected], y_values[selected]
+        areas = np.abs((x_a - next_x[bucket]) * (y_values[start:end] - y_a)
+                       - (x_a - x_values[start:end]) * (next_y[bucket] - y_a))
+        selected = start + int(np.argmax(np.nan_to_num(areas, nan=-1.0)))
+        indices[bucket + 1] = selected
+    return indices
+
+
+def reduce_series(x_values, y_values, pixel_width: int, method: str | None = DEFAULT_DOWNSAMPLE):
+    """
+    Egy sorozat ritkítása a tengely szélességének megfelelő pontszámra, ha a sorozat hosszabb a
+    DOWNSAMPLE_THRESHOLD értéknél. Csak növekvő, szám vagy dátum x értékek esetén ritkít.
+    :param x_values: x értékek
+    :param y_values: y értékek
+    :param pixel_width: a tengely szélessége képpontban
+    :param method: a DOWNSAMPLE_METHODS egyike, vagy None, ekkor nem ritkít
+    :return: (x értékek, y értékek, ritkítva lett-e) hármas
+    """
+    if method is not None and method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Ismeretlen ritkítási módszer: {method}. Választható: {', '.join(DOWNSAMPLE_METHODS)}.")
+    if method is None or len(y_values) <= max(DOWNSAMPLE_THRESHOLD, BUCKETS_PER_PIXEL * pixel_width):
+        return x_values, y_values, False
+    x_array = np.asarray(x_values)
+    try:
+        x_numeric = numeric_values(x_array)
+    except (TypeError, ValueError):
+        return x_values, y_values, False  # pl. szöveges x értékek, nem ritkítható
+    if not (np.diff(x_numeric) >= 0).all():
+        return x_values, y_values, False  # nem idősor jellegű adat, a sorrend nem bontható szakaszokra
+    y_array = np.asarray(y_values, dtype=np.float64)
+    if method == "minmax":
+        indices = minmax_indices(y_array, BUCKETS_PER_PIXEL * pixel_width)
+    else:
+        indices = lttb_indices(x_numeric, y_array, BUCKETS_PER_PIXEL * pixel_width)
+    metrics.count("diagrams_downsampled_points", len(y_array) - len(indices), method=method)
+    return x_array[indices], y_array[indices], True
+
+
+def plot_series(ax, x_values, y_values, downsample: str | None = DEFAULT_DOWNSAMPLE, scatter: bool = False, **kwargs):
+    """
+    Egy sorozat kirajzolása a tengelyre vonalként vagy pontokként, nagy sorozat esetén előtte ritkítva.
+    A ritkított vonalak jelölők (marker) nélkül rajzolódnak, mert azok ennyi pontnál csak egy összefolyó foltot
+    adnának. A nem ritkítható (pl. szöveges vagy nem növekvő x értékű) sorozatok jelölői megmaradnak.
+    :param ax: a tengely
+    :param x_values: x értékek
+    :param y_values: y értékek
+    :param downsample: a ritkítás módszere, vagy None
+    :param scatter: True esetén pontdiagram, egyébként vonal
+    :param kwargs: a plot vagy scatter további paraméterei
+    :return: a létrehozott artist(ok)
+    """
+    x_values, y_values, reduced = reduce_series(x_values, y_values, axes_pixel_width(ax), downsample)
+    if scatter:
+        return ax.scatter(x_values, y_values, **kwargs)
+    if reduced:
+        kwargs.pop("marker", None)
+    return ax.plot(x_values, y_values, **kwargs)
+
+
+def draw_line_diagram(x_values, y_columns, colors=None, x_label="", y_label="", title="",
+                      downsample: str | None = DEFAULT_DOWNSAMPLE) -> Figure:
+    """
+    Vonaldiagram létrehozása, megjelenítés nélkül
     :param x_values: x tengely értékei (pl. 1991)
     :param y_columns: y tengely értékei, egyszerre több is (pl. 1991-ben hány diák volt, hány tanár volt, hány osztályterem volt)
     :param colors: opcionális lista a színek neveivel, ezek sorban használhatóak, ha a lista ki van töltve
     :param x_label: x tengely felirata
     :param y_label: y tengely felirata
     :param title: opcionálisan a diagram címsora
+    :param downsample: a nagy sorozatok ritkításának módszere (DOWNSAMPLE_METHODS), None esetén minden pont kirajzolásra kerül
+    :return: a diagram (Figure objektum)
     """
     if colors is None:  # ha colors lista nincs kitöltve, akkor kap egy üres lista default értéket
         colors = []
     num_colors = len(colors)  # színek száma
-    plt.figure(figsize=(10, 5))  # diagram létrehozása
+    fig = plt.figure(figsize=(10, 5))  # diagram létrehozása
+    ax = fig.add_subplot()
     for idx, y_column_name in enumerate(
             y_columns):  # az y oszlopokon végigiterál és az indexeket és az oszlopneveket elkéri
         y_values = y_columns[y_column_name]  # y_values nevű változóba belerakja a tényleges értékeket
         if num_colors > 0:  # ha van színlista, akkor onnan veszi a következő színt
-            plt.plot(x_values, y_values, marker='o', linestyle='-', color=colors[idx % num_colors],
-                     label=y_column_name)  # kirajzolja a diagramot a következő megadott színnel
+            plot_series(ax, x_values, y_values, downsample, marker='o', linestyle='-', color=colors[idx % num_colors],
+                        label=y_column_name)  # kirajzolja a diagramot a következő megadott színnel
         else:
-            plt.plot(x_values, y_values, marker='o', linestyle='-',
-                     label=y_column_name)  # kirajzolja a diagramot a következő default színnel
+            plot_series(ax, x_values, y_values, downsample, marker='o', linestyle='-',
+                        label=y_column_name)  # kirajzolja a diagramot a következő default színnel
     if not title and x_label and y_label:  # ha nincs megadva title, de az x és y label igen, akkor abból egy alapértelmezett title beállítása
         title = f'Vonaldiagram: {x_label} vs {y_label}'
     set_diagram_labels(x_label, y_label, title)  # label-ket beállító függvény meghívása
     plt.grid(True)  # hálós megjelenítés bekapcsolása
     plt.legend()  # jelmagyarázat beállítása, a ponthalmaz neve
-    go_max()  # maximalizálja a megnyíló ablakot
-    plt.show()  # megjeleníti a diagramot, és megállítja a program futását amíg az ablak bezárásra nem kerül
+    return fig  # a kész diagram, a megjelenítést vagy a mentést a hívó végzi
 
 
-def show_multiline_diagram(x_values, y_columns, x_label="") -> None:
+def draw_multiline_diagram(x_values, y_columns, x_label="", downsample: str | None = DEFAULT_DOWNSAMPLE) -> Figure:
     """
-    Több vonaldiagram létrehozása és kirajzolása egymás alá
+    Több vonaldiagram létrehozása egymás alá, megjelenítés nélkül
     :param x_values: x tengely értékei (pl. 1991)
     :param y_columns: y tengely értékei, egyszerre több is (pl. 1991-ben hány diák volt, hány tanár volt, hány osztályterem volt)
     :param x_label: x tengely felirata
     :param y_label: y tengely felirata
     :param title: opcionálisan a diagram címsora
+    :param downsample: a nagy sorozatok ritkításának módszere (DOWNSAMPLE_METHODS), None esetén minden pont kirajzolásra kerül
+    :return: a diagram (Figure objektum)
     """
     fig_row_count = y_columns.shape[1]  # a pandas oszlopainak (diagram sorainak és vonalainak) a száma
     fig, axs = plt.subplots(ncols=1, nrows=fig_row_count, figsize=(10, 5), layout='constrained')  # diagram létrehozása
@@ -86,7 +234,7 @@ def show_multiline_diagram(x_values, y_columns, x_label="") -> None:
         # y_values nevű változóba belerakja a tényleges értékeket
         y_values = y_columns[y_column_name]
         # kirajzolja a diagramot a következő default színnel
-        current_axis.plot(x_values, y_values, marker='o', linestyle='-', label=y_column_name)
+        plot_series(current_axis, x_values, y_values, downsample, marker='o', linestyle='-', label=y_column_name)
         y_label = y_column_name
         title = f'Vonaldiagram: {x_label} vs {y_label}'
         current_axis.set_xlabel(x_label)
@@ -95,19 +243,19 @@ def show_multiline_diagram(x_values, y_columns, x_label="") -> None:
         current_axis.grid(True)  # hálós megjelenítés bekapcsolása
         current_axis.legend()  # jelmagyarázat beállítása, a ponthalmaz neve
 
-    go_max()  # maximalizálja a megnyíló ablakot
-    plt.show()  # megjeleníti a diagramot, és megállítja a program futását amíg az ablak bezárásra nem kerül
+    return fig  # a kész diagram, a megjelenítést vagy a mentést a hívó végzi
 
 
-def show_scatter_diagram(x_values, y_values, x_label="", y_label="", title="", swap_x=False) -> None:
+def draw_scatter_diagram(x_values, y_values, x_label="", y_label="", title="", swap_x=False) -> Figure:
     """
-    Pontdiagram létrehozása és kirajzolása
+    Pontdiagram létrehozása, megjelenítés nélkül
     :param x_values: x tengely értékei (pl. 1991)
     :param y_values: y tengely értékei (pl. 1991-ben 1124098 diák volt)
     :param x_label: x tengely felirata
     :param y_label: y tengely felirata
     :param title: opcionálisan a diagram címsora
     :param swap_x: x tengely számozásának tükrözése
+    :return: a diagram (Figure objektum)
     """
     fig = plt.figure(figsize=(10, 5))  # új diagram készítése 10 a mérete vízszintes és 5 a függőleges irányban
 
@@ -122,18 +270,20 @@ def show_scatter_diagram(x_values, y_values, x_label="", y_label="", title="", s
     set_diagram_labels(x_label, y_label, title)  # label-ket beállító függvény meghívása
     plt.grid(True)  # hálós megjelenítés bekapcsolása
     plt.legend()  # jelmagyarázat beállítása, a ponthalmaz neve
-    go_max()  # maximalizálja a megnyíló ablakot
-    plt.show()  # megjeleníti a diagramot, és megállítja a program futását amíg az ablak bezárásra nem kerül
+    return fig  # a kész diagram, a megjelenítést vagy a mentést a hívó végzi
 
 
-def show_mixed_diagram(x_values, y_columns, title, labels, colors) -> None:
+def draw_mixed_diagram(x_values, y_columns, title, labels, colors,
+                       downsample: str | None = DEFAULT_DOWNSAMPLE) -> Figure:
     """
-    A vonal- és pontdiagramot egyszerre rajzolja ki, de külön tengelyekkel a szemléltetés kedvéért
+    A vonal- és pontdiagramot egyszerre rajzolja meg, de külön tengelyekkel a szemléltetés kedvéért, megjelenítés nélkül
     :param x_values: x tengely értékei (pl. 1991)
     :param y_columns: y tengely értékei, egyszerre több is (pl. 1991-ben hány diák volt, hány tanár volt, hány osztályterem volt)
     :param title: a diagram címsora
     :param labels: tengelyek feliratának listája
     :param colors: lista a színek neveivel, ezek sorban használhatóak
+    :param downsample: a nagy sorozatok ritkításának módszere (DOWNSAMPLE_METHODS), None esetén minden pont kirajzolásra kerül
+    :return: a diagram (Figure objektum)
     """
     num_colors = len(colors)  # színek száma
     fig, ax1 = plt.subplots()  # több diagram egy ábrán való megjelenítése
@@ -150,11 +300,11 @@ def show_mixed_diagram(x_values, y_columns, title, labels, colors) -> None:
             active_axis = ax2  # az új aktív tengely megadása
         y_values = y_columns[y_column_name]  # y_values nevű változóba belerakja a tényleges értékeket
         if idx % 2 == 0:  # a párosadik diagramok pontdiagramok
-            active_axis.scatter(x_values, y_values, marker='x', color=colors[idx % num_colors],
-                                label=y_column_name)  # az ábrához a pontdiagram hozzáadása
+            plot_series(active_axis, x_values, y_values, downsample, scatter=True, marker='x',
+                        color=colors[idx % num_colors], label=y_column_name)  # az ábrához a pontdiagram hozzáadása
         else:  # a páratlanadik diagramok pedig a hozzájuk tartozó vonaldiagramok
-            active_axis.plot(x_values, y_values, linestyle='-', color=colors[idx % num_colors],
-                             label=y_column_name)  # az ábrához a vonaldiagram hozzáadása
+            plot_series(active_axis, x_values, y_values, downsample, linestyle='-', color=colors[idx % num_colors],
+                        label=y_column_name)  # az ábrához a vonaldiagram hozzáadása
         active_axis.set_label(y_column_name)
         active_axis.grid(True)  # hálós megjelenítés bekapcsolása
 
@@ -162,5 +312,444 @@ def show_mixed_diagram(x_values, y_columns, title, labels, colors) -> None:
     ax2.legend(loc='upper right')
 
     plt.title(title)  # cím (title) beállítása
+    return fig  # a kész diagram, a megjelenítést vagy a mentést a hívó végzi
+
+
+def show_figure() -> None:
+    """
+    Az aktuális diagram maximalizált megjelenítése.
+    Megállítja a program futását, amíg az ablak bezárásra nem kerül.
+    """
     go_max()  # maximalizálja a megnyíló ablakot
     plt.show()  # megjeleníti a diagramot, és megállítja a program futását amíg az ablak bezárásra nem kerül
+
+
+def show_line_diagram(x_values, y_columns, colors=None, x_label="", y_label="", title="",
+                      downsample: str | None = DEFAULT_DOWNSAMPLE) -> None:
+    """
+    Vonaldiagram létrehozása és kirajzolása, a paraméterek megegyeznek a draw_line_diagram paramétereivel
+    """
+    draw_line_diagram(x_values, y_columns, colors, x_label, y_label, title, downsample)
+    show_figure()
+
+
+def show_multiline_diagram(x_values, y_columns, x_label="", downsample: str | None = DEFAULT_DOWNSAMPLE) -> None:
+    """
+    Több vonaldiagram létrehozása és kirajzolása egymás alá, a paraméterek megegyeznek a draw_multiline_diagram
+    paramétereivel
+    """
+    draw_multiline_diagram(x_values, y_columns, x_label, downsample)
+    show_figure()
+
+
+def show_scatter_diagram(x_values, y_values, x_label="", y_label="", title="", swap_x=False) -> None:
+    """
+    Pontdiagram létrehozása és kirajzolása, a paraméterek megegyeznek a draw_scatter_diagram paramétereivel
+    """
+    draw_scatter_diagram(x_values, y_values, x_label, y_label, title, swap_x)
+    show_figure()
+
+
+def show_mixed_diagram(x_values, y_columns, title, labels, colors,
+                       downsample: str | None = DEFAULT_DOWNSAMPLE) -> None:
+    """
+    A vonal- és pontdiagramot egyszerre rajzolja ki, a paraméterek megegyeznek a draw_mixed_diagram paramétereivel
+    """
+    draw_mixed_diagram(x_values, y_columns, title, labels, colors, downsample)
+    show_figure()
+
+
+# a diagramtípusok neve és a hozzájuk tartozó rajzoló függvény, a kötegelt feladatok ezekre hivatkoznak
+DRAW_FUNCTIONS = {
+    "line": draw_line_diagram,
+    "multiline": draw_multiline_diagram,
+    "scatter": draw_scatter_diagram,
+    "mixed": draw_mixed_diagram,
+}
+
+
+def chart_job(kind: str, name: str, *args, **kwargs) -> dict:
+    """
+    Egy kötegelt rajzolási feladat összeállítása
+    :param kind: a diagram típusa, a DRAW_FUNCTIONS egyik kulcsa
+    :param name: a kimeneti file neve, kiterjesztés nélkül
+    :param args: a rajzoló függvény paraméterei
+    :param kwargs: a rajzoló függvény kulcsszavas paraméterei
+    :return: a feladat leírása
+    """
+    if kind not in DRAW_FUNCTIONS:
+        raise ValueError(f"Ismeretlen diagramtípus: {kind}. Választható: {', '.join(DRAW_FUNCTIONS)}.")
+    return {"kind": kind, "name": name, "args": args, "kwargs": kwargs}
+
+
+def show_job(job: dict) -> None:
+    """
+    Egy rajzolási feladat interaktív megjelenítése
+    :param job: a chart_job által összeállított feladat
+    """
+    with metrics.timer("diagrams_render_seconds", chart=job["name"], kind=job["kind"]):
+        DRAW_FUNCTIONS[job["kind"]](*job["args"], **job["kwargs"])  # csak a rajzolás mérése, a megjelenítésé nem
+    show_figure()
+
+
+def save_job(job: dict, out_dir: str, formats=("png",)) -> list[str]:
+    """
+    Egy rajzolási feladat elkészítése és kimentése a megadott formátumokban.
+    A diagram a mentés után bezárásra kerül, így nem marad a memóriában.
+    :param job: a chart_job által összeállított feladat
+    :param out_dir: a kimeneti könyvtár
+    :param formats: a kimeneti formátumok, a BATCH_FORMATS elemei közül
+    :return: a létrehozott file-ok nevei
+    """
+    with metrics.timer("diagrams_render_seconds", chart=job["name"], kind=job["kind"]):
+        fig = DRAW_FUNCTIONS[job["kind"]](*job["args"], **job["kwargs"])
+        file_names = []
+        try:
+            for file_format in formats:
+                file_name = os.path.join(out_dir, f"{job['name']}.{file_format}")
+                fig.savefig(file_name, format=file_format)
+                file_names.append(file_name)
+        finally:
+            plt.close(fig)  # a diagram lezárása, a memória felszabadítása
+    return file_names
+
+
+def render_job(job: dict, file_format: str = "png") -> bytes:
+    """
+    Egy rajzolási feladat elkészítése a memóriába, file írása nélkül (pl. HTTP válaszhoz)
+    :param job: a chart_job által összeállított feladat
+    :param file_format: a kimeneti formátum, a BATCH_FORMATS egyike
+    :return: a kép tartalma
+    """
+    with metrics.timer("diagrams_render_seconds", chart=job["name"], kind=job["kind"]):
+        fig = DRAW_FUNCTIONS[job["kind"]](*job["args"], **job["kwargs"])
+        buffer = BytesIO()
+        try:
+            fig.savefig(buffer, format=file_format)
+        finally:
+            plt.close(fig)  # a diagram lezárása, a memória felszabadítása
+    return buffer.getvalue()
+
+
+def timed_save_job(job: dict, out_dir: str, formats=("png",)) -> tuple[list[str], float, float]:
+    """
+    A save_job futtatása munkafolyamatban, a futásidő visszaadásával, hogy a szülőfolyamat rögzíthesse
+    :param job: a chart_job által összeállított feladat
+    :param out_dir: a kimeneti könyvtár
+    :param formats: a kimeneti formátumok
+    :return: (a létrehozott file-ok nevei, a kezdés időpontja, az eltelt idő másodpercben)
+    """
+    start, counter = time.time(), time.perf_counter()
+    file_names = save_job(job, out_dir, formats)
+    return file_names, start, time.perf_counter() - counter
+
+
+def use_batch_backend() -> None:
+    """
+    Átváltás a megjelenítő nélküli backendre, a kötegelt mód folyamatai induláskor hívják meg
+    """
+    plt.switch_backend(BATCH_BACKEND)
+
+
+def init_batch_worker() -> None:
+    """
+    A kötegelt mód munkafolyamatainak inicializálása: megjelenítő nélküli backend, és a szülőtől örökölt
+    mérőpontok kikapcsolása (a futásidőket a szülőfolyamat rögzíti)
+    """
+    use_batch_backend()
+    metrics.disable(close=False)
+
+
+def render_batch(jobs: list[dict], out_dir: str, formats=("png",), max_workers: int | None = None) -> list[str]:
+    """
+    Több diagram kötegelt, megjelenítés nélküli elkészítése és kimentése file-okba.
+    A diagramok egymástól függetlenek, ezért több folyamatban párhuzamosan készülnek.
+    :param jobs: a chart_job által összeállított feladatok listája
+    :param out_dir: a kimeneti könyvtár, ha nem létezik, létrehozza
+    :param formats: a kimeneti formátumok, a BATCH_FORMATS elemei közül
+    :param max_workers: a folyamatok száma, alapértelmezetten a processzormagok száma, 1 esetén nem indít új folyamatot
+    :return: a létrehozott file-ok nevei
+    """
+    for file_format in formats:
+        if file_format not in BATCH_FORMATS:
+            raise ValueError(f"Ismeretlen formátum: {file_format}. Választható: {', '.join(BATCH_FORMATS)}.")
+    os.makedirs(out_dir, exist_ok=True)
+
+    if max_workers == 1:
+        use_batch_backend()
+        results = [save_job(job, out_dir, formats) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_batch_worker) as executor:
+            results = []
+            for job, (file_names, start, seconds) in zip(jobs, executor.map(
+                    timed_save_job, jobs, [out_dir] * len(jobs), [formats] * len(jobs))):
+                metrics.record_timer("diagrams_render_seconds", seconds, start, chart=job["name"], kind=job["kind"])
+                results.append(file_names)
+    return [file_name for file_names in results for file_name in file_names]
+
+
+class ReusableChart:
+    """
+    Újrafelhasználható diagram ismételt, megjelenítés nélküli frissítéshez.
+    A Figure, a tengelyek, a feliratok és a jelmagyarázat csak egyszer készülnek el, frissítéskor csak az adatokat
+    tartalmazó artistok (vonalak, pontok) kapnak új adatot a set_data / set_offsets metódusokkal.
+    Ha a tengelyek határai nem változnak, a statikus háttér egy elmentett képből kerül vissza (blitting),
+    és csak az adatokat tartalmazó artistok rajzolódnak újra. Ha változnak, a teljes diagram újrarajzolódik.
+    A nagy sorozatok frissítéskor a draw_* függvényekhez hasonlóan ritkításra kerülnek (reduce_series).
+    A diagram nem kerül a pyplot nyilvántartásába, így nem kell bezárni.
+    """
+
+    def __init__(self, figsize=(10, 5), autoscale: bool = True, downsample: str | None = None):
+        """
+        :param figsize: a diagram mérete hüvelykben
+        :param autoscale: True esetén minden frissítéskor az adatokhoz igazítja a tengelyeket,
+                          False esetén az első kirajzoláskor beállított határok maradnak, így mindig blittinggel frissít
+        :param downsample: a nagy sorozatok ritkításának módszere (DOWNSAMPLE_METHODS), vagy None
+        """
+        self.fig = Figure(figsize=figsize)
+        self.canvas = FigureCanvasAgg(self.fig)  # saját, megjelenítő nélküli canvas
+        self.autoscale = autoscale
+        self.downsample = downsample
+        self.artists = {}  # az adatokat tartalmazó artistok, névvel
+        self.markers = {}  # a vonalak eredeti jelölője, a ritkítás nélküli frissítésekhez
+        self.data = {}  # az artistok utoljára beállított adatai, a változás felismeréséhez
+        self.background = None  # a statikus háttér elmentett képe
+        self.full_draws = 0  # a teljes újrarajzolások száma
+        self.blits = 0  # a csak az adatokat újrarajzoló frissítések száma
+
+    def add_artist(self, name: str, artist) -> None:
+        """
+        Egy adatokat tartalmazó artist nyilvántartásba vétele.
+        Az artist animated jelzést kap, így a teljes rajzolás kihagyja, és a háttér képe nélküle készül el.
+        :param name: az artist neve (pl. az oszlop neve)
+        :param artist: a Line2D vagy PathCollection objektum
+        """
+        artist.set_animated(True)
+        self.artists[name] = artist
+        if hasattr(artist, "get_marker"):
+            self.markers[name] = artist.get_marker()
+
+    def set_artist_data(self, name: str, x_values, y_values) -> bool:
+        """
+        Egy artist adatainak frissítése, ha azok változtak. Nagy sorozat esetén a ritkított adat kerül az artistba,
+        a ritkított vonalak pedig jelölők nélkül rajzolódnak.
+        :param name: az artist neve
+        :param x_values: x értékek
+        :param y_values: y értékek
+        :return: True, ha az adat változott
+        """
+        artist = self.artists[name]
+        x_values, y_values, reduced = reduce_series(x_values, y_values, axes_pixel_width(artist.axes),
+                                                    self.downsample)
+        if name in self.markers:  # vonal: a jelölők csak a ritkítás nélküli sorozatoknál látszanak
+            artist.set_marker("None" if reduced else self.markers[name])
+        data = np.column_stack([np.asarray(x_values, dtype=np.float64), np.asarray(y_values, dtype=np.float64)])
+        previous = self.data.get(name)
+        if previous is not None and np.array_equal(previous, data):
+            return False  # ugyanaz az adat, nincs teendő
+        if hasattr(artist, "set_offsets"):
+            artist.set_offsets(data)  # pontdiagram
+        else:
+            artist.set_data(data[:, 0], data[:, 1])  # vonaldiagram
+        self.data[name] = data
+        return True
+
+    def rescale(self) -> bool:
+        """
+        A tengelyek határainak igazítása az aktuális adatokhoz
+        :return: True, ha valamelyik tengely határai megváltoztak
+        """
+        changed = False
+        for ax in self.fig.axes:
+            limits = (ax.get_xlim(), ax.get_ylim())
+            ax.relim()  # a vonalak alapján (a pontdiagramokat a relim nem veszi figyelembe)
+            for artist in self.artists.values():
+                if artist.axes is ax and hasattr(artist, "get_offsets"):
+                    ax.update_datalim(artist.get_offsets())  # a pontdiagramok hozzáadása
+            ax.autoscale_view()
+            changed = changed or limits != (ax.get_xlim(), ax.get_ylim())
+        return changed
+
+    def render(self, changed: bool = True) -> None:
+        """
+        A diagram frissítése a canvason. Ha nem változott adat, nem csinál semmit.
+        :param changed: változott-e valamelyik artist adata
+        """
+        if not changed and self.background is not None:
+            return  # nincs mit újrarajzolni
+        # az első kirajzoláskor a tengelyek mindig az adatokhoz igazodnak, különben üres lenne a rögzített diagram
+        limits_changed = (self.autoscale or self.background is None) and self.rescale()
+        if self.background is None or limits_changed:
+            self.canvas.draw()  # teljes rajzolás az animated artistok nélkül
+            self.background = self.canvas.copy_from_bbox(self.fig.bbox)  # a statikus háttér elmentése
+            self.full_draws += 1
+            metrics.count("diagrams_chart_draws", chart=type(self).__name__, mode="full")
+        else:
+            self.canvas.restore_region(self.background)  # a háttér visszamásolása, szöveg és tengelyek újraszámolása nélkül
+            self.blits += 1
+            metrics.count("diagrams_chart_draws", chart=type(self).__name__, mode="blit")
+        for artist in self.artists.values():
+            self.fig.draw_artist(artist)  # csak az adatokat tartalmazó artistok rajzolása
+
+    def save(self, file_name) -> None:
+        """
+        Az aktuális kép kimentése png formátumban, a canvas tartalmából, újrarajzolás nélkül
+        :param file_name: a file neve kiterjesztéssel együtt, vagy egy írható file objektum (pl. BytesIO)
+        """
+        if self.background is None:
+            self.render()
+        imsave(file_name, np.asarray(self.canvas.buffer_rgba()), format="png")
+
+
+class LineChart(ReusableChart):
+    """
+    Újrafelhasználható vonaldiagram, a draw_line_diagram megfelelője
+    """
+
+    def __init__(self, column_names, colors=None, x_label="", y_label="", title="", autoscale: bool = True,
+                 downsample: str | None = DEFAULT_DOWNSAMPLE):
+        """
+        :param column_names: az y oszlopok nevei, oszloponként egy vonal készül
+        :param colors: opcionális lista a színek neveivel, ezek sorban használhatóak, ha a lista ki van töltve
+        :param x_label: x tengely felirata
+        :param y_label: y tengely felirata
+        :param title: opcionálisan a diagram címsora
+        :param autoscale: lásd ReusableChart
+        :param downsample: lásd ReusableChart
+        """
+        super().__init__(autoscale=autoscale, downsample=downsample)
+        ax = self.fig.add_subplot()
+        for idx, column_name in enumerate(column_names):
+            color = colors[idx % len(colors)] if colors else None  # színlista hiányában a default szín
+            line, = ax.plot([], [], marker='o', linestyle='-', color=color, label=column_name)
+            self.add_artist(column_name, line)
+        if not title and x_label and y_label:  # alapértelmezett title, ahogy a draw_line_diagram esetén
+            title = f'Vonaldiagram: {x_label} vs {y_label}'
+        ax.set(title=title, xlabel=x_label, ylabel=y_label)
+        ax.grid(True)  # hálós megjelenítés bekapcsolása
+        ax.legend()  # jelmagyarázat beállítása
+
+    def update(self, x_values, y_columns) -> None:
+        """
+        A vonalak adatainak cseréje és a diagram frissítése
+        :param x_values: x tengely értékei
+        :param y_columns: y tengely értékei, oszloponként, a konstruktorban megadott oszlopnevekkel
+        """
+        changed = [self.set_artist_data(name, x_values, y_columns[name]) for name in self.artists]
+        self.render(any(changed))
+
+
+class ScatterChart(ReusableChart):
+    """
+    Újrafelhasználható pontdiagram, a draw_scatter_diagram megfelelője
+    """
+
+    def __init__(self, x_label="", y_label="", title="", swap_x=False, autoscale: bool = True):
+        """
+        :param x_label: x tengely felirata
+        :param y_label: y tengely felirata
+        :param title: opcionálisan a diagram címsora
+        :param swap_x: x tengely számozásának tükrözése
+        :param autoscale: lásd ReusableChart
+        """
+        super().__init__(autoscale=autoscale)
+        ax = self.fig.add_subplot()
+        self.add_artist("points", ax.scatter([], [], marker='x', label=y_label))
+        if not title and x_label and y_label:  # alapértelmezett title, ahogy a draw_scatter_diagram esetén
+            title = f'Pontdiagram: {x_label} vs {y_label}'
+        if swap_x:
+            ax.invert_xaxis()  # x tengely megfordítása ha arra van szükség
+        ax.set(title=title, xlabel=x_label, ylabel=y_label)
+        ax.grid(True)  # hálós megjelenítés bekapcsolása
+        ax.legend()  # jelmagyarázat beállítása
+
+    def update(self, x_values, y_values) -> None:
+        """
+        A pontok cseréje és a diagram frissítése
+        :param x_values: x tengely értékei
+        :param y_values: y tengely értékei
+        """
+        self.render(self.set_artist_data("points", x_values, y_values))
+
+
+class MixedChart(ReusableChart):
+    """
+    Újrafelhasználható, kéttengelyes vonal- és pontdiagram, a draw_mixed_diagram megfelelője
+    """
+
+    def __init__(self, column_names, title, labels, colors, autoscale: bool = True,
+                 downsample: str | None = DEFAULT_DOWNSAMPLE):
+        """
+        :param column_names: az y oszlopok nevei, a páros indexűek pontdiagramok, a páratlanok vonalak,
+                             az első felük a bal, a második felük a jobb tengelyhez tartozik
+        :param title: a diagram címsora
+        :param labels: tengelyek feliratának listája
+        :param colors: lista a színek neveivel, ezek sorban használhatóak
+        :param autoscale: lásd ReusableChart
+        :param downsample: lásd ReusableChart
+        """
+        # a draw_mixed_diagram a plt.subplots alapértelmezett méretével rajzol, így a kép mérete megegyezik vele
+        super().__init__(figsize=plt.rcParams["figure.figsize"], autoscale=autoscale, downsample=downsample)
+        ax1 = self.fig.add_subplot()
+        ax2 = ax1.twinx()  # közös x tengely, külön y tengely
+        for ax, label, color in zip([ax1, ax2], labels, colors[::2]):
+            ax.set_ylabel(label, color=color)  # címke és szín beállítása, így a számok is színesek
+            ax.tick_params(axis='y', labelcolor=color)
+        for idx, column_name in enumerate(column_names):
+            active_axis = ax2 if idx >= len(column_names) // 2 else ax1  # a felénél tengelyt vált
+            color = colors[idx % len(colors)]
+            if idx % 2 == 0:  # a párosadik diagramok pontdiagramok
+                artist = active_axis.scatter([], [], marker='x', color=color, label=column_name)
+            else:  # a páratlanadik diagramok pedig a hozzájuk tartozó vonaldiagramok
+                artist, = active_axis.plot([], [], linestyle='-', color=color, label=column_name)
+            self.add_artist(column_name, artist)
+            active_axis.grid(True)  # hálós megjelenítés bekapcsolása
+        ax1.legend(loc='lower left')  # jelmagyarázat beállítása a két sarokba
+        ax2.legend(loc='upper right')
+        ax1.set_title(title)
+
+    def update(self, x_values, y_columns) -> None:
+        """
+        Az összes sorozat cseréje és a diagram frissítése
+        :param x_values: x tengely értékei
+        :param y_columns: y tengely értékei, oszloponként, a konstruktorban megadott oszlopnevekkel
+        """
+        changed = [self.set_artist_data(name, x_values, y_columns[name]) for name in self.artists]
+        self.render(any(changed))
+
+
+# a draw_* függvények újrafelhasználható megfelelői, a konstruktorok a draw_* paramétereit kapják az adatok nélkül
+REUSABLE_CHARTS = {"line": LineChart, "scatter": ScatterChart, "mixed": MixedChart}
+_reused_charts = {}  # a folyamatban megtartott diagramok: a feladat neve -> (a statikus paraméterek kulcsa, diagram)
+
+
+def render_reused(job: dict) -> bytes:
+    """
+    Egy rajzolási feladat elkészítése png formátumban a memóriába, a folyamatban korábban azonos néven és
+    paraméterekkel elkészített diagram újrafelhasználásával: csak az adatok cserélődnek (ReusableChart).
+    A hosszan futó munkafolyamatok (pl. a service rajzolói) így minden újratöltés után ugyanazt a Figure-t
+    frissítik. A nem újrafelhasználható típusok (multiline) a render_job szerint készülnek.
+    :param job: a chart_job által összeállított feladat
+    :return: a kép tartalma png formátumban
+    """
+    if job["kind"] not in REUSABLE_CHARTS:
+        return render_job(job, "png")
+    bound = inspect.signature(DRAW_FUNCTIONS[job["kind"]]).bind(*job["args"], **job["kwargs"])
+    bound.apply_defaults()
+    options = dict(bound.arguments)
+    x_values = options.pop("x_values")
+    if "y_columns" in options:
+        data = options.pop("y_columns")
+        options["column_names"] = list(data)
+    else:
+        data = options.pop("y_values")
+    key = (job["kind"], repr(sorted(options.items())))  # a feliratok, színek és oszlopnevek
+    cached = _reused_charts.get(job["name"])
+    if cached is None or cached[0] != key:
+        cached = _reused_charts[job["name"]] = (key, REUSABLE_CHARTS[job["kind"]](**options))
+    chart = cached[1]
+    with metrics.timer("diagrams_render_seconds", chart=job["name"], kind=job["kind"]):
+        chart.update(x_values, data)
+        buffer = BytesIO()
+        chart.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,164 @@
+"""
+Több KSH STADAT táblázat párhuzamos letöltése közös kapcsolatkészlettel (connection pool).
+A letöltött file-ok mellé egy .meta.json file kerül az ETag és Last-Modified fejlécekkel, így a következő
+letöltéskor feltételes kérés megy ki, és a szerver 304-es válasza esetén nem kell újra letölteni a táblázatot.
+A tartalom darabonként, közvetlenül a lemezre íródik, nem kerül egészében a memóriába.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+DEFAULT_TIMEOUT = 30  # másodperc, a kapcsolódásra és két adatcsomag közötti várakozásra
+DEFAULT_WORKERS = 8  # egyszerre futó letöltések száma
+CHUNK_SIZE = 1 << 16  # a lemezre írt darabok mérete bájtban
+META_EXTENSION = "meta.json"  # a letöltési adatokat tartalmazó file kiterjesztése
+
+
+def create_session(pool_size: int = DEFAULT_WORKERS) -> requests.Session:
+    """
+    HTTP session létrehozása, amelynek kapcsolatkészlete elég nagy az egyszerre futó letöltésekhez
+    :param pool_size: a kapcsolatkészlet mérete hostonként
+    :return: a session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def target_file_name(url: str, target_dir: str) -> str:
+    """
+    A letöltött file helye, a URL utolsó tagja alapján (pl. okt0008.csv)
+    :param url: a letöltendő file URL-je
+    :param target_dir: a célkönyvtár
+    :return: a file teljes neve
+    """
+    file_name = os.path.basename(urlparse(url).path)
+    if not file_name:
+        raise ValueError(f"A URL-ből nem állapítható meg a file neve: {url}")
+    return os.path.join(target_dir, file_name)
+
+
+def load_metadata(file_name: str) -> dict:
+    """
+    Egy korábbi letöltés adatainak (URL, ETag, Last-Modified, kódolás) beolvasása
+    :param file_name: a letöltött file teljes neve
+    :return: a letöltés adatai, vagy üres dictionary, ha nincs ilyen, vagy a letöltött file hiányzik
+    """
+    if not os.path.exists(file_name):
+        return {}  # a file nélkül a metaadat sem használható
+    try:
+        with open(f"{file_name}.{META_EXTENSION}", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_metadata(metadata: dict, file_name: str) -> None:
+    """
+    A letöltés adatainak kiírása egy ideiglenes file-on keresztül, így egy félbeszakadt írás nem hagy hibás
+    metaadatot (a ksh_data.write_json_atomic mintájára)
+    :param metadata: a letöltés adatai (URL, ETag, Last-Modified, kódolás)
+    :param file_name: a letöltött file teljes neve
+    """
+    meta_name = f"{file_name}.{META_EXTENSION}"
+    temp_name = f"{meta_name}.tmp"
+    with open(temp_name, "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+    os.replace(temp_name, meta_name)  # az átnevezés atomi, a régi tartalmat egy lépésben cseréli le
+
+
+def download_file(session: requests.Session, url: str, target_dir: str, timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """
+    Egy file letöltése a lemezre, feltételes kéréssel, ha korábban már le lett töltve.
+    Hiba esetén FileNotFoundError kivételt dob.
+    :param session: a használt HTTP session
+    :param url: a letöltendő file URL-je
+    :param target_dir: a célkönyvtár
+    :param timeout: időkorlát másodpercben
+    :return: a letöltés eredménye: url, path, status ("downloaded" vagy "not_modified"), bytes,
+             encoding (a szerver által megadott kódolás, vagy None)
+    """
+    file_name = target_file_name(url, target_dir)
+    metadata = load_metadata(file_name)
+    headers = {}
+    if metadata.get("url") == url:  # csak ugyanarról a címről származó file-t validál újra
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+
+    with metrics.timer("ksh_download_seconds", url=url), \
+            session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        status_code = response.status_code
+        if status_code == 304:  # HTTP 304 Not Modified, a meglévő file érvényes
+            metrics.count("ksh_download_not_modified", url=url)
+            return {"url": url, "path": file_name, "status": "not_modified", "bytes": 0,
+                    "encoding": metadata.get("encoding")}
+        if status_code != 200:  # HTTP 200 OK
+            raise FileNotFoundError(f"Hiba, a URL-ről nem elérhető az adat: {url}. Hibakód: {status_code}.")
+
+        temp_name = f"{file_name}.part"
+        size = 0
+        try:
+            with open(temp_name, "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):  # darabonkénti írás a lemezre
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(temp_name, file_name)  # a kész file egy lépésben kerül a helyére
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)  # a félbeszakadt letöltés nem marad a lemezen
+            raise
+        metrics.count("ksh_download_bytes", size, url=url)
+
+        # a kódolás csak akkor kerül mentésre, ha a szerver megadta, a requests szöveges típusnál
+        # egyébként ISO-8859-1-et feltételez, ami az utf-8 file-ok olvasását elrontaná
+        declared = "charset" in response.headers.get("Content-Type", "").lower()
+        metadata = {"url": url, "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "encoding": response.encoding if declared else None}
+    save_metadata(metadata, file_name)
+    return {"url": url, "path": file_name, "status": "downloaded", "bytes": size, "encoding": metadata["encoding"]}
+
+
+def download_many(urls: list[str], target_dir: str, max_workers: int = DEFAULT_WORKERS,
+                  timeout: float = DEFAULT_TIMEOUT, session: requests.Session | None = None) -> dict[str, dict]:
+    """
+    Több file párhuzamos letöltése egy közös sessionnel.
+    Ha bármelyik letöltés sikertelen, a kivételt továbbdobja. Az ismétlődő URL-ek egyszer töltődnek le, az azonos
+    file-névre mentődő különböző URL-ek (pl. a hu/ és en/ okt0008.csv) esetén ValueError kivételt dob, mielőtt
+    bármelyik letöltés elindulna, mert egymás .part és .meta.json file-jait írnák felül.
+    :param urls: a letöltendő file-ok URL-jei
+    :param target_dir: a célkönyvtár, ha nem létezik, létrehozza
+    :param max_workers: egyszerre futó letöltések száma
+    :param timeout: időkorlát másodpercben, letöltésenként
+    :param session: opcionálisan egy meglévő session, alapértelmezetten újat hoz létre
+    :return: URL-enként a download_file eredménye
+    """
+    urls = list(dict.fromkeys(urls))  # az ismétlődő URL-ek egyszer
+    targets = {}
+    for url in urls:
+        targets.setdefault(target_file_name(url, target_dir), []).append(url)
+    conflicts = [", ".join(same) for same in targets.values() if len(same) > 1]
+    if conflicts:
+        raise ValueError(f"Több URL ugyanarra a file-névre mentődne, külön célkönyvtár szükséges: "
+                         f"{'; '.join(conflicts)}")
+    os.makedirs(target_dir, exist_ok=True)
+    own_session = session is None
+    if own_session:
+        session = create_session(max_workers)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {url: executor.submit(download_file, session, url, target_dir, timeout) for url in urls}
+            return {url: future.result() for url, future in futures.items()}
+    finally:
+        if own_session:
+            session.close()
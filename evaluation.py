@@ -0,0 +1,172 @@
+"""
+A lineáris modellek hibájának becslése keresztvalidációval (k-fold, ismételt k-fold, leave-one-out) és bootstrap
+konfidenciaintervallummal, MAE és RMSE mérőszámokkal.
+Az ismétlések egymástól függetlenek, ezért darabokra osztva több folyamatban futnak. A bemeneti oszlopok egy
+közös (shared memory) memóriaterületre kerülnek, így nem kell őket minden feladathoz újra átküldeni.
+Minden ismétlés saját, a seedből és az ismétlés sorszámából képzett véletlenszám-generátort használ, ezért az
+eredmény ugyanaz, akárhány folyamat számolja.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import models
+
+SCHEMES = ("kfold", "repeated_kfold", "loo", "bootstrap")  # a választható becslési módszerek
+REPETITIONS_PER_TASK = 128  # egy feladatban kiértékelt ismétlések maximális száma
+MAX_CHUNK_CELLS = 4_000_000  # egy feladat súlymátrixának maximális elemszáma, ez korlátozza a memóriahasználatot
+
+_shared_arrays = None  # a munkafolyamatokban a közös memóriaterület és az x, y nézetek
+
+
+def repetition_count(scheme: str, n_samples: int, n_repeats: int) -> int:
+    """
+    Az egymástól független ismétlések száma
+    :param scheme: a becslési módszer, a SCHEMES egyike
+    :param n_samples: az adatsorok száma
+    :param n_repeats: ismételt k-fold és bootstrap esetén az ismétlések száma
+    :return: a k-fold esetén 1, leave-one-out esetén az adatsorok száma, egyébként n_repeats
+    """
+    if scheme == "kfold":
+        return 1
+    if scheme == "loo":
+        return n_samples  # minden sor egyszer kerül a teszthalmazba
+    return n_repeats
+
+
+def scheme_masks(scheme: str, n_samples: int, n_splits: int, seed: int, start: int,
+                 stop: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    A start és stop közötti ismétlésekhez tartozó tanítósúlyok és tesztmaszkok előállítása
+    :param scheme: a becslési módszer, a SCHEMES egyike
+    :param n_samples: az adatsorok száma
+    :param n_splits: k-fold esetén a részek száma
+    :param seed: a véletlenszám-generátor alap seedje
+    :param start: az első ismétlés sorszáma
+    :param stop: az utolsó utáni ismétlés sorszáma
+    :return: (tanítósúlyok, tesztmaszkok) pár, k-fold esetén ismétlésenként n_splits, egyébként egy sorral
+    """
+    if scheme == "loo":
+        test = np.zeros((stop - start, n_samples), dtype=bool)
+        test[np.arange(stop - start), np.arange(start, stop)] = True  # az i-edik ismétlésben az i-edik sor a teszt
+        return ~test, test
+
+    if scheme == "bootstrap":
+        counts = np.zeros((stop - start, n_samples), dtype=np.float64)
+        for row, repetition in enumerate(range(start, stop)):
+            rng = np.random.default_rng([seed, repetition])  # ismétlésenként független, determinisztikus generátor
+            counts[row] = np.bincount(rng.integers(0, n_samples, n_samples), minlength=n_samples)
+        return counts, counts == 0  # visszatevéses minta, a tesztsorok a mintából kimaradtak (out-of-bag)
+
+    test = np.zeros(((stop - start) * n_splits, n_samples), dtype=bool)
+    for row, repetition in enumerate(range(start, stop)):
+        order = np.arange(n_samples)  # k-fold: egymás utáni részek keverés nélkül
+        if scheme == "repeated_kfold":
+            order = np.random.default_rng([seed, repetition]).permutation(n_samples)
+        for fold, indices in enumerate(np.array_split(order, n_splits)):
+            test[row * n_splits + fold, indices] = True
+    return ~test, test
+
+
+def evaluate_chunk(scheme: str, n_splits: int, seed: int, start: int, stop: int,
+                   x_values: np.ndarray | None = None, y_values: np.ndarray | None = None) -> np.ndarray:
+    """
+    Az ismétlések egy darabjának kiértékelése. Munkafolyamatban a közös memóriaterület adatait használja.
+    :param scheme: a becslési módszer, a SCHEMES egyike
+    :param n_splits: k-fold esetén a részek száma
+    :param seed: a véletlenszám-generátor alap seedje
+    :param start: az első ismétlés sorszáma
+    :param stop: az utolsó utáni ismétlés sorszáma
+    :param x_values: x értékek, ha nincs megadva, a közös memóriaterületről
+    :param y_values: y értékek, ha nincs megadva, a közös memóriaterületről
+    :return: (sorok) x 2 méretű tömb, soronként a MAE és az RMSE
+    """
+    if x_values is None:
+        _, x_values, y_values = _shared_arrays
+    train_weights, test_masks = scheme_masks(scheme, len(x_values), n_splits, seed, start, stop)
+    mae, rmse = models.batched_linear_errors(x_values, y_values, train_weights, test_masks)
+    return np.column_stack([mae, rmse])
+
+
+def attach_shared_arrays(name: str, n_samples: int) -> None:
+    """
+    A munkafolyamatok indulásakor meghívva csatlakozik a közös memóriaterülethez
+    :param name: a közös memóriaterület neve
+    :param n_samples: az adatsorok száma
+    """
+    global _shared_arrays
+    shared = shared_memory.SharedMemory(name=name)
+    values = np.ndarray((2, n_samples), dtype=np.float64, buffer=shared.buf)  # másolás nélküli nézet
+    _shared_arrays = (shared, values[0], values[1])
+
+
+def chunk_bounds(repetitions: int, rows_per_repetition: int, n_samples: int) -> list[tuple[int, int]]:
+    """
+    Az ismétlések darabokra osztása. A darabok mérete csak a feladattól függ, a folyamatok számától nem,
+    így a mátrixszorzások minden futásban ugyanazokon a darabokon, bitre azonos eredménnyel történnek.
+    :param repetitions: az ismétlések száma
+    :param rows_per_repetition: egy ismétlés sorainak száma a súlymátrixban
+    :param n_samples: az adatsorok száma
+    :return: (start, stop) párok listája
+    """
+    chunk = min(REPETITIONS_PER_TASK, max(1, MAX_CHUNK_CELLS // (rows_per_repetition * n_samples)))
+    return [(start, min(start + chunk, repetitions)) for start in range(0, repetitions, chunk)]
+
+
+def cross_validate(df: pd.DataFrame, x_col: str, y_col: str, scheme: str = "kfold", n_splits: int = 5,
+                   n_repeats: int = 100, seed: int = 0, confidence: float = 0.95,
+                   max_workers: int | None = None) -> dict:
+    """
+    Lineáris modell hibájának becslése a megadott módszerrel
+    :param df: a megadott DataFrame
+    :param x_col: x oszlop, ami alapján felállítja a modelleket
+    :param y_col: y oszlop, amit próbál prediktálni
+    :param scheme: "kfold", "repeated_kfold", "loo" (leave-one-out) vagy "bootstrap"
+    :param n_splits: k-fold esetén a részek száma, 2 és az adatsorok száma között
+    :param n_repeats: ismételt k-fold és bootstrap esetén az ismétlések száma
+    :param seed: a véletlenszám-generátor alap seedje, ugyanazzal a seeddel az eredmény mindig ugyanaz
+    :param confidence: a konfidenciaintervallum szintje (a mérőszámok eloszlásának percentilisei alapján)
+    :param max_workers: a folyamatok száma, alapértelmezetten a processzormagok száma, 1 esetén nem indít új folyamatot
+    :return: dictionary a mérőszámok átlagával, szórásával, konfidenciaintervallumával és az egyes értékekkel
+    """
+    if scheme not in SCHEMES:
+        raise ValueError(f"Ismeretlen módszer: {scheme}. Választható: {', '.join(SCHEMES)}.")
+    x = df[x_col].to_numpy(dtype=np.float64)  # a bemeneti adatok
+    y = df[y_col].to_numpy(dtype=np.float64)  # az x-ekhez tartozó értékek
+    n_samples = len(x)
+    if scheme in ("kfold", "repeated_kfold") and not 2 <= n_splits <= n_samples:
+        raise ValueError(f"A részek száma (n_splits={n_splits}) legalább 2, és legfeljebb az adatsorok száma "
+                         f"({n_samples}) lehet.")
+    workers = max_workers or os.cpu_count() or 1
+    repetitions = repetition_count(scheme, n_samples, n_repeats)
+    rows_per_repetition = n_splits if scheme in ("kfold", "repeated_kfold") else 1
+    bounds = chunk_bounds(repetitions, rows_per_repetition, n_samples)
+
+    if workers == 1:
+        chunks = [evaluate_chunk(scheme, n_splits, seed, start, stop, x, y) for start, stop in bounds]
+    else:
+        shared = shared_memory.SharedMemory(create=True, size=max(1, 2 * n_samples * 8))
+        try:
+            np.ndarray((2, n_samples), dtype=np.float64, buffer=shared.buf)[:] = [x, y]  # az adatok egyszeri másolása
+            with ProcessPoolExecutor(max_workers=workers, initializer=attach_shared_arrays,
+                                     initargs=(shared.name, n_samples)) as executor:
+                futures = [executor.submit(evaluate_chunk, scheme, n_splits, seed, start, stop)
+                           for start, stop in bounds]
+                chunks = [future.result() for future in futures]  # az ismétlések sorrendjében
+        finally:
+            shared.close()
+            shared.unlink()  # a közös memóriaterület felszabadítása
+
+    scores = np.concatenate(chunks)  # soronként egy kiértékelés (mae, rmse)
+    tail = (1 - confidence) / 2 * 100  # a konfidenciaintervallum két szélén kimaradó százalék
+    result = {"scheme": scheme, "repetitions": repetitions, "evaluations": len(scores)}
+    for column, metric_name in enumerate(("mae", "rmse")):
+        values = scores[:, column]
+        result[metric_name] = np.nanmean(values)
+        result[f"{metric_name}_std"] = np.nanstd(values)
+        result[f"{metric_name}_ci"] = tuple(np.nanpercentile(values, [tail, 100 - tail]))
+        result[f"{metric_name}_values"] = values
+    return result
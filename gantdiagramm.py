@@ -1,43 +1,204 @@
+"""
+Gantt-diagram készítése feladatok vagy futási naplók időszakaiból (span).
+A bemenet egy csv, JSON vagy JSON lines file Task, Start és End oszlopokkal (opcionálisan Group a színezéshez),
+vagy a metrics modul JSON lines kimenete, amelyből az időmérések (timer) kerülnek a diagramra.
+Az összes sáv egyetlen PolyCollection-ként, egy lépésben kerül a diagramra, így több tízezer feladat is gyorsan
+kirajzolható. Alapértelmezetten a diagram megjelenítés nélkül, file-ba készül, a --show kapcsolóval meg is jelenik.
+Futtatás például:
+python gantdiagramm.py  (a projekt ütemterve, Projekt_Gantt_Diagram_2024.pdf)
+python gantdiagramm.py metrics.jsonl --out futasok.png --title "Éjszakai futás"
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-import matplotlib.dates as mdates
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
 
-# Feladatok és időtartamok definiálása
-tasks = [
+import diagrams
+
+# Feladatok és időtartamok definiálása, a parancssor alapértelmezett bemenete
+TASKS = [
     {"Task": "Projekt tervezés", "Start": "2024-11-01", "End": "2024-11-07"},
     {"Task": "Adatok letöltése és adattisztítás", "Start": "2024-11-03", "End": "2024-11-07"},
     {"Task": "Vizualizációk készítése", "Start": "2024-11-08", "End": "2024-11-14"},
     {"Task": "Regressziós modellek fejlesztése", "Start": "2024-11-15", "End": "2024-11-22"},
     {"Task": "Prezentáció és zárás", "Start": "2024-11-23", "End": "2024-11-30"}
 ]
+DEFAULT_TITLE = "Programozás alapjai beadandó"
+DEFAULT_OUTPUT = "Projekt_Gantt_Diagram_2024.pdf"
+SPAN_COLUMNS = ["Task", "Start", "End"]  # a bemenet kötelező oszlopai
+MAX_TASK_LABELS = 60  # ennél több feladat esetén az y tengelyen nem jelennek meg a nevek, mert olvashatatlanok
+MAX_LEGEND_GROUPS = 10  # a jelmagyarázatban megjelenő csoportok maximális száma
+BAR_HEIGHT = 0.8  # a sávok magassága, egy feladat sora 1 egység
+
+
+def to_datetime(values: pd.Series) -> pd.Series:
+    """
+    Időpontok átalakítása: a szöveges dátumok változatlanul, a számok Unix időként (a metrics és a scheduler
+    ezt írja), helyi időre átszámítva
+    :param values: az időpontok
+    :return: az időpontok datetime64 típussal
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        local_zone = datetime.now().astimezone().tzinfo
+        return pd.to_datetime(values, unit="s", utc=True).dt.tz_convert(local_zone).dt.tz_localize(None)
+    return pd.to_datetime(values)
+
+
+def spans_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    A feladatok ellenőrzése és az időpontok átalakítása
+    :param df: DataFrame legalább Task, Start és End oszlopokkal
+    :return: DataFrame a datetime típusú Start és End oszlopokkal, a hiányos sorok nélkül
+    """
+    missing = [column for column in SPAN_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Hiányzó oszlop: {', '.join(missing)}. Szükséges oszlopok: {', '.join(SPAN_COLUMNS)}.")
+    df = df.assign(Task=df["Task"].astype(str), Start=to_datetime(df["Start"]), End=to_datetime(df["End"]))
+    return df.dropna(subset=["Start", "End"]).reset_index(drop=True)
+
+
+def spans_from_metrics(events: pd.DataFrame) -> pd.DataFrame:
+    """
+    A metrics modul időméréseinek átalakítása feladatokká: a név és a címkék adják a feladat nevét,
+    a start és a mért időtartam az időszakot, a metrika neve a csoportot
+    :param events: a JsonLinesSink által írt események
+    :return: DataFrame Task, Start, End és Group oszlopokkal
+    """
+    if "start" not in events.columns:
+        raise ValueError("A mérések között nincs kezdési időponttal rendelkező időmérés.")
+    timers = events[(events["type"] == "timer") & events["start"].notna()]
+    labels = timers["labels"] if "labels" in timers.columns else pd.Series([{}] * len(timers), index=timers.index)
+    names = [" ".join([name] + [f"{key}={value}" for key, value in (label or {}).items()])
+             for name, label in zip(timers["name"], labels)]  # a címkék szótárak, soronként kell összefűzni
+    return pd.DataFrame({"Task": names, "Start": timers["start"].to_numpy(),
+                         "End": (timers["start"] + timers["value"]).to_numpy(), "Group": timers["name"].to_numpy()})
+
+
+def read_spans(file_name: str) -> pd.DataFrame:
+    """
+    Feladatok beolvasása csv, JSON (objektumok listája) vagy JSON lines (.jsonl) file-ból.
+    A metrics modul JSON lines kimenetét felismeri, és az időméréseket olvassa be.
+    :param file_name: a file neve
+    :return: a spans_frame által ellenőrzött DataFrame
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == ".csv":
+        df = pd.read_csv(file_name)
+    elif extension in (".jsonl", ".ndjson"):
+        df = pd.read_json(file_name, lines=True, convert_dates=False)  # a Unix időket a to_datetime alakítja át
+    elif extension == ".json":
+        with open(file_name, encoding="utf-8") as f:
+            df = pd.DataFrame(json.load(f))
+    else:
+        raise ValueError(f"Ismeretlen formátum: {extension}. Választható: .csv, .json, .jsonl.")
+    if {"type", "name", "value"} <= set(df.columns):
+        df = spans_from_metrics(df)  # a metrics modul kimenete
+    return spans_frame(df)
+
+
+def draw_gantt(spans: pd.DataFrame, title: str = DEFAULT_TITLE, x_label: str = "Dátumok",
+               y_label: str = "Feladatok", color: str = "skyblue", figsize=(10, 6)) -> Figure:
+    """
+    Gantt-diagram létrehozása, megjelenítés nélkül.
+    A sávok négy-négy csúcspontja egyetlen numpy tömbben készül el, és egyetlen PolyCollection-ként kerül a
+    diagramra, így a rajzolás ideje nem soronkénti barh hívásoktól függ. Az azonos nevű feladatok (pl. ugyanannak
+    a lépésnek több futása) egy sorba kerülnek.
+    :param spans: a spans_frame által ellenőrzött DataFrame, Group oszlop esetén csoportonként más színnel
+    :param title: a diagram címsora
+    :param x_label: x tengely felirata
+    :param y_label: y tengely felirata
+    :param color: a sávok színe, ha nincs Group oszlop
+    :param figsize: a diagram mérete hüvelykben
+    :return: a diagram (Figure objektum)
+    """
+    starts = mdates.date2num(spans["Start"].to_numpy())  # konvertálás matplotlib által kezelt dátumformátumba
+    ends = mdates.date2num(spans["End"].to_numpy())
+    rows, task_names = pd.factorize(spans["Task"])  # a feladatok sorai, az első előfordulás sorrendjében
+    low, high = rows - BAR_HEIGHT / 2, rows + BAR_HEIGHT / 2
+    # soronként a sáv négy sarka: (n, 4, 2) méretű tömb
+    vertices = np.stack([np.column_stack(corner) for corner in
+                         ((starts, low), (starts, high), (ends, high), (ends, low))], axis=1)
+
+    fig, ax = plt.subplots(figsize=figsize)
+    handles = []
+    if "Group" in spans.columns:
+        groups, group_names = pd.factorize(spans["Group"])
+        colormap = plt.get_cmap("tab10")
+        facecolors = colormap(groups % colormap.N)
+        handles = [Patch(color=colormap(idx % colormap.N), label=name)
+                   for idx, name in enumerate(group_names[:MAX_LEGEND_GROUPS])]
+    else:
+        facecolors = color
+    ax.add_collection(PolyCollection(vertices, facecolors=facecolors, edgecolors="none"))
+    ax.xaxis_date()
+    ax.autoscale_view()
+
+    # X-tengely beállításai: napos ütemtervnél 5 naponkénti dátumok, rövidebb időszakoknál automatikus felosztás
+    if len(spans) and ends.max() - starts.min() >= 10:
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m-%d"))
+        ax.xaxis.set_major_locator(mdates.DayLocator(interval=5))
+    else:
+        locator = mdates.AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    ax.tick_params(axis="x", labelrotation=45)
+    if len(task_names) <= MAX_TASK_LABELS:
+        ax.set_yticks(np.arange(len(task_names)), task_names)
+    else:
+        ax.set_yticks([])  # ennyi név már olvashatatlan, csak a darabszám jelenik meg
+        y_label = f"{y_label} ({len(task_names)} db)"
+    ax.set_ylim(len(task_names) - 0.5, -0.5)  # az első feladat legfelül
+    ax.set_title(title, fontsize=14)
+    ax.set_xlabel(x_label)
+    ax.set_ylabel(y_label)
+    if handles:
+        ax.legend(handles=handles, loc="upper right")
+    ax.grid(axis="x", linestyle="--", alpha=0.7)
+    fig.tight_layout()
+    return fig  # a kész diagram, a megjelenítést vagy a mentést a hívó végzi
+
+
+def save_gantt(fig: Figure, file_name: str) -> None:
+    """
+    A diagram mentése, a formátum a file kiterjesztéséből (pl. pdf, png, svg), majd a diagram bezárása
+    :param fig: a draw_gantt által létrehozott diagram
+    :param file_name: a kimeneti file neve
+    """
+    try:
+        fig.savefig(file_name)
+    finally:
+        plt.close(fig)  # a diagram lezárása, a memória felszabadítása
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gantt-diagram feladatokból vagy futási naplókból")
+    parser.add_argument("input", nargs="?",
+                        help="csv, JSON vagy JSON lines file (pl. a metrics JSON lines kimenete), "
+                             "alapértelmezetten a projekt ütemterve")
+    parser.add_argument("--out", default=DEFAULT_OUTPUT, help="a kimeneti file, a formátum a kiterjesztésből")
+    parser.add_argument("--title", default=None, help="a diagram címsora")
+    parser.add_argument("--show", action="store_true", help="a mentés után a diagram megjelenítése is")
+    arguments = parser.parse_args()
 
-# DataFrame létrehozása
-df = pd.DataFrame(tasks)
-df["Start"] = pd.to_datetime(df["Start"])
-df["End"] = pd.to_datetime(df["End"])
-df["Duration"] = (df["End"] - df["Start"]).dt.days
-
-# Konvertálás matplotlib által kezelt dátumformátumba
-df["Start_num"] = mdates.date2num(df["Start"])
-df["End_num"] = mdates.date2num(df["End"])
-
-# Gantt-diagram készítése
-fig, ax = plt.subplots(figsize=(10, 6))
-
-for i, task in df.iterrows():
-    ax.barh(task["Task"], task["Duration"], left=task["Start_num"], color="skyblue")
-
-# X-tengely beállításai
-ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m-%d"))
-ax.xaxis.set_major_locator(mdates.DayLocator(interval=5))
-plt.xticks(rotation=45)
-ax.invert_yaxis()
-ax.set_title("Programozás alapjai beadandó", fontsize=14)
-ax.set_xlabel("Dátumok")
-ax.set_ylabel("Feladatok")
-plt.grid(axis="x", linestyle="--", alpha=0.7)
-plt.tight_layout()
-
-# Gantt-diagram mentése PDF formátumban
-plt.savefig("Projekt_Gantt_Diagram_2024.pdf", format="pdf")
-plt.show()
+    if not arguments.show:
+        diagrams.use_batch_backend()  # megjelenítő nélküli backend, így ablakkezelő nélkül is fut
+    if arguments.input:
+        task_spans = read_spans(arguments.input)
+        gantt = draw_gantt(task_spans, arguments.title or os.path.basename(arguments.input), x_label="Időpont",
+                           y_label="Lépések")
+    else:
+        gantt = draw_gantt(spans_frame(pd.DataFrame(TASKS)), arguments.title or DEFAULT_TITLE)
+    if arguments.show:
+        gantt.savefig(arguments.out)  # Gantt-diagram mentése, majd megjelenítése
+        diagrams.show_figure()
+    else:
+        save_gantt(gantt, arguments.out)
+    print(f"A diagram elkészült: {arguments.out}")
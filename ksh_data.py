@@ -1,26 +1,82 @@
-from typing import Any
-import requests
+from io import BytesIO
+from typing import Any, IO
 import pandas as pd
-import pickle
+import numpy as np
+import json
 import os
+import time
+
+import datasets
+import derived
+import metrics
+import serialization
 
 # Pandas warningok letiltása oszlopműveletek eredményének visszaírásakor
 pd.options.mode.copy_on_write = True
 
+CACHE_FORMAT_VERSION = 1  # a bináris gyorsítótár formátumának verziója, változáskor a régi cache elavultnak számít
+CACHE_EXTENSION = "npycache"  # a bináris gyorsítótár könyvtárának kiterjesztése
+SCHEMA_FILE_NAME = "schema.json"  # a gyorsítótár fejléce, az oszlopok nevével, típusával és a sorok számával
+DEFAULT_CHUNK_SIZE = 100_000  # a darabonkénti feldolgozás alapértelmezett sorszáma
+STREAM_CLEANUP_BYTES = 32 * 1024 * 1024  # e méret fölött a nyers csv tisztítása darabonként (stream_cleanup) történik
+
+# karaktertábla a számok tisztításához: minden szóköz jellegű karakter törlése (ezres elválasztó),
+# a tizedesvessző cseréje pontra (a Unicode összes szóköz karaktere U+3000 alatt van)
+NUMBER_TRANSLATION = str.maketrans({**{chr(code): None for code in range(0x3001) if chr(code).isspace()}, ",": "."})
+
 
-def download_csv_content(url: str) -> str:
+def download_csv_content(url: str, timeout: float = 30) -> str:
     """
-    File letöltése, hiba esetén kivételt dob
+    File letöltése, hiba esetén kivételt dob.
+    Több táblázat letöltésére a downloader modul download_many függvénye használható.
     :param url: stringként kell megadni az URL-t
+    :param timeout: időkorlát másodpercben, ennyi ideig vár a szerver válaszára
     :return: stringként visszaadja az ott talált tartalmat
     """
-    request_result = requests.get(url)
+    import requests  # csak a letöltéshez kell, így a gyorsítótár betöltése nem tölti be
+
+    with metrics.timer("ksh_download_seconds", url=url):
+        request_result = requests.get(url, timeout=timeout)
     status_code = request_result.status_code
     if status_code != 200:  # HTTP 200 OK
         raise FileNotFoundError(f"Hiba, a URL-ről nem elérhető az adat. Hibakód: {status_code}.")
+    metrics.count("ksh_download_bytes", len(request_result.content), url=url)
     return request_result.text
 
 
+def read_raw_csv(source: str | IO, table: str = "", encoding: str | None = None) -> pd.DataFrame:
+    """
+    Egy letöltött KSH csv export beolvasása tisztítás nélkül
+    :param source: a ;-vel tagolt nyers csv file neve vagy megnyitott file objektuma (pl. StringIO)
+    :param table: a táblázat neve (pl. okt0008.csv), csak a mérőpontok címkéjéhez
+    :param encoding: a forrásfile kódolása, alapértelmezetten utf-8
+    :return: a nyers DataFrame
+    """
+    start = time.perf_counter()
+    # a separator ;, és mivel a csv első sora nem a headert tartalmazza, a második sor lesz a header
+    df = pd.read_csv(source, sep=";", header=1, encoding=encoding)
+    if metrics.is_enabled():
+        seconds = time.perf_counter() - start
+        metrics.count("ksh_parse_rows", len(df), table=table)
+        metrics.observe("ksh_parse_rows_per_second", len(df) / seconds if seconds > 0 else 0.0, table=table)
+    return df
+
+
+def parse_number_column(values: pd.Series) -> pd.Series:
+    """
+    Szöveges oszlop számmá alakítása egyetlen menetben.
+    A szóközöket (ezres elválasztó, nem törhető szóköz is) egy karaktertáblával törli, és ugyanabban a menetben
+    a tizedesvesszőt pontra cseréli. A típust (int64 vagy float64) a pd.to_numeric egyetlen végigolvasással dönti el,
+    így nincs szükség kivételre épülő újrapróbálkozásra.
+    :param values: Az átalakítandó oszlop
+    :return: Az átalakított oszlop, egész számok esetén int64, egyébként float64 típussal
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values  # már számként lett beolvasva, nincs teendő
+    text = values.astype(str).str.translate(NUMBER_TRANSLATION)  # szóközök törlése és vessző cseréje egy menetben
+    return pd.to_numeric(text)  # hibás adat esetén ValueError kivételt dob
+
+
 def convert_column_to_number(df: pd.DataFrame, column_name: str) -> pd.DataFrame:
     """
     A Pandas DataFrame megadott oszlopának számmá alakítása
@@ -28,34 +84,119 @@ def convert_column_to_number(df: pd.DataFrame, column_name: str) -> pd.DataFrame
     :param column_name: Oszlopnév, aminek az adatait számmá kell alakítani
     :return: Pandas DataFrame az átalakított adatokkal
     """
-    df[column_name] = df[column_name].str.replace('\\s+', '', regex=True)  # space-ek eltávolítása
-    df[column_name] = df[column_name].str.replace(',', '.')  # vessző pontra cserélése a számokban
-    try:
-        df[column_name] = df[column_name].astype('int64')  # integerré konvertálás megkísérlése
-    except ValueError:
-        df[column_name] = df[column_name].astype(
-            'float64')  # ha az integerré alakítás nem sikerül, mert . volt benne, floattá alakítás
-    # más típusú kivételek nincsenek lekezelve
+    df[column_name] = parse_number_column(df[column_name])  # egész szám esetén int64, egyébként float64 lesz
     return df
 
 
-def cleanup(df: pd.DataFrame) -> pd.DataFrame:
+def cleanup(df: pd.DataFrame, table: str = "", dataset: dict | None = None) -> pd.DataFrame:
     """
-    Projektfüggő adattisztítás
+    Adattisztítás az adatkészlet leírásában megadott szabályok szerint:
+    az oszlopok elnevezése, a szöveges oszlopok szétvágása, és a többi oszlop számmá alakítása
     :param df: eredeti DataFrame
+    :param table: a táblázat neve, csak a mérőpontok címkéjéhez
+    :param dataset: a datasets.dataset által összeállított leírás, alapértelmezetten az okt0008 táblázaté
     :return: tisztított DataFrame
     """
-    df = df.iloc[:, :5]  # az első 5 oszlop megtartása, a többi törlése
-    df.columns = ["school_year", "school_number", "classroom_number", "number_of_teachers",
-                  "number_of_students"]  # az öt oszlop elnevezésének beállítása
+    if dataset is None:
+        dataset = datasets.get_dataset(datasets.DEFAULT_DATASET)
+    columns = dataset["columns"]
+    df = df.iloc[:, :len(columns)]  # a megadott számú első oszlop megtartása, a többi törlése
+    df.columns = columns  # az oszlopok elnevezésének beállítása
+
+    # a szétvágandó oszlopok (pl. "1990/1991" szerkezetű tanév) az elválasztónál szétvágásra kerülnek,
+    # és az új oszlopok (pl. year_start és year_end) a DataFrame végére kerülnek
+    for source, targets, separator in dataset["split"]:
+        df[targets] = df[source].str.split(separator, n=len(targets) - 1, expand=True)
+
+    text = datasets.text_columns(dataset)  # a szövegként megmaradó oszlopok
+    for column_name in df.columns:
+        if column_name in text:
+            continue
+        with metrics.timer("ksh_cleanup_column_seconds", table=table, column=column_name):
+            df = convert_column_to_number(df, column_name)  # számmá konvertálja az adatokat
+
+    return df
+
+
+def stream_cleanup(source: str | IO, name: str, chunksize: int = DEFAULT_CHUNK_SIZE, encoding: str | None = None,
+                   extension: str = CACHE_EXTENSION, dataset: dict | None = None, table: str = "") -> int:
+    """
+    Nagy KSH csv exportok tisztítása darabonként, az eredmény közvetlenül a bináris gyorsítótárba kerül.
+    Egyszerre csak egy darab van a memóriában, így a memóriahasználat a bemenet méretétől független.
+    Az oszlopok végleges típusát az összes darab alapján dönti el: int64, ha minden darab egész számokat
+    tartalmazott, egyébként float64. A származtatott mutatók is darabonként számolódnak, az előző darab utolsó
+    soraiból folytatva, így az eredmény megegyezik a teljes adatra számolttal.
+    :param source: a ;-vel tagolt nyers csv file neve vagy megnyitott file objektuma
+    :param name: a gyorsítótár könyvtárának neve, kiterjesztés nélkül
+    :param chunksize: egyszerre feldolgozott sorok száma
+    :param encoding: a forrásfile kódolása, alapértelmezetten utf-8
+    :param extension: a gyorsítótár könyvtárának kiterjesztése
+    :param dataset: az adatkészlet leírása a cleanup számára, alapértelmezetten az okt0008 táblázaté
+    :param table: a táblázat neve a mérőpontok címkéjéhez, alapértelmezetten a gyorsítótár neve
+    :return: a feldolgozott sorok száma
+    """
+    if dataset is None:
+        dataset = datasets.get_dataset(datasets.DEFAULT_DATASET)
+    table = table or name
+    writer = NpyCacheWriter(name, extension)
+    history = None  # az előző darabok utolsó sorai a származtatott mutatókhoz
+    start = time.perf_counter()
+    # a csv első sora nem a headert tartalmazza, ezért a második sor lesz a header
+    # minden oszlop szövegként kerül beolvasásra, a számmá alakítást a cleanup végzi
+    with pd.read_csv(source, sep=";", header=1, dtype=str, chunksize=chunksize, encoding=encoding) as reader:
+        for chunk in reader:
+            cleaned = derived.extend_derived_metrics(history, cleanup(chunk, table, dataset), dataset["derived"], table)
+            writer.append(cleaned)  # a darab tisztítása és hozzáfűzése a gyorsítótárhoz
+            if dataset["derived"]:
+                history = derived.history_tail(cleaned if history is None else pd.concat([history, cleaned]),
+                                               dataset["derived"])
+    rows = writer.close()
+    if metrics.is_enabled():
+        seconds = time.perf_counter() - start
+        metrics.count("ksh_parse_rows", rows, table=table)
+        metrics.observe("ksh_parse_rows_per_second", rows / seconds if seconds > 0 else 0.0, table=table)
+    return rows
+
 
-    # a DataFrame első oszlopának eredeti adata "1990/1991" szerkezetű, ezért a / jelnél szétvágásra kerül
-    # és két új oszlopba kerül year_start és year_end néven a DataFrame végére
-    df[["year_start", "year_end"]] = df["school_year"].str.split("/", expand=True)
+def source_size(source: str | IO) -> int:
+    """
+    :param source: file neve vagy megnyitott, pozícionálható file objektuma
+    :return: a file mérete, file objektum esetén az aktuális pozíciótól hátralévő rész mérete
+    """
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(position)
+    return size - position
 
-    for column_name in df.columns[1:]:  # az első oszlop kivételével, ami már nem szükséges, végigmegy az oszlopokon
-        df = convert_column_to_number(df, column_name)  # és számmá konvertálja az adatokat
 
+def clean_to_npy(source: str | IO, name: str, encoding: str | None = None, dataset: dict | None = None,
+                 table: str = "", stream_bytes: int = STREAM_CLEANUP_BYTES,
+                 chunksize: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Nyers KSH csv tisztítása a származtatott mutatókkal együtt, és mentése a bináris gyorsítótárba.
+    A stream_bytes méretnél nagyobb bemenet darabonként (stream_cleanup) kerül a gyorsítótárba, és onnan
+    memory-mappelve töltődik be, így a nyers és a tisztított adat egyszerre soha nincs teljes egészében a memóriában.
+    A kisebb bemenet egyben kerül tisztításra, mert így kevesebb a járulékos költség.
+    :param source: a ;-vel tagolt nyers csv file neve vagy megnyitott file objektuma (pl. StringIO)
+    :param name: a gyorsítótár könyvtárának neve, kiterjesztés nélkül
+    :param encoding: a forrásfile kódolása, alapértelmezetten utf-8
+    :param dataset: az adatkészlet leírása, alapértelmezetten az okt0008 táblázaté
+    :param table: a táblázat neve a mérőpontok címkéjéhez, alapértelmezetten a gyorsítótár neve
+    :param stream_bytes: e méret fölött darabonkénti a tisztítás
+    :param chunksize: darabonkénti tisztításkor egyszerre feldolgozott sorok száma
+    :return: a tisztított DataFrame
+    """
+    if dataset is None:
+        dataset = datasets.get_dataset(datasets.DEFAULT_DATASET)
+    table = table or name
+    if source_size(source) > stream_bytes:
+        stream_cleanup(source, name, chunksize, encoding, dataset=dataset, table=table)
+        return load_npy(name)
+    df = cleanup(read_raw_csv(source, table, encoding), table, dataset)
+    df = derived.add_derived_metrics(df, dataset["derived"], table)
+    save_content_as_npy(df, name)
     return df
 
 
@@ -84,38 +225,41 @@ def save_content_as_csv(df: pd.DataFrame, name: str, extension: str = "csv") ->
     df.to_csv(full_name, index=False)  # a tartalom kimentése sorszámok nélkül
 
 
-def save_content_as_pickle(data: Any, name: str, extension: str = "pickle") -> None:
+def save_content(data: Any, name: str, extension: str = serialization.EXTENSION) -> None:
     """
-    A megadott objektum kimentése pickle formátumban.
-    Tuple, lista, dictionary és más, összetett adattípusokkal egy file-ba egyszerre több objektum is menthető.
-    Működne a DataFrame to_pickle metódusa is, de így általánosabb, nem csak DataFrame lehet a mentett objektum.
-    :param data: Tetszőleges, mentendő objektum
+    A megadott objektum kimentése a serialization modul formátumában (JSON leíró és nyers tömbök, ellenőrzőösszeggel).
+    Tuple, lista, dictionary és más, összetett adattípusokkal egy file-ba egyszerre több objektum is menthető,
+    pl. a tisztított DataFrame, az együttható-táblázat és a predikciók. A pickle-lel ellentétben a betöltés nem
+    futtat kódot, és a nagy tömbök memory-mappelve, kulcsonként is betölthetők.
+    :param data: A mentendő objektum (DataFrame, Series, numpy tömb, vagy ezekből álló lista, tuple, dictionary)
     :param name: A file neve, kiterjesztés nélkül
     :param extension: A file kiterjesztése
     """
     full_name = get_full_file_name(name, extension)  # a filenév összeállítása
-    with open(full_name, "wb") as f:  # file megnyitása írásra
-        pickle.dump(data, f)  # tartalom kimentése
+    serialization.save(data, full_name)  # tartalom kimentése egy ideiglenes file átnevezésével
 
 
-def load_pickle(name: str, extension: str = "pickle") -> Any:
+def load_content(name: str, extension: str = serialization.EXTENSION, key: Any = None,
+                 columns: list[str] | None = None) -> Any:
     """
     Betölt egy eltárolt objektumot.
     Több objektum esetén szétvágható a visszaadott, összetett objektum értéke:
-    save_content_as_pickle(("str1", "str2"), "filename")
-    first_object, second_object = load_pickle("filename")
+    save_content(("str1", "str2"), "filename")
+    first_object, second_object = load_content("filename")
     # first_object == "str1"
     # second_object == "str2"
-    Amennyiben a file nem található, None-nal tér vissza a függvény
+    Dictionary esetén egy elem külön is betölthető: load_content("filename", key="coefficients")
+    Amennyiben a file nem található, None-nal tér vissza a függvény, sérült file esetén ValueError kivételt dob
     :param name: A file neve, kiterjesztés nélkül
     :param extension: A file kiterjesztése
+    :param key: Opcionálisan a mentett dictionary egy kulcsa
+    :param columns: DataFrame esetén opcionálisan a betöltendő oszlopok
     :return: A visszaolvasott objektum vagy None
     """
     full_name = get_full_file_name(name, extension)  # a filenév összeállítása
     try:
-        with open(full_name, "rb") as f:  # a file megnyitása olvasásra
-            return pickle.load(f)  # a tartalom visszaolvasása és visszatérés a tartalommal
-    except FileNotFoundError as e:  # nincs ilyen file
+        return serialization.load(full_name, key, columns)  # a tömbök memory-mappelve kerülnek betöltésre
+    except FileNotFoundError:  # nincs ilyen file
         return None
 
 
@@ -132,3 +276,286 @@ def load_csv(name: str, extension: str = "csv") -> pd.DataFrame | None:
         return pd.read_csv(full_name)  # visszatérés a beolvasott táblázattal
     except FileNotFoundError as e:  # ha nem létezik
         return None  # jelezzük None-nal
+
+
+def save_content_as_npy(df: pd.DataFrame, name: str, extension: str = CACHE_EXTENSION) -> None:
+    """
+    A megadott DataFrame kimentése oszlopos, bináris formátumban.
+    Minden oszlop egy külön .npy file-ba kerül egy könyvtáron belül, így a típusok megmaradnak és a betöltéskor
+    nem kell újra értelmezni a szöveget. A szöveges oszlopok fix szélességű unicode tömbként kerülnek mentésre.
+    A fejléc (schema.json) utolsóként íródik ki, így egy félbeszakadt mentés nem tölthető be.
+    :param df: A mentendő DataFrame
+    :param name: A könyvtár neve, kiterjesztés nélkül
+    :param extension: A könyvtár kiterjesztése
+    """
+    dir_name = get_full_file_name(name, extension)  # a könyvtárnév összeállítása
+    os.makedirs(dir_name, exist_ok=True)
+    schema_name = os.path.join(dir_name, SCHEMA_FILE_NAME)
+    if os.path.exists(schema_name):
+        os.remove(schema_name)  # a régi fejléc törlése, amíg az oszlopok íródnak, a cache érvénytelen
+
+    columns = []
+    for idx, column_name in enumerate(df.columns):
+        values = df[column_name].to_numpy()
+        if values.dtype == object or not isinstance(values, np.ndarray):
+            values = np.asarray(values, dtype=str)  # szöveges oszlop fix szélességű unicode tömbként
+        file_name = f"{idx}.npy"  # a file neve az oszlop sorszáma, így az oszlopnév bármi lehet
+        np.save(os.path.join(dir_name, file_name), values)
+        columns.append({"name": column_name, "file": file_name, "dtype": values.dtype.str})
+
+    schema = {"format_version": CACHE_FORMAT_VERSION, "rows": len(df), "columns": columns}
+    write_json_atomic(schema, schema_name)  # a fejléc kiírása, ettől kezdve érvényes a cache
+
+
+def write_json_atomic(data: Any, full_name: str) -> None:
+    """
+    JSON file kiírása egy ideiglenes file-on keresztül, így olvasáskor soha nem látszik félkész tartalom
+    :param data: A mentendő, JSON-ként ábrázolható adat
+    :param full_name: A file teljes neve
+    """
+    temp_name = f"{full_name}.tmp"
+    with open(temp_name, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(temp_name, full_name)  # az átnevezés atomi, a régi tartalmat egy lépésben cseréli le
+
+
+def load_npy(name: str, extension: str = CACHE_EXTENSION, columns: list[str] | None = None) -> pd.DataFrame | None:
+    """
+    A save_content_as_npy által mentett DataFrame visszaolvasása.
+    Az oszlopok memory-mappelve töltődnek be, így a numerikus adatok csak a tényleges használatkor kerülnek beolvasásra.
+    Amennyiben a cache nem létezik, hiányos, vagy más verziójú formátumban készült, None a visszatérési érték.
+    :param name: A könyvtár neve, kiterjesztés nélkül
+    :param extension: A könyvtár kiterjesztése
+    :param columns: Opcionálisan a betöltendő oszlopok listája, alapértelmezetten mindegyik
+    :return: A visszaolvasott DataFrame vagy None
+    """
+    dir_name = get_full_file_name(name, extension)  # a könyvtárnév összeállítása
+    schema = load_npy_schema(name, extension)
+    if schema is None:
+        return None  # nincs érvényes cache
+
+    data = {}
+    for column in schema["columns"]:
+        if columns is not None and column["name"] not in columns:
+            continue  # a nem kért oszlop kihagyása, be sem olvassa
+        try:
+            values = np.load(os.path.join(dir_name, column["file"]), mmap_mode="r")  # a file memory-mappelése
+        except (FileNotFoundError, ValueError):  # hiányzó vagy sérült oszlopfile
+            return None
+        if values.dtype.str != column["dtype"] or values.shape != (schema["rows"],):
+            return None  # a file nem egyezik a fejléccel, a cache elavult
+        data[column["name"]] = values
+    return pd.DataFrame(data, copy=False)  # a tömbök másolás nélkül kerülnek a DataFrame-be
+
+
+def load_npy_schema(name: str, extension: str = CACHE_EXTENSION) -> dict | None:
+    """
+    A bináris gyorsítótár fejlécének beolvasása.
+    Amennyiben nem létezik, vagy a formátum verziója nem egyezik a jelenlegivel, None a visszatérési érték.
+    :param name: A könyvtár neve, kiterjesztés nélkül
+    :param extension: A könyvtár kiterjesztése
+    :return: A fejléc dictionary-ként vagy None
+    """
+    schema_name = os.path.join(get_full_file_name(name, extension), SCHEMA_FILE_NAME)
+    try:
+        with open(schema_name, encoding="utf-8") as f:
+            schema = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):  # nincs ilyen file, vagy sérült
+        return None
+    if schema.get("format_version") != CACHE_FORMAT_VERSION:
+        return None  # más verziójú formátum, elavultnak számít
+    return schema
+
+
+class NpyCacheWriter:
+    """
+    A bináris gyorsítótár darabonkénti írása.
+    Az append által kapott darabok oszloponként egy ideiglenes (spool) file-ba kerülnek a saját típusukkal,
+    a close pedig ezekből állítja elő a végleges .npy file-okat és a fejlécet. A végleges típust minden oszlopra
+    egyszer, a darabok típusa alapján dönti el, a másolás darabonként történik, így a memóriahasználat korlátos.
+    """
+
+    def __init__(self, name: str, extension: str = CACHE_EXTENSION):
+        """
+        :param name: A könyvtár neve, kiterjesztés nélkül
+        :param extension: A könyvtár kiterjesztése
+        """
+        self.dir_name = get_full_file_name(name, extension)  # a könyvtárnév összeállítása
+        os.makedirs(self.dir_name, exist_ok=True)
+        self.schema_name = os.path.join(self.dir_name, SCHEMA_FILE_NAME)
+        if os.path.exists(self.schema_name):
+            os.remove(self.schema_name)  # a régi fejléc törlése, amíg az írás tart, a cache érvénytelen
+        self.columns = None  # az oszlopnevek, az első darab határozza meg
+        self.spools = []  # oszloponként a megnyitott ideiglenes file
+        self.segments = []  # oszloponként a darabok (típus, darabszám) listája
+        self.rows = 0  # az eddig hozzáfűzött sorok száma
+
+    def append(self, df: pd.DataFrame) -> None:
+        """
+        Egy tisztított darab hozzáfűzése
+        :param df: a tisztított darab, az oszlopai megegyeznek az első darabéval
+        """
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self.spools = [open(os.path.join(self.dir_name, f"{idx}.spool"), "wb") for idx in range(len(self.columns))]
+            self.segments = [[] for _ in self.columns]
+        elif list(df.columns) != self.columns:
+            raise ValueError("A darab oszlopai nem egyeznek az első darab oszlopaival.")
+
+        for idx, column_name in enumerate(self.columns):
+            values = df[column_name].to_numpy()
+            if values.dtype == object or not isinstance(values, np.ndarray):
+                values = np.asarray(values, dtype=str)  # szöveges oszlop fix szélességű unicode tömbként
+            values = np.ascontiguousarray(values)
+            values.tofile(self.spools[idx])  # a darab nyers bájtjainak kiírása
+            self.segments[idx].append((values.dtype, len(values)))
+        self.rows += len(df)
+
+    def close(self) -> int:
+        """
+        A végleges .npy file-ok és a fejléc elkészítése, az ideiglenes file-ok törlése
+        :return: a gyorsítótárba írt sorok száma
+        """
+        columns = []
+        for idx, column_name in enumerate(self.columns or []):
+            self.spools[idx].close()
+            final_dtype = settle_dtype([dtype for dtype, _ in self.segments[idx]])
+            file_name = f"{idx}.npy"
+            spool_name = os.path.join(self.dir_name, f"{idx}.spool")
+            target = np.lib.format.open_memmap(os.path.join(self.dir_name, file_name), mode="w+",
+                                               dtype=final_dtype, shape=(self.rows,))
+            position = 0
+            with open(spool_name, "rb") as spool:
+                for dtype, count in self.segments[idx]:  # darabonkénti másolás a végleges típusra
+                    target[position:position + count] = np.fromfile(spool, dtype=dtype, count=count)
+                    position += count
+            target.flush()
+            del target  # a memory-map lezárása
+            os.remove(spool_name)
+            columns.append({"name": column_name, "file": file_name, "dtype": final_dtype.str})
+
+        schema = {"format_version": CACHE_FORMAT_VERSION, "rows": self.rows, "columns": columns}
+        write_json_atomic(schema, self.schema_name)  # a fejléc kiírása, ettől kezdve érvényes a cache
+        return self.rows
+
+
+def settle_dtype(dtypes: list[np.dtype]) -> np.dtype:
+    """
+    Egy oszlop végleges típusának eldöntése a darabok típusai alapján
+    :param dtypes: a darabok típusainak listája
+    :return: szöveg esetén a leghosszabb darabnak megfelelő unicode típus, egész számok esetén int64,
+             egyébként float64
+    """
+    if any(dtype.kind == "U" for dtype in dtypes):
+        return np.dtype(f"<U{max(dtype.itemsize // 4 for dtype in dtypes)}")  # a leghosszabb szöveg szélessége
+    if all(dtype.kind in "iub" for dtype in dtypes):
+        return np.dtype("int64")
+    return np.dtype("float64")
+
+
+def new_rows(raw_df: pd.DataFrame, known_years) -> pd.DataFrame:
+    """
+    A nyers (tisztítás előtti) táblázat azon sorainak kiválasztása, amelyeknek a tanév kezdete még nem szerepel
+    a gyorsítótárban. Csak az első oszlopot ("1990/1991" szerkezetű tanév) dolgozza fel, a többit nem tisztítja.
+    :param raw_df: a letöltött, ;-vel tagolt csv-ből beolvasott DataFrame
+    :param known_years: a gyorsítótárban már szereplő year_start értékek
+    :return: az új sorok, a cleanup függvénnyel tisztíthatóak
+    """
+    year_start = parse_number_column(raw_df.iloc[:, 0].astype(str).str.split("/").str[0])  # a tanév első fele
+    return raw_df[~year_start.isin(np.asarray(known_years)).to_numpy()]
+
+
+def append_npy_column(file_name: str, values: np.ndarray) -> np.dtype:
+    """
+    Új értékek hozzáfűzése egy .npy file végére.
+    Ha a típus nem változik, csak az új bájtokat írja a fejléc szerinti utolsó sor után, és a fejlécben frissíti a
+    sorok számát, így az idő az új sorok számával arányos. Ha a típus bővül (pl. int64 helyett float64, vagy hosszabb
+    szöveg), vagy a fejléc hossza megváltozna, a teljes file egy új file-ba íródik, amely a régit lecseréli.
+    :param file_name: a .npy file teljes neve
+    :param values: a hozzáfűzendő értékek
+    :return: az oszlop típusa a hozzáfűzés után
+    """
+    with open(file_name, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        header_length = f.tell()
+        new_dtype = np.result_type(dtype, values.dtype) if dtype.kind != "U" else settle_dtype([dtype, values.dtype])
+        if new_dtype == dtype:
+            header = BytesIO()
+            np.lib.format.write_array_header_1_0(header, {"descr": np.lib.format.dtype_to_descr(dtype),
+                                                          "fortran_order": fortran_order,
+                                                          "shape": (shape[0] + len(values),)})
+            if len(header.getvalue()) == header_length:
+                # a fejléc szerinti adatok vége utáni írás: egy korábbi, a fejléc frissítése előtt félbeszakadt
+                # hozzáfűzés maradék bájtjai felülíródnak, így a sorok nem csúsznak el
+                f.seek(header_length + shape[0] * dtype.itemsize)
+                f.truncate()
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())  # csak az új sorok kiírása
+                f.seek(0)
+                f.write(header.getvalue())  # a fejléc frissítése az új sorszámmal
+                return dtype
+
+    # a típus vagy a fejléc mérete változik, a teljes oszlop újraírása egy ideiglenes file-ba, majd csere,
+    # így a régi file-t memory-mappelő load_npy eredmények érvényesek maradnak
+    old_values = np.load(file_name, mmap_mode="r")
+    temp_name = f"{file_name}.tmp"
+    with open(temp_name, "wb") as f:
+        np.save(f, np.concatenate([old_values.astype(new_dtype), values.astype(new_dtype)]))
+    del old_values  # a memory-map lezárása
+    os.replace(temp_name, file_name)  # az átnevezés atomi, a régi tartalmat egy lépésben cseréli le
+    return new_dtype
+
+
+def append_to_npy(df: pd.DataFrame, name: str, extension: str = CACHE_EXTENSION) -> int:
+    """
+    Tisztított sorok hozzáfűzése a bináris gyorsítótárhoz, a meglévő sorok újraírása nélkül.
+    A fejléc csak az összes oszlop frissítése után íródik ki, így egy félbeszakadt hozzáfűzés után a cache
+    elavultnak számít (a sorok száma nem egyezik a fejléccel).
+    :param df: a hozzáfűzendő, tisztított sorok, az oszlopai megegyeznek a gyorsítótáréval
+    :param name: A könyvtár neve, kiterjesztés nélkül
+    :param extension: A könyvtár kiterjesztése
+    :return: a gyorsítótár sorainak száma a hozzáfűzés után
+    """
+    schema = load_npy_schema(name, extension)
+    if schema is None:
+        raise FileNotFoundError(f"Nincs érvényes gyorsítótár: {get_full_file_name(name, extension)}")
+    if [column["name"] for column in schema["columns"]] != list(df.columns):
+        raise ValueError("A hozzáfűzendő sorok oszlopai nem egyeznek a gyorsítótár oszlopaival.")
+    dir_name = get_full_file_name(name, extension)
+    for column in schema["columns"]:
+        values = df[column["name"]].to_numpy()
+        if values.dtype == object or not isinstance(values, np.ndarray):
+            values = np.asarray(values, dtype=str)  # szöveges oszlop fix szélességű unicode tömbként
+        column["dtype"] = append_npy_column(os.path.join(dir_name, column["file"]), values).str
+    schema["rows"] += len(df)
+    write_json_atomic(schema, os.path.join(dir_name, SCHEMA_FILE_NAME))
+    return schema["rows"]
+
+
+def add_npy_columns(df: pd.DataFrame, name: str, extension: str = CACHE_EXTENSION) -> None:
+    """
+    Új oszlopok (pl. származtatott mutatók) hozzáadása a bináris gyorsítótárhoz, a meglévő oszlopfile-ok
+    újraírása nélkül, így a már memory-mappelt oszlopok érvényesek maradnak
+    :param df: az új oszlopok, a sorok száma megegyezik a gyorsítótáréval
+    :param name: A könyvtár neve, kiterjesztés nélkül
+    :param extension: A könyvtár kiterjesztése
+    """
+    schema = load_npy_schema(name, extension)
+    if schema is None:
+        raise FileNotFoundError(f"Nincs érvényes gyorsítótár: {get_full_file_name(name, extension)}")
+    if len(df) != schema["rows"]:
+        raise ValueError("Az új oszlopok hossza nem egyezik a gyorsítótár sorainak számával.")
+    if set(df.columns) & {column["name"] for column in schema["columns"]}:
+        raise ValueError("Az új oszlopok között van a gyorsítótárban már szereplő oszlop.")
+    dir_name = get_full_file_name(name, extension)
+    for column_name in df.columns:
+        values = df[column_name].to_numpy()
+        if values.dtype == object or not isinstance(values, np.ndarray):
+            values = np.asarray(values, dtype=str)  # szöveges oszlop fix szélességű unicode tömbként
+        file_name = f"{len(schema['columns'])}.npy"  # a következő sorszám, a meglévő file-ok nem változnak
+        np.save(os.path.join(dir_name, file_name), values)
+        schema["columns"].append({"name": column_name, "file": file_name, "dtype": values.dtype.str})
+    write_json_atomic(schema, os.path.join(dir_name, SCHEMA_FILE_NAME))  # ettől kezdve látszanak az új oszlopok
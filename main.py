@@ -1,106 +1,380 @@
 # importok
+# a lassan betöltődő modulok (pandas, matplotlib, sklearn, requests) csak az őket használó függvényekben
+# töltődnek be, így pl. a fetch parancs a pandas és a matplotlib betöltése nélkül fut le
+from __future__ import annotations
+
+import argparse
+import os
+import sys
 from io import StringIO
-import pandas as pd
+from typing import TYPE_CHECKING
+
+import datasets
+import metrics
 
-import diagrams
-import ksh_data
-import models
+if TYPE_CHECKING:
+    import pandas as pd
 
-# Menü jobb felső sarkából
-# forrás: https://www.ksh.hu/stadat_files/okt/hu/okt0008.html
-URL = "https://www.ksh.hu/stadat_files/okt/hu/okt0008.csv"
+# a main.py az okt0008 táblázattal dolgozik, a többi nyilvántartott táblázatot a scheduler dolgozza fel
+DATASET = datasets.get_dataset(datasets.DEFAULT_DATASET)
+URL = DATASET["url"]
 FUTURE_YEARS = 10  # konstans a lineáris modellhez, az exrapolált évek száma
-SAVE_FILE_NAME = "school"
+SAVE_FILE_NAME = DATASET["cache_name"]
+LINEAR_SUMS_FILE_NAME = "linear_sums.json"  # a lineáris modellek összegei a gyorsítótár könyvtárában
+CACHE_FORMATS = ("npy", "csv")  # a tisztított adat mentésének lehetséges formátumai
+RAW_DIR = "raw"  # a fetch paranccsal letöltött nyers táblázatok könyvtára
 
 
-def load_data() -> pd.DataFrame:
+def load_data(cache_format: str = "npy") -> pd.DataFrame:
     """
     Korábbról elmentett, tisztított adat betöltése. Ennek hiányában nyers adatok letöltése és tisztítása.
-    :return: A tisztított DataFrame
-    """
-    df = ksh_data.load_csv(SAVE_FILE_NAME)
-    if df is None:
-        str_content = ""  # a változó inicializálása
-        try:
-            str_content = ksh_data.download_csv_content(URL)  # az adat letöltése és az str_contentbe való lementése
-        except FileNotFoundError as e:  # hibakezelés
-            print("Error: ", e)
-            exit(1)
-
-        # string átkonvertálása fájllá, a separator beállítása ;-re, és mivel a csv első sora nem a headert tartalmazza,
-        # egy sort át kell ugrani, így a második sor lesz a header
-        df = pd.read_csv(StringIO(str_content), sep=";", header=1)
-        df = ksh_data.cleanup(df)  # az adattisztító függvény, azaz a cleanup() meghívása
+    :param cache_format: "npy" esetén az oszlopos, bináris gyorsítótárat, "csv" esetén a csv exportot használja
+    :return: A tisztított DataFrame, a származtatott mutatókkal
+    """
+    import derived
+    import ksh_data
+
+    if cache_format not in CACHE_FORMATS:
+        raise ValueError(f"Ismeretlen formátum: {cache_format}. Választható: {', '.join(CACHE_FORMATS)}.")
+    if cache_format == "npy":
+        df = ksh_data.load_npy(SAVE_FILE_NAME)  # memory-mappelt betöltés, a típusok újraértelmezése nélkül
+    else:
+        df = ksh_data.load_csv(SAVE_FILE_NAME)
+    if df is None and cache_format == "npy":
+        # tisztítás a származtatott mutatókkal és kimentés a következő futáshoz, nagy táblázatnál darabonként
+        df = ksh_data.clean_to_npy(StringIO(download_raw_content()), SAVE_FILE_NAME, dataset=DATASET,
+                                   table=os.path.basename(URL))
+    elif df is None:
+        df = download_raw_data()  # az adat letöltése és beolvasása
+        df = ksh_data.cleanup(df, os.path.basename(URL))  # az adattisztító függvény, azaz a cleanup() meghívása
+        df = derived.add_derived_metrics(df, DATASET["derived"], os.path.basename(URL))  # származtatott mutatók
         ksh_data.save_content_as_csv(df, SAVE_FILE_NAME)  # adat kimentése a következő futáshoz
-    return df.reset_index(drop=True)  # adatok visszaadása, friss sorszámokkal
+    else:
+        df = add_missing_derived(df, cache_format)  # a mutatók nélkül mentett, korábbi gyorsítótár kiegészítése
+    return df.reset_index(drop=True)  # adatok visszaadása, friss sorszámokkal (copy-on-write miatt másolás nélkül)
 
 
-if __name__ == '__main__':
-    data = load_data()
+def add_missing_derived(df: pd.DataFrame, cache_format: str = "npy") -> pd.DataFrame:
+    """
+    A gyorsítótárból hiányzó származtatott mutatók kiszámítása és mentése (pl. egy új mutató felvétele után).
+    Az npy gyorsítótárhoz csak az új oszlopok íródnak ki, a meglévők változatlanok maradnak.
+    :param df: a gyorsítótárból betöltött DataFrame
+    :param cache_format: "npy" vagy "csv", a gyorsítótár formátuma
+    :return: a DataFrame az összes mutatóval
+    """
+    import derived
+    import ksh_data
 
-    print(data.head(15))  # első 15 sor kiírása, hogy látszódjon, hogy milyen adatok vannak a DataFrameben
-    columns_needed = ["number_of_students", "number_of_teachers", "school_number",
-                      "classroom_number"]  # oszlopok kiválasztása a vonaldiagramhoz
-    print(data[
-              columns_needed].describe())  # statisztika készítése a kiválasztott oszlopokról (átlag, min, max, medián, 25 és 75%-os percentilis), szórás
-    diagrams.show_line_diagram(data["year_start"], data[columns_needed], x_label="Tanév kezdete",
-                               y_label="Értékek")  # vonaldiagram megjelenítése
-    diagrams.show_multiline_diagram(data["year_start"], data[columns_needed],
-                                    x_label="Tanév kezdete")  # vonaldiagram megjelenítése
-    # összefüggés a diákok és a tanárok száma között pontdiagramon
-    diagrams.show_scatter_diagram(data["number_of_students"], data["number_of_teachers"], "Diákok", "Tanárok")
-    # összefüggés a diákok és a tanárok száma között pontdiagramon, valamiért megfordítva
-    diagrams.show_scatter_diagram(data["number_of_students"], data["number_of_teachers"], "Diákok",
-                                  "Tanárok", swap_x=True)
-    diagrams.show_scatter_diagram(data["school_number"], data["number_of_teachers"], "Iskolák",
-                                  "Tanárok")  # összefüggés az iskolák és a tanárok száma között pontdiagramon
-    diagrams.show_scatter_diagram(data["school_number"], data["number_of_students"], "Iskolák",
-                                  "Diákok")  # összefüggés az iskolák és a diákok száma között pontdiagramon
+    missing = [name for name in datasets.derived_names(DATASET) if name not in df.columns]
+    if not missing:
+        return df  # a gyorsítótár naprakész
+    df = derived.add_derived_metrics(df, DATASET["derived"], os.path.basename(URL))
+    if cache_format == "npy":
+        ksh_data.add_npy_columns(df[missing], SAVE_FILE_NAME)
+    else:
+        ksh_data.save_content_as_csv(df, SAVE_FILE_NAME)
+    return df
+
+
+def base_target_columns(df: pd.DataFrame) -> list[str]:
+    """
+    :param df: a tisztított DataFrame
+    :return: a lineáris modellek pontos összegeihez használt oszlopok: a numerikus oszlopok a származtatott
+             mutatók nélkül (ezekben lehet NaN, és az értékük a hozzáfűzéskor is kiszámolható)
+    """
+    import models
+
+    names = datasets.derived_names(DATASET)
+    return [column for column in models.select_target_columns(df, "year_start") if column not in names]
+
+
+def download_raw_content() -> str:
+    """
+    A nyers adatok letöltése, hiba esetén kilép a programból
+    :return: a letöltött csv tartalma
+    """
+    import ksh_data
+
+    str_content = ""  # a változó inicializálása
+    try:
+        str_content = ksh_data.download_csv_content(URL)  # az adat letöltése és az str_contentbe való lementése
+    except FileNotFoundError as e:  # hibakezelés
+        print("Error: ", e)
+        exit(1)
+    return str_content
+
+
+def download_raw_data() -> pd.DataFrame:
+    """
+    A nyers adatok letöltése és beolvasása tisztítás nélkül, hiba esetén kilép a programból
+    :return: a nyers DataFrame
+    """
+    import ksh_data
+
+    return ksh_data.read_raw_csv(StringIO(download_raw_content()), os.path.basename(URL))
+
+
+def update_data() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    A gyorsítótár inkrementális frissítése: a letöltött táblázatból csak a még nem szereplő tanévek kerülnek
+    tisztításra és hozzáfűzésre, a lineáris modellek összegei pedig csak az új sorokkal frissülnek.
+    A származtatott mutatók is csak az új sorokra számolódnak ki, a szükséges utolsó korábbi sorok alapján.
+    Ha nincs gyorsítótár, vagy az összegek nem egyeznek vele, mindent újraszámol.
+    Az eredmény pontosan megegyezik a teljes újraszámolás eredményével.
+    :return: (a tisztított DataFrame, a lineáris modellek együttható-táblázata) pár
+    """
+    import derived
+    import ksh_data
+    import models
+
+    raw_df = download_raw_data()
+    sums_file_name = os.path.join(ksh_data.get_full_file_name(SAVE_FILE_NAME, ksh_data.CACHE_EXTENSION),
+                                  LINEAR_SUMS_FILE_NAME)
+    df = ksh_data.load_npy(SAVE_FILE_NAME)
+    sums = models.load_linear_sums(sums_file_name) if df is not None else None
+    if df is None or sums is None or sums["count"] != len(df):  # nincs használható gyorsítótár, teljes számolás
+        df = ksh_data.cleanup(raw_df, os.path.basename(URL))
+        df = derived.add_derived_metrics(df, DATASET["derived"], os.path.basename(URL))
+        ksh_data.save_content_as_npy(df, SAVE_FILE_NAME)
+        sums = models.linear_sums(df, "year_start", base_target_columns(df))
+    else:
+        df = add_missing_derived(df)
+        added = ksh_data.new_rows(raw_df, df["year_start"])  # a még nem szereplő tanévek
+        if len(added) > 0:
+            added = ksh_data.cleanup(added, os.path.basename(URL))  # csak az új tanévek tisztítása
+            # a mutatók csak az új sorokra, a gyorsítótár utolsó sorait előzményként használva
+            added = derived.extend_derived_metrics(df, added, DATASET["derived"], os.path.basename(URL))
+            ksh_data.append_to_npy(added[list(df.columns)], SAVE_FILE_NAME)  # csak az új sorok kiírása
+            sums = models.update_linear_sums(sums, added)  # az összegek frissítése csak az új sorokkal
+            df = ksh_data.load_npy(SAVE_FILE_NAME)
+    models.save_linear_sums(sums, sums_file_name)
+    return df, models.coefficients_from_sums(sums)
+
+
+COLUMNS_NEEDED = ["number_of_students", "number_of_teachers", "school_number",
+                  "classroom_number"]  # oszlopok kiválasztása a vonaldiagramhoz
+RATIO_COLUMNS = ["students_per_teacher", "students_per_classroom"]  # származtatott mutatók a mutatók diagramjához
+
+
+def build_prediction_frame(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    A diákok és tanárok számára illesztett lineáris modellek értékei a múltra és a közeljövőre
+    :param data: a tisztított DataFrame
+    :return: DataFrame az évszámokkal, a modellek értékeivel, és a jövőre vonatkozó predikciókkal kiegészített valós adatokkal
+    """
+    import pandas as pd
+    import models
 
     all_years_with_future = list(range(min(data["year_start"]), max(
         data["year_start"]) + FUTURE_YEARS))  # a múltra és a jövőre vonatkozó évek listája
 
-    student_model = models.create_linear_model(data, "year_start",
-                                               "number_of_students")  # egy egyenes illesztése arra, hogy melyik évben hány diák tanult
-    student_predicted = student_model.predict(
-        [[xx] for xx in all_years_with_future])  # a modell szerint melyik évben hány diák tanult
+    # egy-egy egyenes illesztése arra, hogy melyik évben hány diák tanult és hány tanár tanított, egyszerre
+    coefficients = models.fit_linear_models(data, "year_start", ["number_of_students", "number_of_teachers"])
+    predicted = models.predict_linear_models(coefficients,
+                                             all_years_with_future)  # a modellek szerint melyik évben hány diák és tanár volt
+
+    student_predicted = predicted["number_of_students"].values  # a diákokra vonatkozó modell értékei
     student_real_and_predicted = list(data["number_of_students"])  # múltbeli valós adatok változóba mentése
     student_real_and_predicted += list(student_predicted[
                                        len(student_real_and_predicted):])  # összefűzi a múltbeli valós adatokat a jövőre vonatkozó prediktált adatokkal
 
-    teacher_model = models.create_linear_model(data, "year_start",
-                                               "number_of_teachers")  # egy egyenes illesztése arra, hogy melyik évben hány tanár tanított
-    teacher_predicted = teacher_model.predict(
-        [[xx] for xx in all_years_with_future])  # a modell szerint melyik évben hány tanár tanított
+    teacher_predicted = predicted["number_of_teachers"].values  # a tanárokra vonatkozó modell értékei
     teacher_real_and_predicted = list(data["number_of_teachers"])  # múltbeli valós adatok változóba mentése
     teacher_real_and_predicted += list(teacher_predicted[
                                        len(teacher_real_and_predicted):])  # összefűzi a múltbeli valós adatokat a jövőre vonatkozó prediktált adatokkal
 
-    diagrams.show_scatter_diagram(data["year_start"], data["number_of_students"], "Év",
-                                  "Diákok")  # összefüggés az év és a diákok száma között pontdiagramon
-    diagrams.show_scatter_diagram(data["year_start"], data["number_of_teachers"], "Év",
-                                  "Tanárok")  # összefüggés az év és a tanárok száma között pontdiagramon
-
     # új DataFrame létrehozása, amiben benne vannak a már eltelt és a közeljövő évszámai, a lineáris modellek, és a valós adatok
-    data_pred = pd.DataFrame({"year_start": all_years_with_future,  # évszámok
-                              "student_predicted": student_predicted,
-                              # diákok számára vonatkozó lineáris modell értékei
-                              "student_real_and_predicted": student_real_and_predicted,
-                              # diákok valós száma, kiegészítve a jövőre vonatkozó modell adataival
-                              "teacher_predicted": teacher_predicted,
-                              # tanárok számára vonatkozó lineáris modell értékei
-                              "teacher_real_and_predicted": teacher_real_and_predicted})  # tanárok valós száma, kiegészítve a jövőre vonatkozó modell adataival
-
-    # kevert diagram megjelenítése az új DataFrame-mel
-    # a diákok száma jelentősen meghaladja a tanárokét, emiatt a kéttengelyes megjelenítés sokkal szemléletesebb
-    # a diákok adatai a kék, bal tengelyhez tartoznak, a valós számuk kék X, a lineáris pedig világoskék vonal
-    # a tanárok a piros, jobb tengelyhez tartoznak, valós számuk piros X, a lineáris modell narancssárga vonal
-    diagrams.show_mixed_diagram(data_pred["year_start"], data_pred[[
-        "student_real_and_predicted", "student_predicted",
-        "teacher_real_and_predicted", "teacher_predicted"
-    ]], "Diákok és tanárok száma", ["diákok", "tanárok"], colors=["blue", "lightblue", "red", "orange"])
-
-    seed_1_error = models.calculate_linear_accuracy(data, "year_start", "number_of_teachers", 1)
+    return pd.DataFrame({"year_start": all_years_with_future,  # évszámok
+                         "student_predicted": student_predicted,
+                         # diákok számára vonatkozó lineáris modell értékei
+                         "student_real_and_predicted": student_real_and_predicted,
+                         # diákok valós száma, kiegészítve a jövőre vonatkozó modell adataival
+                         "teacher_predicted": teacher_predicted,
+                         # tanárok számára vonatkozó lineáris modell értékei
+                         "teacher_real_and_predicted": teacher_real_and_predicted})  # tanárok valós száma, kiegészítve a jövőre vonatkozó modell adataival
+
+
+def build_chart_jobs(data: pd.DataFrame, data_pred: pd.DataFrame) -> list[dict]:
+    """
+    A program összes diagramjának összeállítása, megjelenítés nélkül
+    :param data: a tisztított DataFrame
+    :param data_pred: a build_prediction_frame által visszaadott DataFrame
+    :return: a diagrams.chart_job által összeállított feladatok listája, a megjelenítés sorrendjében
+    """
+    import diagrams
+
+    return [
+        diagrams.chart_job("line", "line", data["year_start"], data[COLUMNS_NEEDED], x_label="Tanév kezdete",
+                           y_label="Értékek"),  # vonaldiagram
+        diagrams.chart_job("multiline", "multiline", data["year_start"], data[COLUMNS_NEEDED],
+                           x_label="Tanév kezdete"),  # vonaldiagramok egymás alatt
+        # egy tanárra és egy osztályra jutó diákok száma, a gyorsítótárban tárolt származtatott mutatókból
+        diagrams.chart_job("line", "ratios", data["year_start"], data[RATIO_COLUMNS], x_label="Tanév kezdete",
+                           y_label="Diákok száma"),
+        # összefüggés a diákok és a tanárok száma között pontdiagramon
+        diagrams.chart_job("scatter", "students_teachers", data["number_of_students"], data["number_of_teachers"],
+                           "Diákok", "Tanárok"),
+        # összefüggés a diákok és a tanárok száma között pontdiagramon, valamiért megfordítva
+        diagrams.chart_job("scatter", "students_teachers_swapped", data["number_of_students"],
+                           data["number_of_teachers"], "Diákok", "Tanárok", swap_x=True),
+        diagrams.chart_job("scatter", "schools_teachers", data["school_number"], data["number_of_teachers"], "Iskolák",
+                           "Tanárok"),  # összefüggés az iskolák és a tanárok száma között pontdiagramon
+        diagrams.chart_job("scatter", "schools_students", data["school_number"], data["number_of_students"], "Iskolák",
+                           "Diákok"),  # összefüggés az iskolák és a diákok száma között pontdiagramon
+        diagrams.chart_job("scatter", "years_students", data["year_start"], data["number_of_students"], "Év",
+                           "Diákok"),  # összefüggés az év és a diákok száma között pontdiagramon
+        diagrams.chart_job("scatter", "years_teachers", data["year_start"], data["number_of_teachers"], "Év",
+                           "Tanárok"),  # összefüggés az év és a tanárok száma között pontdiagramon
+        # kevert diagram az előrejelzéssel
+        # a diákok száma jelentősen meghaladja a tanárokét, emiatt a kéttengelyes megjelenítés sokkal szemléletesebb
+        # a diákok adatai a kék, bal tengelyhez tartoznak, a valós számuk kék X, a lineáris pedig világoskék vonal
+        # a tanárok a piros, jobb tengelyhez tartoznak, valós számuk piros X, a lineáris modell narancssárga vonal
+        diagrams.chart_job("mixed", "forecast", data_pred["year_start"], data_pred[[
+            "student_real_and_predicted", "student_predicted",
+            "teacher_real_and_predicted", "teacher_predicted"
+        ]], "Diákok és tanárok száma", ["diákok", "tanárok"], colors=["blue", "lightblue", "red", "orange"]),
+    ]
+
+
+def fetch_raw_data(target_dir: str = RAW_DIR) -> dict:
+    """
+    A nyers táblázat letöltése a lemezre, feltételes kéréssel: ha a szerveren nem változott, nem tölti le újra
+    :param target_dir: a célkönyvtár
+    :return: a downloader.download_file eredménye (path, status, bytes, encoding)
+    """
+    import downloader
+
+    return downloader.download_many([URL], target_dir)[URL]
+
+
+def clean_raw_data(cache_format: str = "npy", raw_dir: str = RAW_DIR) -> pd.DataFrame:
+    """
+    A letöltött nyers táblázat tisztítása, a származtatott mutatók kiszámítása és kimentése a gyorsítótárba.
+    Ha még nincs letöltve, letölti.
+    :param cache_format: "npy" vagy "csv", a mentés formátuma
+    :param raw_dir: a nyers táblázatok könyvtára
+    :return: a tisztított DataFrame
+    """
+    import derived
+    import downloader
+    import ksh_data
+
+    if cache_format not in CACHE_FORMATS:
+        raise ValueError(f"Ismeretlen formátum: {cache_format}. Választható: {', '.join(CACHE_FORMATS)}.")
+    file_name = downloader.target_file_name(URL, raw_dir)
+    if not os.path.exists(file_name):
+        fetch_raw_data(raw_dir)
+    encoding = downloader.load_metadata(file_name).get("encoding")  # a letöltéskor kapott kódolás
+    if cache_format == "npy":  # nagy táblázat esetén darabonként, közvetlenül a gyorsítótárba
+        return ksh_data.clean_to_npy(file_name, SAVE_FILE_NAME, encoding, DATASET, os.path.basename(URL))
+    df = ksh_data.cleanup(ksh_data.read_raw_csv(file_name, os.path.basename(URL), encoding), os.path.basename(URL))
+    df = derived.add_derived_metrics(df, DATASET["derived"], os.path.basename(URL))
+    ksh_data.save_content_as_csv(df, SAVE_FILE_NAME)
+    return df
+
+
+def print_stats(data: pd.DataFrame) -> None:
+    """
+    Az adatok első sorainak és a kiválasztott oszlopok statisztikájának kiírása
+    :param data: a tisztított DataFrame
+    """
+    print(data.head(15))  # első 15 sor kiírása, hogy látszódjon, hogy milyen adatok vannak a DataFrameben
+    print(data[
+              COLUMNS_NEEDED].describe())  # statisztika készítése a kiválasztott oszlopokról (átlag, min, max, medián, 25 és 75%-os percentilis), szórás
+
+
+def plot_charts(data: pd.DataFrame, out_dir: str | None = None, formats=("png",)) -> None:
+    """
+    A diagramok megjelenítése, vagy megjelenítés nélküli kimentése file-okba
+    :param data: a tisztított DataFrame
+    :param out_dir: ha meg van adva, a diagramok ebbe a könyvtárba kerülnek, megjelenítés nélkül
+    :param formats: a kimeneti formátumok, a diagrams.BATCH_FORMATS elemei közül
+    """
+    import diagrams
+
+    chart_jobs = build_chart_jobs(data, build_prediction_frame(data))
+    if out_dir:  # ha meg van adva egy kimeneti könyvtár, a diagramok megjelenítés nélkül, file-okba készülnek
+        file_names = diagrams.render_batch(chart_jobs, out_dir, formats=formats)
+        print(f"{len(file_names)} file elkészült a(z) {out_dir} könyvtárban")
+    else:
+        for chart_job in chart_jobs:
+            diagrams.show_job(chart_job)  # megjeleníti a diagramot, és megvárja, amíg az ablak bezárásra kerül
+
+
+def print_fits(data: pd.DataFrame) -> None:
+    """
+    A lineáris modellek hibájának és a legjobb előrejelző modelleknek a kiírása
+    :param data: a tisztított DataFrame
+    """
+    import models
+
+    # az eredmények gyorsítótárból jönnek, ha az adatok és a paraméterek nem változtak az előző futás óta
+    seed_1_error = models.cached_linear_accuracy(data, "year_start", "number_of_teachers", 1)
     print(f"Tanulók adatán 1-es seednél a lineáris modell hibája {seed_1_error: .2f}")
-    average_error = models.calculate_multiple_models(data, "year_start", "number_of_teachers")
+    average_error = models.cached_multiple_models(data, "year_start", "number_of_teachers")
     print(f"Tanulók adatán sok seednél a lineáris modellek átlagos hibája {average_error: .2f}")
+    print(f"Modell gyorsítótár: {models.RESULT_CACHE.format_stats()}")
+
+    # a lineáris trend mellett más modellcsaládok is kipróbálásra kerülnek, az utolsó évek előrejelzése alapján
+    best_forecasts, _ = models.select_forecast_models(data, "year_start", ["number_of_students", "number_of_teachers"])
+    print(best_forecasts[["family", "params", "mae"]])  # oszloponként a legjobb előrejelző modell
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    A parancssori paraméterek leírása. Parancs nélkül az all fut le.
+    :return: a parser
+    """
+    parser = argparse.ArgumentParser(description="KSH oktatási adatok letöltése, tisztítása, elemzése és ábrázolása")
+    parser.add_argument("--format", choices=CACHE_FORMATS, default="npy", help="a tisztított adat gyorsítótára")
+    parser.set_defaults(out=None, formats=["png"])  # parancs nélkül az all paraméterei
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("fetch", help="a nyers táblázat letöltése, ha változott (feltételes kéréssel)")
+    subparsers.add_parser("clean", help="a letöltött táblázat tisztítása és mentése a gyorsítótárba")
+    subparsers.add_parser("update", help="a gyorsítótár frissítése csak az új tanévekkel, és a lineáris modellek "
+                                         "együtthatói (csak npy formátummal)")
+    subparsers.add_parser("stats", help="az adatok első sorai és statisztikája")
+    subparsers.add_parser("fit", help="a modellek hibája és a legjobb előrejelző modellek")
+    for name, description in (("plot", "a diagramok megjelenítése vagy kimentése"),
+                              ("all", "statisztika, diagramok és modellek (alapértelmezett)")):
+        command_parser = subparsers.add_parser(name, help=description)
+        command_parser.add_argument("--out", help="a diagramok kimeneti könyvtára, megadása esetén nem nyit ablakot")
+        command_parser.add_argument("--formats", nargs="+", default=["png"], help="a kimeneti formátumok (png, svg, pdf)")
+    return parser
+
+
+def run(argv: list[str] | None = None) -> None:
+    """
+    A megadott parancs futtatása
+    :param argv: a parancssori paraméterek, alapértelmezetten a sys.argv
+    """
+    parser = build_parser()
+    arguments = parser.parse_args(argv)
+    command = arguments.command or "all"
+    if command == "fetch":
+        result = fetch_raw_data()
+        print(f"{result['path']}: {result['status']}, {result['bytes']} bájt")
+        return
+    if command == "clean":
+        print(f"{len(clean_raw_data(arguments.format))} sor került a gyorsítótárba")
+        return
+    if command == "update":
+        if arguments.format != "npy":
+            parser.error("az update csak az npy gyorsítótárral használható")
+        data, coefficients = update_data()
+        print(f"{len(data)} sor van a gyorsítótárban")
+        print(coefficients)
+        return
+
+    data = load_data(arguments.format)
+    if command in ("stats", "all"):
+        print_stats(data)
+    if command in ("plot", "all"):
+        plot_charts(data, arguments.out, arguments.formats)
+    if command in ("fit", "all"):
+        print_fits(data)
+
+
+if __name__ == '__main__':
+    metrics.configure_from_env()  # mérőpontok bekapcsolása, ha a KSH_METRICS be van állítva (pl. "jsonl:metrics.jsonl")
+    run(sys.argv[1:])
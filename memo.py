@@ -0,0 +1,309 @@
+"""
+Tartalom alapú gyorsítótár (memoizáció) a models függvényeinek eredményeihez.
+A kulcs a felhasznált oszlopok adatainak hash-éből és a többi paraméterből (oszlopnevek, seedek, test_size stb.)
+áll össze, így változatlan adatok esetén egy újabb futás csak egy hash számításába kerül, bármelyik bemenet
+megváltozása viszont új kulcsot, azaz újraszámolást jelent. A felhasznált oszlopok azok, amelyeket a memoize
+columns paraméterében megnevezett paraméterek (pl. x_col, y_col) megadnak.
+Két szintje van: a folyamaton belüli LRU gyorsítótár, és a lemezen tárolt, méretkorlátos gyorsítótár.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+MEMO_FORMAT_VERSION = 1  # a kulcsok és a mentett értékek formátumának verziója, változáskor minden kulcs új lesz
+DEFAULT_MEMORY_ITEMS = 1024  # a memóriában tartott eredmények maximális száma
+DEFAULT_DISK_BYTES = 64 * 1024 * 1024  # a lemezen tárolt eredmények maximális összmérete bájtban
+EVICT_TARGET = 0.9  # a korlát túllépésekor ekkora hányadára csökken a lemezen tárolt eredmények mérete
+
+
+def hash_values(values) -> str:
+    """
+    Egy oszlop (vagy tömb) tartalmának gyors hash-e
+    :param values: numpy tömb vagy pandas Series
+    :return: a hash hexadecimális alakban
+    """
+    array = np.asarray(values)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{array.dtype.str}{array.shape}".encode())  # a típus és az alak is számít
+    if array.dtype.kind in "biufcmM":
+        digest.update(np.ascontiguousarray(array).data)  # numerikus adat: a nyers bájtok, másolás nélkül
+    else:
+        # szöveges és egyéb adat: a pandas vektorizált, elemenkénti hash-e
+        digest.update(pd.util.hash_pandas_object(pd.Series(array), index=False).to_numpy().data)
+    return digest.hexdigest()
+
+
+def normalize_argument(value, column_names: set[str] | None):
+    """
+    Egy paraméter átalakítása JSON-ként ábrázolható, a kulcsba írható alakra
+    :param value: a paraméter értéke
+    :param column_names: a hívásban oszlopnévként használt nevek, DataFrame esetén csak ezek az oszlopok számítanak,
+                         None esetén az összes oszlop
+    :return: a kulcsba írható érték
+    """
+    if isinstance(value, pd.DataFrame):
+        if column_names is None:
+            columns = [str(name) for name in value.columns]
+            return {"dataframe": {name: hash_values(value.iloc[:, idx].to_numpy())
+                                  for idx, name in enumerate(columns)}, "columns": columns}
+        columns = sorted(name for name in column_names if name in value.columns)
+        return {"dataframe": {name: hash_values(value[name].to_numpy()) for name in columns}}
+    if isinstance(value, (pd.Series, np.ndarray)):
+        return {"array": hash_values(value)}
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    if isinstance(value, (list, tuple, range)):
+        return [normalize_argument(item, column_names) for item in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"A paraméter nem használható gyorsítótár kulcsaként: {type(value).__name__}")
+
+
+def column_argument_names(value) -> set[str]:
+    """
+    Egy oszlopnév-paraméter értékéből az oszlopnevek
+    :param value: egy oszlopnév, oszlopnevek listája, vagy None
+    :return: az oszlopnevek halmaza
+    """
+    if value is None:
+        return set()
+    if isinstance(value, str):
+        return {value}
+    return {name for name in value if isinstance(name, str)}
+
+
+def materialize_argument(value):
+    """
+    Az egyszer bejárható paraméterek (pl. generátor, map) tuple-lé alakítása, így a kulcs elkészítése után a
+    függvény is megkapja az összes elemet
+    :param value: a paraméter értéke
+    :return: a tuple, vagy változatlanul az érték, ha az nem ilyen
+    """
+    if isinstance(value, Iterable) and not isinstance(value, (str, bytes, dict, list, tuple, range, pd.DataFrame,
+                                                              pd.Series, np.ndarray)):
+        return tuple(value)
+    return value
+
+
+def to_json_value(value):
+    """
+    Egy eredmény átalakítása JSON-ként menthető alakra
+    :param value: szám, numpy szám vagy tömb, illetve ezek listája
+    :return: a menthető érték
+    """
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(item) for item in value]
+    return value
+
+
+class ResultCache:
+    """
+    Kétszintű gyorsítótár: memóriában tartott LRU és a lemezen tárolt, méretkorlátos tár.
+    A lemezen minden eredmény egy külön JSON file, a méretkorlát túllépésekor a legrégebben használt file-ok törlődnek.
+    A találatok és hiányok száma a stats dictionary-ben követhető.
+    """
+
+    def __init__(self, dir_name: str | None = ".model_cache", max_memory_items: int = DEFAULT_MEMORY_ITEMS,
+                 max_disk_bytes: int = DEFAULT_DISK_BYTES):
+        """
+        :param dir_name: a lemezen tárolt gyorsítótár könyvtára, None esetén csak a memóriában tárol
+        :param max_memory_items: a memóriában tartott eredmények maximális száma
+        :param max_disk_bytes: a lemezen tárolt eredmények maximális összmérete bájtban
+        """
+        self.dir_name = dir_name
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()  # kulcs -> eredmény, a legutóbb használt a végén
+        self.lock = threading.Lock()
+        self.disk_bytes = None  # a lemezen tárolt file-ok becsült összmérete, az első kiírásnál derül ki
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def make_key(self, func, args: tuple, kwargs: dict, columns: Iterable[str] = ()) -> str:
+        """
+        A hívás kulcsának elkészítése a függvény nevéből és a paraméterek (az adatok esetén azok hash-éből)
+        :param func: a hívott függvény
+        :param args: a pozicionális paraméterek
+        :param kwargs: a kulcsszavas paraméterek
+        :param columns: az oszlopneveket tartalmazó paraméterek neve (pl. ("x_col", "y_col")), a DataFrame-ekből
+                        csak az ezekben megadott oszlopok számítanak bele; üres esetén az összes oszlop
+        :return: a kulcs hexadecimális alakban
+        """
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()  # az alapértelmezett értékek is a kulcs részei
+        column_names = None
+        if columns:
+            column_names = set().union(*(column_argument_names(bound.arguments[name]) for name in columns))
+        description = {
+            "version": MEMO_FORMAT_VERSION,
+            "function": f"{func.__module__}.{func.__qualname__}",
+            "arguments": {name: normalize_argument(value, column_names) for name, value in bound.arguments.items()},
+        }
+        return hashlib.blake2b(json.dumps(description, sort_keys=True).encode(), digest_size=20).hexdigest()
+
+    def get(self, key: str) -> tuple[bool, object]:
+        """
+        Egy eredmény kikeresése, először a memóriában, majd a lemezen
+        :param key: a make_key által készített kulcs
+        :return: (megtalálta-e, az eredmény) pár
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)  # a legutóbb használt a végére kerül
+                self.stats["memory_hits"] += 1
+                metrics.count("memo_cache_requests", cache=self.dir_name or "memory", result="memory_hit")
+                return True, self.memory[key]
+        file_name = self.file_name(key)
+        if file_name is not None:
+            try:
+                with open(file_name, encoding="utf-8") as f:
+                    value = json.load(f)
+                os.utime(file_name)  # a használat idejének frissítése, a törlési sorrendhez
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+            else:
+                self.remember(key, value)
+                with self.lock:
+                    self.stats["disk_hits"] += 1
+                metrics.count("memo_cache_requests", cache=self.dir_name, result="disk_hit")
+                return True, value
+        with self.lock:
+            self.stats["misses"] += 1
+        metrics.count("memo_cache_requests", cache=self.dir_name or "memory", result="miss")
+        return False, None
+
+    def put(self, key: str, value) -> None:
+        """
+        Egy eredmény eltárolása a memóriában és a lemezen
+        :param key: a make_key által készített kulcs
+        :param value: az eredmény
+        """
+        value = to_json_value(value)
+        self.remember(key, value)
+        file_name = self.file_name(key)
+        if file_name is None:
+            return  # csak memóriában tárol
+        os.makedirs(self.dir_name, exist_ok=True)
+        temp_name = f"{file_name}.{threading.get_ident()}.tmp"
+        with open(temp_name, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        size = os.path.getsize(temp_name)
+        try:
+            replaced = os.path.getsize(file_name)  # azonos kulcs esetén a régi file mérete kikerül az összegből
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(temp_name, file_name)  # atomi csere, félkész file nem olvasható
+        with self.lock:
+            if self.disk_bytes is not None:
+                self.disk_bytes += size - replaced
+            over_budget = self.disk_bytes is None or self.disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self.evict()  # a könyvtár bejárása csak az első kiíráskor és a korlát túllépésekor
+
+    def remember(self, key: str, value) -> None:
+        """
+        Egy eredmény eltárolása a memóriában, a legrégebben használt eldobásával, ha betelt
+        :param key: a kulcs
+        :param value: az eredmény
+        """
+        with self.lock:
+            self.memory[key] = value
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_memory_items:
+                self.memory.popitem(last=False)  # a legrégebben használt eldobása
+
+    def file_name(self, key: str) -> str | None:
+        """
+        A kulcshoz tartozó file neve a lemezen
+        :param key: a kulcs
+        :return: a file teljes neve, vagy None, ha nincs lemezen tárolt gyorsítótár
+        """
+        if self.dir_name is None:
+            return None
+        return os.path.join(self.dir_name, f"{key}.json")
+
+    def evict(self) -> None:
+        """
+        A lemezen tárolt gyorsítótár méretének korlátozása, a legrégebben használt file-ok törlésével.
+        A könyvtár bejárása a tényleges összméretet is beállítja, így a más folyamatok által írt file-ok is számítanak.
+        """
+        entries = []
+        for entry in os.scandir(self.dir_name):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        # a korlát alá, a tartalékkal együtt, így nem minden további kiírás után kell a könyvtárat bejárni
+        limit = self.max_disk_bytes if total <= self.max_disk_bytes else self.max_disk_bytes * EVICT_TARGET
+        for _, size, path in sorted(entries):  # a legrégebben használttól kezdve
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # egy másik folyamat már törölte
+            total -= size
+        with self.lock:
+            self.disk_bytes = total
+
+    def clear(self) -> None:
+        """
+        A gyorsítótár teljes ürítése és a statisztikák nullázása
+        """
+        with self.lock:
+            self.memory.clear()
+            self.stats = {key: 0 for key in self.stats}
+            self.disk_bytes = None
+        if self.dir_name is not None and os.path.isdir(self.dir_name):
+            for entry in os.scandir(self.dir_name):
+                if entry.name.endswith(".json"):
+                    os.remove(entry.path)
+
+    def memoize(self, func, columns: Iterable[str] = ()):
+        """
+        A függvény becsomagolása, hogy az eredményét a gyorsítótárból adja vissza, ha már kiszámolta
+        :param func: a becsomagolandó függvény
+        :param columns: az oszlopneveket (vagy azok listáját) tartalmazó paraméterek neve, pl. ("x_col", "y_col");
+                        a DataFrame paraméterekből csak ezek az oszlopok kerülnek a kulcsba, üres esetén mindegyik
+        :return: a becsomagolt függvény, ugyanazokkal a paraméterekkel
+        """
+        columns = tuple(columns)
+        unknown = set(columns) - set(inspect.signature(func).parameters)
+        if unknown:
+            raise ValueError(f"A függvénynek nincs ilyen paramétere: {', '.join(sorted(unknown))}")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            args = tuple(materialize_argument(value) for value in args)
+            kwargs = {name: materialize_argument(value) for name, value in kwargs.items()}
+            key = self.make_key(func, args, kwargs, columns)
+            found, value = self.get(key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            self.put(key, value)
+            return value
+
+        wrapper.cache = self  # a gyorsítótár elérése a becsomagolt függvényből
+        return wrapper
+
+    def format_stats(self) -> str:
+        """
+        A találati statisztika szöveges alakja
+        :return: pl. "memória találat: 2, lemez találat: 1, hiány: 3"
+        """
+        return (f"memória találat: {self.stats['memory_hits']}, lemez találat: {self.stats['disk_hits']}, "
+                f"hiány: {self.stats['misses']}")
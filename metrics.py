@@ -0,0 +1,301 @@
+"""
+Könnyűsúlyú mérőpontok (időmérés, számlálók, mért értékek) a ksh_data, models és diagrams modulokhoz.
+Alapértelmezetten ki vannak kapcsolva, ekkor egy mérőpont költsége egyetlen feltételvizsgálat.
+Bekapcsolni egy vagy több kimenet (sink) megadásával lehet, pl.:
+metrics.configure(metrics.JsonLinesSink("metrics.jsonl"), metrics.PrometheusSink("metrics.prom"))
+vagy a KSH_METRICS környezeti változóval: KSH_METRICS="log,jsonl:metrics.jsonl,prometheus:metrics.prom"
+"""
+import atexit
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+METRICS_ENV = "KSH_METRICS"  # a kimeneteket megadó környezeti változó neve
+
+_enabled = False  # gyors ellenőrzéshez, kikapcsolt állapotban a mérőpontok azonnal visszatérnek
+_sinks = []  # a beállított kimenetek
+_NULL_TIMER = contextlib.nullcontext()  # kikapcsolt állapotban ezt adja vissza a timer, új objektum nélkül
+
+logger = logging.getLogger("ksh.metrics")
+
+
+class LogSink:
+    """
+    A mérések kiírása a logging modulon keresztül, INFO szinten
+    """
+
+    def __init__(self, log: logging.Logger = logger):
+        """
+        :param log: a használt logger
+        """
+        self.log = log
+
+    def emit(self, event: dict) -> None:
+        """
+        Egy mérés továbbítása
+        :param event: a mérés adatai (type, name, value, labels, time, opcionálisan start)
+        """
+        labels = " ".join(f"{key}={value}" for key, value in event["labels"].items())
+        self.log.info("%s %s=%s %s", event["type"], event["name"], event["value"], labels)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class JsonLinesSink:
+    """
+    A mérések kiírása egy JSON lines file-ba, soronként egy mérés
+    """
+
+    def __init__(self, file_name: str):
+        """
+        :param file_name: a file neve, a mérések a végére íródnak
+        """
+        self.file = open(file_name, "a", encoding="utf-8", buffering=1)  # soronként ürített puffer
+        self.lock = threading.Lock()
+
+    def emit(self, event: dict) -> None:
+        line = json.dumps(event, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+
+    def flush(self) -> None:
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+
+    def close(self) -> None:
+        """
+        A file lezárása, utána a kimenet nem használható
+        """
+        with self.lock:
+            self.file.close()
+
+
+def escape_label(value) -> str:
+    """
+    Címke értékének escape-elése a Prometheus szöveges formátumához: a \\, a " és az új sor jel
+    :param value: a címke értéke (pl. URL vagy hibaüzenet)
+    :return: az idézőjelek közé írható szöveg
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PrometheusSink:
+    """
+    A mérések összesítése és kiírása Prometheus szöveges formátumban (pl. a node_exporter textfile gyűjtőjének).
+    Az időmérésekből _count és _sum (summary), a számlálókból _total (counter), a mért értékekből az utolsó
+    érték (gauge) lesz, metrikánként egy # TYPE sorral.
+    A file a flush hívásakor (és a program végén) íródik ki, egy ideiglenes file átnevezésével.
+    """
+
+    def __init__(self, file_name: str):
+        """
+        :param file_name: a kimeneti file neve (a textfile gyűjtő .prom kiterjesztést vár)
+        """
+        self.file_name = file_name
+        self.series = {}  # (metrika neve, címkék) -> érték
+        self.types = {}  # metrika neve -> (típus, a mintákban szereplő nevek)
+        self.lock = threading.Lock()
+
+    def emit(self, event: dict) -> None:
+        labels = tuple(sorted(event["labels"].items()))
+        with self.lock:
+            if event["type"] == "timer":
+                self.types[event["name"]] = ("summary", (event["name"] + "_count", event["name"] + "_sum"))
+                for suffix, value in (("_count", 1), ("_sum", event["value"])):
+                    key = (event["name"] + suffix, labels)
+                    self.series[key] = self.series.get(key, 0) + value
+            elif event["type"] == "counter":
+                self.types[event["name"] + "_total"] = ("counter", (event["name"] + "_total",))
+                key = (event["name"] + "_total", labels)
+                self.series[key] = self.series.get(key, 0) + event["value"]
+            else:
+                self.types[event["name"]] = ("gauge", (event["name"],))
+                self.series[(event["name"], labels)] = event["value"]
+
+    def flush(self) -> None:
+        with self.lock:
+            samples = {}  # a minták neve -> a kiírt sorok
+            for (name, labels), value in sorted(self.series.items()):
+                label_text = ",".join(f'{key}="{escape_label(label)}"' for key, label in labels)
+                samples.setdefault(name, []).append(f"{name}{{{label_text}}} {value}" if label_text
+                                                    else f"{name} {value}")
+            lines = []
+            for family, (metric_type, names) in sorted(self.types.items()):
+                lines.append(f"# TYPE {family} {metric_type}")  # a metrika mintái előtt egyszer
+                for name in names:
+                    lines += samples.get(name, [])
+        temp_name = f"{self.file_name}.tmp"
+        with open(temp_name, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_name, self.file_name)
+
+    def close(self) -> None:
+        """
+        Az utolsó állapot kiírása, megnyitott file nincs
+        """
+        self.flush()
+
+
+def configure(*sinks) -> None:
+    """
+    A mérőpontok bekapcsolása a megadott kimenetekkel, kimenet nélkül kikapcsolja őket.
+    A lecserélt kimenetek ürítése után a close metódusuk is meghívásra kerül (pl. a JSON lines file lezárása),
+    az újra megadottak csak ürítésre kerülnek.
+    :param sinks: LogSink, JsonLinesSink, PrometheusSink vagy bármi, aminek van emit(event), flush() és close() metódusa
+    """
+    global _enabled
+    _enabled = False  # a csere alatt nem érkezik mérés a lezárt kimenetekbe
+    old_sinks = list(_sinks)
+    for sink in old_sinks:
+        sink.flush()  # a korábbi kimenetek ürítése
+    _sinks[:] = sinks
+    _enabled = bool(sinks)
+    for sink in old_sinks:
+        if not any(sink is new_sink for new_sink in sinks):
+            sink.close()
+
+
+def disable(close: bool = True) -> None:
+    """
+    A mérőpontok kikapcsolása, a kimenetek lezárásával (close hívásával).
+    A munkafolyamatok induláskor close=False-szal hívják meg, hogy a szülőtől örökölt kimenetekbe ne írjanak
+    (az eredményt a szülő méri, és a Prometheus file-t is a szülő írja ki).
+    :param close: a kimenetek lezárása, False esetén csak elengedi őket, ürítés nélkül
+    """
+    global _enabled
+    _enabled = False
+    old_sinks = list(_sinks)
+    _sinks.clear()
+    if close:
+        for sink in old_sinks:
+            sink.close()
+
+
+def configure_from_env(variable: str = METRICS_ENV) -> None:
+    """
+    A kimenetek beállítása egy környezeti változó alapján, pl. "log,jsonl:metrics.jsonl,prometheus:metrics.prom".
+    Ha a változó nincs beállítva, a mérőpontok kikapcsolnak, a korábbi kimenetek lezárásra kerülnek.
+    :param variable: a környezeti változó neve
+    """
+    sinks = []
+    for spec in filter(None, os.environ.get(variable, "").split(",")):
+        kind, _, file_name = spec.partition(":")
+        if kind == "log":
+            sinks.append(LogSink())
+        elif kind == "jsonl":
+            sinks.append(JsonLinesSink(file_name or "metrics.jsonl"))
+        elif kind == "prometheus":
+            sinks.append(PrometheusSink(file_name or "metrics.prom"))
+        else:
+            for sink in sinks:
+                sink.close()  # a már megnyitott file-ok lezárása
+            raise ValueError(f"Ismeretlen metrika kimenet: {kind}. Választható: log, jsonl, prometheus.")
+    configure(*sinks)
+
+
+def is_enabled() -> bool:
+    """
+    :return: be vannak-e kapcsolva a mérőpontok
+    """
+    return _enabled
+
+
+def emit(event_type: str, name: str, value: float, labels: dict, start: float | None = None) -> None:
+    """
+    Egy mérés továbbítása az összes kimenetnek
+    :param event_type: "timer", "counter" vagy "value"
+    :param name: a metrika neve, Prometheus konvenció szerint (pl. ksh_download_seconds)
+    :param value: a mért érték
+    :param labels: a címkék (pl. url, oszlop, diagram neve)
+    :param start: időmérés esetén a kezdés időpontja (Unix idő), a futások idővonalához
+    """
+    event = {"type": event_type, "name": name, "value": value, "labels": labels, "time": time.time()}
+    if start is not None:
+        event["start"] = start
+    for sink in _sinks:
+        sink.emit(event)
+
+
+class Timer:
+    """
+    Időmérő context manager, a blokk végén kiírja az eltelt időt másodpercben
+    """
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> "Timer":
+        self.start = time.time()
+        self.counter = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.labels["error"] = exc_type.__name__  # a hibával végződő futások is láthatóak
+        emit("timer", self.name, time.perf_counter() - self.counter, self.labels, self.start)
+
+
+def timer(name: str, **labels):
+    """
+    Egy kódrészlet futásidejének mérése: with metrics.timer("models_fit_seconds", function="..."): ...
+    :param name: a metrika neve
+    :param labels: a címkék
+    :return: időmérő context manager, kikapcsolt állapotban egy semmit sem csináló, közös objektum
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return Timer(name, labels)
+
+
+def record_timer(name: str, seconds: float, start: float, **labels) -> None:
+    """
+    Máshol (pl. egy munkafolyamatban) mért időtartam rögzítése
+    :param name: a metrika neve
+    :param seconds: az eltelt idő másodpercben
+    :param start: a kezdés időpontja (Unix idő)
+    :param labels: a címkék
+    """
+    if _enabled:
+        emit("timer", name, seconds, labels, start)
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """
+    Számláló növelése (pl. letöltött bájtok, gyorsítótár találatok)
+    :param name: a metrika neve
+    :param value: a növekmény
+    :param labels: a címkék
+    """
+    if _enabled:
+        emit("counter", name, value, labels)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """
+    Egy mért érték rögzítése (pl. feldolgozott sorok másodpercenként)
+    :param name: a metrika neve
+    :param value: a mért érték
+    :param labels: a címkék
+    """
+    if _enabled:
+        emit("value", name, value, labels)
+
+
+def flush() -> None:
+    """
+    Az összes kimenet ürítése (a Prometheus file kiírása)
+    """
+    for sink in _sinks:
+        sink.flush()
+
+
+atexit.register(flush)  # a program végén a pufferelt mérések kiírása
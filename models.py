@@ -1,10 +1,29 @@
+import copy
+import json
+import math
+import os
+import time
+from fractions import Fraction
+from typing import TYPE_CHECKING, Iterable
+
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
 
+if TYPE_CHECKING:
+    from sklearn.linear_model import LinearRegression  # a sklearn csak a használatkor töltődik be, lassú az importja
+
+import memo
+import metrics
+
+N_MODELS = 10  # lineáris modellek alapértelmezett száma, ennyi darabon átlagol a calculate_multiple_models
+TEST_SIZE = 0.2  # a tesztadatok alapértelmezett aránya
+BACKENDS = ("sklearn", "numpy")  # a választható számítási módok
+DEFAULT_BACKEND = "numpy"  # a gyors, vektorizált számítás az alapértelmezett
+# a modellek eredményeit tároló gyorsítótár könyvtára, a modul mellett, így nem függ az aktuális könyvtártól
+MODEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".model_cache")
 
-def create_linear_model(df: pd.DataFrame, x_col: str, y_col: str) -> LinearRegression:
+
+def create_linear_model(df: pd.DataFrame, x_col: str, y_col: str) -> "LinearRegression":
     """
     Lineáris regressziós modell számítása az összes adatból
     :param df: a megadott DataFrame
@@ -12,6 +31,8 @@ def create_linear_model(df: pd.DataFrame, x_col: str, y_col: str) -> LinearRegre
     :param y_col: y oszlop, amit próbál prediktálni
     :return: a modell
     """
+    from sklearn.linear_model import LinearRegression  # csak itt és a sklearn backendben van rá szükség
+
     # Lineáris regresszió
     X = df[[x_col]].values  # a DataFrame bemeneti adatainak elkérése
     y = df[y_col].values  # az x-ekhez tartozó értékek elkérése
@@ -22,33 +43,642 @@ def create_linear_model(df: pd.DataFrame, x_col: str, y_col: str) -> LinearRegre
     return model  # a függvény visszatér a modellel.
 
 
-def calculate_linear_accuracy(df: pd.DataFrame, x_col: str, y_col: str, random_seed: int) -> float:
+def select_target_columns(df: pd.DataFrame, x_col: str, y_cols: Iterable[str] | str = "all") -> list[str]:
     """
-    Lineáris regressziós modell számítása az összes adatból
+    A prediktálandó oszlopok listájának összeállítása
+    :param df: a megadott DataFrame
+    :param x_col: x oszlop, ez nem kerül a céloszlopok közé
+    :param y_cols: oszlopnevek listája, vagy "all" esetén az x oszlopon kívüli összes numerikus oszlop
+    :return: az oszlopnevek listája
+    """
+    if isinstance(y_cols, str):
+        if y_cols != "all":
+            return [y_cols]  # egyetlen oszlopnév
+        return [column for column in df.select_dtypes("number").columns if column != x_col]
+    return list(y_cols)
+
+
+def fit_linear_models(df: pd.DataFrame, x_col: str, y_cols: Iterable[str] | str = "all") -> pd.DataFrame:
+    """
+    Lineáris regressziós modellek számítása több oszlopra egyszerre, az összes adatból.
+    Minden célváltozó ugyanazt az x oszlopot használja, ezért az összegeket egyetlen mátrixszorzással
+    számolja, és az összes egyenest egy lépésben oldja meg.
+    A hiányzó (NaN) y értékek (pl. a mozgóátlagok első sorai) oszloponként kimaradnak az illesztésből.
+    :param df: a megadott DataFrame
+    :param x_col: x oszlop, ami alapján felállítja a modelleket
+    :param y_cols: a prediktálandó oszlopok listája, vagy "all" esetén az összes numerikus oszlop
+    :return: együttható-táblázat, soronként egy célváltozó, "intercept" és "slope" oszlopokkal
+    """
+    y_cols = select_target_columns(df, x_col, y_cols)
+    with metrics.timer("models_fit_seconds", function="fit_linear_models"):
+        x = df[x_col].to_numpy(dtype=np.float64)  # a közös bemeneti oszlop
+        y = df[y_cols].to_numpy(dtype=np.float64)  # a célváltozók egy (sorok) x (oszlopok) mátrixban
+        x_mean = x.mean()
+        x = x - x_mean  # középre tolás a pontosabb összegekért
+
+        present = ~np.isnan(y)
+        if present.all():
+            intercept, slope = linear_fit_from_sums(len(x), x.sum(), y.sum(axis=0), x @ x, x @ y)
+        else:  # oszloponkénti maszkkal, a hiányzó értékek 0 súllyal szerepelnek az összegekben
+            weights = present.astype(np.float64)
+            y = np.where(present, y, 0.0)
+            intercept, slope = linear_fit_from_sums(weights.sum(axis=0), x @ weights, y.sum(axis=0),
+                                                    (x * x) @ weights, x @ y)
+        intercept = intercept - slope * x_mean  # visszatolás az eredeti x skálára
+    metrics.count("models_fits", len(y_cols), function="fit_linear_models")
+
+    coefficients = pd.DataFrame({"intercept": intercept, "slope": slope}, index=pd.Index(y_cols, name="column"))
+    coefficients.attrs["x_col"] = x_col  # az x oszlop nevének megőrzése a táblázatban
+    return coefficients
+
+
+def predict_linear_models(coefficients: pd.DataFrame, x_values) -> pd.DataFrame:
+    """
+    Az együttható-táblázat összes modelljének kiértékelése a megadott x értékeken egyszerre
+    :param coefficients: a fit_linear_models által visszaadott táblázat
+    :param x_values: x értékek (pl. évszámok listája vagy range)
+    :return: DataFrame, soronként egy x érték, oszloponként egy célváltozó predikciója
+    """
+    x = np.asarray(x_values, dtype=np.float64)
+    # (x értékek) x (modellek) méretű mátrix egyetlen külső szorzattal
+    predicted = coefficients["intercept"].to_numpy() + np.outer(x, coefficients["slope"].to_numpy())
+    index = pd.Index(np.asarray(x_values), name=coefficients.attrs.get("x_col"))
+    return pd.DataFrame(predicted, index=index, columns=coefficients.index.tolist())
+
+
+def exact_dot(a, b) -> int | Fraction:
+    """
+    Két oszlop szorzatösszegének pontos (kerekítés nélküli) kiszámítása.
+    Egész számok esetén Python int, egyébként Fraction az eredmény, így a részösszegek összeadása
+    pontosan ugyanazt adja, mint a teljes összeg.
+    :param a: az első oszlop értékei
+    :param b: a második oszlop értékei
+    :return: az elemenkénti szorzatok összege
+    """
+    a = np.asarray(a)
+    b = np.asarray(b)
+    if a.dtype.kind in "iub" and b.dtype.kind in "iub":
+        return int((a.astype(object) * b.astype(object)).sum()) if len(a) else 0  # tetszőleges pontosságú int
+    return sum((Fraction(left) * Fraction(right) for left, right in zip(a.tolist(), b.tolist())), Fraction(0))
+
+
+def linear_sums(df: pd.DataFrame, x_col: str, y_cols: Iterable[str] | str = "all") -> dict:
+    """
+    A lineáris regresszió elégséges statisztikáinak (darabszám, összegek, négyzet- és szorzatösszegek) pontos
+    kiszámítása. Ezekből a coefficients_from_sums adja az együtthatókat, új sorok esetén pedig az
+    update_linear_sums csak az új sorokat dolgozza fel.
+    :param df: a megadott DataFrame
+    :param x_col: x oszlop, ami alapján a modellek készülnek
+    :param y_cols: a prediktálandó oszlopok listája, vagy "all" esetén az összes numerikus oszlop
+    :return: az összegek dictionary-ként
+    """
+    y_cols = select_target_columns(df, x_col, y_cols)
+    x = df[x_col].to_numpy()
+    ones = np.ones(len(x), dtype=np.int64)
+    return {
+        "x_col": x_col,
+        "count": len(x),
+        "sum_x": exact_dot(x, ones),
+        "sum_xx": exact_dot(x, x),
+        "columns": {column: {"sum_y": exact_dot(df[column].to_numpy(), ones),
+                             "sum_xy": exact_dot(x, df[column].to_numpy())} for column in y_cols},
+    }
+
+
+def update_linear_sums(sums: dict, new_rows: pd.DataFrame) -> dict:
+    """
+    Az elégséges statisztikák frissítése új sorokkal, csak az új sorok feldolgozásával
+    :param sums: a linear_sums által számolt (vagy korábban frissített) összegek
+    :param new_rows: az új sorok, ugyanazokkal az oszlopokkal
+    :return: a frissített összegek, megegyeznek a teljes adatra számolt linear_sums eredményével
+    """
+    added = linear_sums(new_rows, sums["x_col"], list(sums["columns"]))
+    return {
+        "x_col": sums["x_col"],
+        "count": sums["count"] + added["count"],
+        "sum_x": sums["sum_x"] + added["sum_x"],
+        "sum_xx": sums["sum_xx"] + added["sum_xx"],
+        "columns": {column: {key: value + added["columns"][column][key] for key, value in column_sums.items()}
+                    for column, column_sums in sums["columns"].items()},
+    }
+
+
+def coefficients_from_sums(sums: dict) -> pd.DataFrame:
+    """
+    A lineáris modellek együtthatói az elégséges statisztikákból, pontos számítással és egyetlen kerekítéssel
+    :param sums: a linear_sums vagy az update_linear_sums által számolt összegek
+    :return: együttható-táblázat, ugyanolyan szerkezetű, mint a fit_linear_models eredménye
+    """
+    count, sum_x = sums["count"], sums["sum_x"]
+    denominator = count * sums["sum_xx"] - sum_x * sum_x  # n-szerese az x négyzetes eltérései összegének
+    intercepts, slopes = [], []
+    for column_sums in sums["columns"].values():
+        slope = Fraction(0)  # nulla szórású x esetén a meredekség 0, ahogy a LinearRegression esetén is
+        if denominator != 0:
+            slope = Fraction(count * column_sums["sum_xy"] - sum_x * column_sums["sum_y"]) / denominator
+        intercepts.append(float((column_sums["sum_y"] - slope * sum_x) / count))
+        slopes.append(float(slope))
+    coefficients = pd.DataFrame({"intercept": intercepts, "slope": slopes},
+                                index=pd.Index(list(sums["columns"]), name="column"))
+    coefficients.attrs["x_col"] = sums["x_col"]
+    return coefficients
+
+
+def save_linear_sums(sums: dict, file_name: str) -> None:
+    """
+    Az elégséges statisztikák kimentése JSON formátumban, a törtek "számláló/nevező" szövegként
+    :param sums: a linear_sums által számolt összegek
+    :param file_name: a file teljes neve
+    """
+    def encode(value):
+        return str(value) if isinstance(value, Fraction) else value
+
+    data = {key: encode(value) for key, value in sums.items() if key != "columns"}
+    data["columns"] = {column: {key: encode(value) for key, value in column_sums.items()}
+                       for column, column_sums in sums["columns"].items()}
+    temp_name = f"{file_name}.tmp"
+    with open(temp_name, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(temp_name, file_name)  # atomi csere, félkész file nem olvasható
+
+
+def load_linear_sums(file_name: str) -> dict | None:
+    """
+    A save_linear_sums által mentett összegek visszaolvasása
+    :param file_name: a file teljes neve
+    :return: az összegek, vagy None, ha a file nem létezik vagy sérült
+    """
+    def decode(value):
+        return Fraction(value) if isinstance(value, str) else value
+
+    try:
+        with open(file_name, encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    sums = {key: (value if key == "x_col" else decode(value)) for key, value in data.items() if key != "columns"}
+    sums["columns"] = {column: {key: decode(value) for key, value in column_sums.items()}
+                       for column, column_sums in data["columns"].items()}
+    return sums
+
+
+def check_backend(backend: str) -> None:
+    """
+    A megadott számítási mód ellenőrzése, ismeretlen név esetén kivételt dob
+    :param backend: "sklearn" vagy "numpy"
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Ismeretlen backend: {backend}. Választható: {', '.join(BACKENDS)}.")
+
+
+def split_masks(n_samples: int, seeds: Iterable[int], test_size: float = TEST_SIZE) -> np.ndarray:
+    """
+    Az összes seedhez tartozó tanító/teszt felosztás előállítása egyetlen logikai mátrixban.
+    A felosztás megegyezik a train_test_split által adottal: ugyanazzal a seeddel ugyanazok a sorok kerülnek
+    a teszthalmazba.
+    :param n_samples: az adatsorok száma
+    :param seeds: a véletlenszám-generátor seedjei, soronként egy felosztás
+    :param test_size: a tesztadatok aránya (0 és 1 közötti szám) vagy darabszáma (egész szám)
+    :return: (seedek száma) x (adatsorok száma) méretű bool mátrix, a True a teszthalmazba kerülő sorokat jelöli
+    """
+    if isinstance(test_size, (int, np.integer)):
+        n_test = int(test_size)  # egész szám esetén a tesztsorok darabszáma
+    else:
+        n_test = math.ceil(test_size * n_samples)  # a sklearn is felfelé kerekít
+    seeds = list(seeds)
+    # a sklearn minden seedre egy RandomState permutációt készít, ennek az első n_test eleme a teszthalmaz
+    permutations = np.array([np.random.RandomState(seed).permutation(n_samples) for seed in seeds],
+                            dtype=np.intp).reshape(len(seeds), n_samples)
+    masks = np.zeros((len(seeds), n_samples), dtype=bool)
+    masks[np.arange(len(seeds))[:, None], permutations[:, :n_test]] = True  # a tesztsorok megjelölése egy lépésben
+    return masks
+
+
+def linear_fit_from_sums(count, sum_x, sum_y, sum_xx, sum_xy) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Egyváltozós lineáris regresszió (legkisebb négyzetek módszere) együtthatói az elégséges statisztikákból.
+    Minden paraméter lehet tömb is, ekkor az összes illesztést egyszerre számolja.
+    Ha az x értékek szórása nulla, a meredekség 0 lesz, ahogy a LinearRegression esetén is.
+    :param count: az adatpontok (súlyainak) összege
+    :param sum_x: az x értékek összege
+    :param sum_y: az y értékek összege
+    :param sum_xx: az x értékek négyzetösszege
+    :param sum_xy: az x és y értékek szorzatösszege
+    :return: (tengelymetszet, meredekség) pár
+    """
+    count = np.asarray(count, dtype=np.float64)
+    mean_x = sum_x / count  # x átlaga
+    mean_y = sum_y / count  # y átlaga
+    var_x = sum_xx - sum_x * mean_x  # x négyzetes eltéréseinek összege
+    cov_xy = sum_xy - sum_x * mean_y  # x és y szorzat-eltéréseinek összege
+    var_x, cov_xy = np.broadcast_arrays(var_x, cov_xy)
+    slope = np.divide(cov_xy, var_x, out=np.zeros(var_x.shape), where=var_x != 0)  # meredekség
+    intercept = mean_y - slope * mean_x  # tengelymetszet
+    return intercept, slope
+
+
+def batched_linear_errors(x_values, y_values, train_weights: np.ndarray,
+                          test_masks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sok lineáris modell tanítása és tesztelése egyszerre, a mátrixok minden sora egy felosztás.
+    A tanítóhalmazokon az összegeket egyetlen mátrixszorzással számolja, így nem kell modellenként illeszteni.
+    A súlyok lehetnek 0/1 értékek (tanító/teszt felosztás) vagy darabszámok (bootstrap minta).
+    :param x_values: x értékek (1 dimenziós)
+    :param y_values: y értékek (1 dimenziós)
+    :param train_weights: (felosztások) x (adatsorok) méretű mátrix, a sorok súlya a tanításban
+    :param test_masks: (felosztások) x (adatsorok) méretű bool mátrix, a True a tesztsorokat jelöli
+    :return: felosztásonként a teszthalmazon mért átlagos abszolút hiba és négyzetes középhiba (RMSE)
+    """
+    x = np.asarray(x_values, dtype=np.float64)
+    y = np.asarray(y_values, dtype=np.float64)
+    # az adatok középre tolása, a regresszió eltolás-invariáns, de így pontosabbak az összegek (pl. évszámoknál)
+    x = x - x.mean()
+    y = y - y.mean()
+
+    train = np.asarray(train_weights, dtype=np.float64)
+    intercept, slope = linear_fit_from_sums(train.sum(axis=1), train @ x, train @ y,
+                                            train @ (x * x), train @ (x * y))
+
+    y_errors = intercept[:, None] + slope[:, None] * x[None, :] - y[None, :]  # minden modell hibája minden pontra
+    test = test_masks.astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):  # üres teszthalmaz esetén NaN az eredmény
+        test_count = test.sum(axis=1)
+        mae = (np.abs(y_errors) * test).sum(axis=1) / test_count  # átlag csak a tesztsorokon
+        rmse = np.sqrt((y_errors * y_errors * test).sum(axis=1) / test_count)
+    return mae, rmse
+
+
+def batched_linear_mae(x_values, y_values, test_masks: np.ndarray) -> np.ndarray:
+    """
+    Sok lineáris modell tanítása és tesztelése egyszerre, a maszkmátrix minden sora egy felosztás
+    :param x_values: x értékek (1 dimenziós)
+    :param y_values: y értékek (1 dimenziós)
+    :param test_masks: split_masks által előállított bool mátrix
+    :return: felosztásonként a teszthalmazon mért átlagos abszolút hiba
+    """
+    return batched_linear_errors(x_values, y_values, ~test_masks, test_masks)[0]  # a tanítósorok a nem tesztsorok
+
+
+def calculate_linear_accuracy(df: pd.DataFrame, x_col: str, y_col: str, random_seed: int,
+                              test_size: float = TEST_SIZE, backend: str = DEFAULT_BACKEND) -> float:
+    """
+    Lineáris regressziós modell hibájának számítása véletlenszerű tanító/teszt felosztással
     :param df: a megadott DataFrame
     :param x_col: x oszlop, ami alapján felállítja a modellt
     :param y_col: y oszlop, amit próbál prediktálni
     :param random_seed: seed a véletlenszám-generátor számára, így determinisztikus értéket számol
-    :return: a modell
+    :param test_size: a tesztadatok aránya
+    :param backend: "sklearn" esetén LinearRegression-nel, "numpy" esetén zárt képlettel számol, az eredmény azonos
+    :return: a teszthalmazon mért átlagos abszolút hiba
     """
+    check_backend(backend)
+    metrics.count("models_fits", function="calculate_linear_accuracy", backend=backend)
+    if backend == "numpy":
+        with metrics.timer("models_fit_seconds", function="calculate_linear_accuracy", backend=backend):
+            masks = split_masks(len(df), [random_seed], test_size)  # egyetlen felosztás
+            return batched_linear_mae(df[x_col].values, df[y_col].values, masks)[0]
+
+    from sklearn.linear_model import LinearRegression  # csak a sklearn backendben van rá szükség
+    from sklearn.model_selection import train_test_split
+
     # Lineáris regresszió
     X = df[[x_col]].values  # a DataFrame bemeneti adatainak elkérése
     y = df[y_col].values  # az x-ekhez tartozó értékek elkérése
 
     # Adatok osztása tréningre és tesztelésre
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=random_seed)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_seed)
 
     # Lineáris regresszió modell betanítása a training adatokon
-    model = LinearRegression()  # a modell létrehozása
-    model.fit(X_train, y_train)  # a modell betanítása
+    with metrics.timer("models_fit_seconds", function="calculate_linear_accuracy", backend=backend):
+        model = LinearRegression()  # a modell létrehozása
+        model.fit(X_train, y_train)  # a modell betanítása
 
     y_pred = model.predict(X_test)  # predikciók kiszámítása az ismert helyeken
     y_errors = abs(y_pred - y_test)  # hibák abszolútértékének kiszámítása (lehetne négyzetes hiba is)
     return np.average(y_errors)  # visszatérés az átlagukkal
 
 
-def calculate_multiple_models(df: pd.DataFrame, x_col: str, y_col: str) -> float:
-    N = 10  # lineáris modellek száma, ennyi darabon átlagol a számításkor
-    # modellek átlagos hibáinak listája
-    errors = [calculate_linear_accuracy(df, x_col, y_col, i) for i in range(N)]
+def calculate_multiple_models(df: pd.DataFrame, x_col: str, y_col: str, seeds: Iterable[int] | None = None,
+                              test_size: float = TEST_SIZE, backend: str = DEFAULT_BACKEND) -> float:
+    """
+    Több, különböző véletlen felosztáson tanított lineáris modell átlagos hibája
+    :param df: a megadott DataFrame
+    :param x_col: x oszlop, ami alapján felállítja a modellt
+    :param y_col: y oszlop, amit próbál prediktálni
+    :param seeds: a felosztások seedjei, alapértelmezetten 0-tól N_MODELS-1-ig
+    :param test_size: a tesztadatok aránya
+    :param backend: "sklearn" esetén modellenként illeszt, "numpy" esetén az összes felosztást egyszerre számolja
+    :return: a modellek átlagos hibáinak átlaga
+    """
+    check_backend(backend)
+    if seeds is None:
+        seeds = range(N_MODELS)  # lineáris modellek száma, ennyi darabon átlagol a számításkor
+    if backend == "numpy":
+        with metrics.timer("models_fit_seconds", function="calculate_multiple_models", backend=backend):
+            masks = split_masks(len(df), seeds, test_size)  # az összes felosztás egy mátrixban
+            errors = batched_linear_mae(df[x_col].values, df[y_col].values, masks)
+        metrics.count("models_fits", len(masks), function="calculate_multiple_models", backend=backend)
+    else:
+        # modellek átlagos hibáinak listája
+        errors = [calculate_linear_accuracy(df, x_col, y_col, i, test_size, backend) for i in seeds]
     return np.average(errors)  # ezek átlaga az eredmény
+
+
+# a modellek eredményeinek gyorsítótára, változatlan adatok és paraméterek esetén nem számol újra
+RESULT_CACHE = memo.ResultCache(MODEL_CACHE_DIR)
+cached_linear_accuracy = RESULT_CACHE.memoize(calculate_linear_accuracy, columns=("x_col", "y_col"))
+cached_multiple_models = RESULT_CACHE.memoize(calculate_multiple_models, columns=("x_col", "y_col"))
+
+
+FORECAST_HOLDOUT = 5  # a modellválasztáskor a tesztelésre félretett utolsó évek száma
+
+
+class ForecastModel:
+    """
+    Előrejelző modellek közös felülete.
+    A fit egyszerre több célváltozóra (oszlopra) illeszt, a predict tetszőleges x értékekre ad előrejelzést.
+    A batch_predict ugyanannak a családnak több hiperparaméter-beállítását értékeli ki egyszerre, vektorizáltan.
+    """
+    family = ""  # a modellcsalád neve
+
+    def params(self) -> dict:
+        """
+        :return: a modell hiperparaméterei
+        """
+        raise NotImplementedError
+
+    def fit(self, x_values, y_values) -> "ForecastModel":
+        """
+        A modell illesztése
+        :param x_values: x értékek (pl. évszámok), növekvő sorrendben
+        :param y_values: y értékek, egy oszlop vagy (sorok) x (célváltozók) mátrix
+        :return: maga a modell, így a hívások láncolhatóak
+        """
+        raise NotImplementedError
+
+    def predict(self, x_values) -> np.ndarray:
+        """
+        Előrejelzés a megadott x értékekre
+        :param x_values: x értékek
+        :return: egy oszlopra illesztett modell esetén 1 dimenziós, egyébként (x értékek) x (célváltozók) tömb
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def batch_predict(cls, candidates: list["ForecastModel"], x_train, y_train, x_new) -> np.ndarray:
+        """
+        Több, azonos családba tartozó modell illesztése és kiértékelése egyszerre
+        :param candidates: a modellek (hiperparaméter-beállítások) listája
+        :param x_train: tanító x értékek
+        :param y_train: tanító y értékek, (sorok) x (célváltozók) mátrix
+        :param x_new: az x értékek, ahol az előrejelzés kell
+        :return: (modellek) x (x_new hossza) x (célváltozók) tömb
+        """
+        return np.stack([candidate.fit(x_train, y_train).predict(x_new) for candidate in candidates])
+
+    def __repr__(self) -> str:
+        params = ", ".join(f"{key}={value}" for key, value in self.params().items())
+        return f"{type(self).__name__}({params})"
+
+
+class LinearBasisForecast(ForecastModel):
+    """
+    Paramétereiben lineáris modellek (polinom, töréspontos egyenes) közös alapja.
+    Az x értékek a tanítóhalmaz terjedelmére skálázódnak, a bázisfüggvények ezen a skálán számolódnak.
+    """
+
+    def basis(self, u: np.ndarray, origin: float, scale: float) -> np.ndarray:
+        """
+        :param u: skálázott x értékek
+        :param origin: a skálázás kezdőpontja (a scaling eredménye), az x-ben megadott paraméterek skálázásához
+        :param scale: a skálázás terjedelme
+        :return: (x értékek) x (bázisfüggvények) mátrix
+        """
+        raise NotImplementedError
+
+    def fit(self, x_values, y_values) -> "LinearBasisForecast":
+        x = np.asarray(x_values, dtype=np.float64)
+        y = np.asarray(y_values, dtype=np.float64)
+        self.single = y.ndim == 1  # egy oszlop esetén az előrejelzés is egy oszlop lesz
+        self.origin, self.scale = scaling(x)
+        basis = self.basis((x - self.origin) / self.scale, self.origin, self.scale)
+        self.coefficients = np.linalg.pinv(basis) @ y.reshape(len(x), -1)
+        return self
+
+    def predict(self, x_values) -> np.ndarray:
+        u = (np.asarray(x_values, dtype=np.float64) - self.origin) / self.scale
+        predicted = self.basis(u, self.origin, self.scale) @ self.coefficients
+        return predicted[:, 0] if self.single else predicted
+
+    @classmethod
+    def batch_predict(cls, candidates, x_train, y_train, x_new) -> np.ndarray:
+        # minden jelölt bázismátrixa nullákkal egyforma szélességre kiegészítve, így egyetlen kötegelt
+        # pszeudoinverz számítással illeszthető az összes jelölt az összes célváltozóra. A jelöltek nem módosulnak,
+        # a közös skálázás paraméterként kerül a bázisfüggvényekhez.
+        x_train = np.asarray(x_train, dtype=np.float64)
+        origin, scale = scaling(x_train)
+        u_train = (x_train - origin) / scale
+        u_new = (np.asarray(x_new, dtype=np.float64) - origin) / scale
+        train_bases = [candidate.basis(u_train, origin, scale) for candidate in candidates]
+        new_bases = [candidate.basis(u_new, origin, scale) for candidate in candidates]
+        width = max(basis.shape[1] for basis in train_bases)
+        train_stack = np.stack([np.pad(basis, ((0, 0), (0, width - basis.shape[1]))) for basis in train_bases])
+        new_stack = np.stack([np.pad(basis, ((0, 0), (0, width - basis.shape[1]))) for basis in new_bases])
+        coefficients = np.linalg.pinv(train_stack) @ np.asarray(y_train, dtype=np.float64)  # (jelöltek) x p x k
+        return new_stack @ coefficients
+
+
+class PolynomialForecast(LinearBasisForecast):
+    """
+    Polinomiális trend, az 1. fokú polinom a lineáris regresszió
+    """
+    family = "polynomial"
+
+    def __init__(self, degree: int = 1):
+        """
+        :param degree: a polinom fokszáma
+        """
+        self.degree = degree
+
+    def params(self) -> dict:
+        return {"degree": self.degree}
+
+    def basis(self, u: np.ndarray, origin: float, scale: float) -> np.ndarray:
+        return np.vander(u, self.degree + 1, increasing=True)  # 1, u, u^2, ...
+
+
+class PiecewiseLinearForecast(LinearBasisForecast):
+    """
+    Töréspontos (szakaszonként lineáris, folytonos) trend, a töréspontok után a meredekség megváltozhat
+    """
+    family = "piecewise"
+
+    def __init__(self, breakpoints=()):
+        """
+        :param breakpoints: a töréspontok x értékei (pl. évszámok)
+        """
+        self.breakpoints = tuple(breakpoints)
+
+    def params(self) -> dict:
+        return {"breakpoints": self.breakpoints}
+
+    def basis(self, u: np.ndarray, origin: float, scale: float) -> np.ndarray:
+        knots = [(breakpoint - origin) / scale for breakpoint in self.breakpoints]  # a töréspontok a közös skálán
+        return np.column_stack([np.ones_like(u), u] + [np.maximum(u - knot, 0) for knot in knots])
+
+
+class HoltForecast(ForecastModel):
+    """
+    Holt-féle exponenciális simítás (szint és trend), egyenletesen elhelyezkedő x értékekhez (pl. évenként).
+    Az előrejelzés az utolsó szintből és trendből számolt egyenes: szint + trend * (lépések száma).
+    """
+    family = "holt"
+
+    def __init__(self, alpha: float = 0.5, beta: float = 0.1):
+        """
+        :param alpha: a szint simítási tényezője (0 és 1 között)
+        :param beta: a trend simítási tényezője (0 és 1 között)
+        """
+        self.alpha = alpha
+        self.beta = beta
+
+    def params(self) -> dict:
+        return {"alpha": self.alpha, "beta": self.beta}
+
+    @staticmethod
+    def smooth(alphas: np.ndarray, betas: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        A simítás futtatása egyszerre több (alpha, beta) párra és több célváltozóra, csak az idő mentén ciklussal
+        :param alphas: (jelöltek) hosszú tömb
+        :param betas: (jelöltek) hosszú tömb
+        :param y: (sorok) x (célváltozók) mátrix
+        :return: (jelöltek) x (célváltozók) méretű végső szint és trend
+        """
+        alphas = alphas[:, None]
+        betas = betas[:, None]
+        level = np.broadcast_to(y[0], (len(alphas), y.shape[1])).copy()  # kezdő szint: az első érték
+        trend = np.broadcast_to(y[1] - y[0] if len(y) > 1 else np.zeros(y.shape[1]), level.shape).copy()
+        for value in y[1:]:
+            previous_level = level
+            level = alphas * value + (1 - alphas) * (level + trend)
+            trend = betas * (level - previous_level) + (1 - betas) * trend
+        return level, trend
+
+    def fit(self, x_values, y_values) -> "HoltForecast":
+        x = np.asarray(x_values, dtype=np.float64)
+        y = np.asarray(y_values, dtype=np.float64)
+        self.single = y.ndim == 1
+        self.last_x = x[-1]
+        self.step = x[1] - x[0] if len(x) > 1 else 1.0  # az x értékek távolsága (pl. 1 év)
+        level, trend = self.smooth(np.array([self.alpha]), np.array([self.beta]), y.reshape(len(x), -1))
+        self.level, self.trend = level[0], trend[0]
+        return self
+
+    def predict(self, x_values) -> np.ndarray:
+        steps = (np.asarray(x_values, dtype=np.float64) - self.last_x) / self.step
+        predicted = self.level + np.outer(steps, self.trend)
+        return predicted[:, 0] if self.single else predicted
+
+    @classmethod
+    def batch_predict(cls, candidates, x_train, y_train, x_new) -> np.ndarray:
+        x_train = np.asarray(x_train, dtype=np.float64)
+        step = x_train[1] - x_train[0] if len(x_train) > 1 else 1.0
+        level, trend = cls.smooth(np.array([candidate.alpha for candidate in candidates]),
+                                  np.array([candidate.beta for candidate in candidates]),
+                                  np.asarray(y_train, dtype=np.float64))
+        steps = (np.asarray(x_new, dtype=np.float64) - x_train[-1]) / step
+        return level[:, None, :] + steps[None, :, None] * trend[:, None, :]
+
+
+def scaling(x: np.ndarray) -> tuple[float, float]:
+    """
+    Az x értékek skálázása a [0, 1] intervallumra, a polinomok numerikus stabilitásához
+    :param x: x értékek
+    :return: (kezdőpont, terjedelem) pár, nulla terjedelem esetén 1
+    """
+    origin = float(x.min())
+    return origin, float(x.max() - origin) or 1.0
+
+
+def default_forecast_candidates(x_values) -> list[ForecastModel]:
+    """
+    A modellválasztás alapértelmezett jelöltjei: 1-3. fokú polinomok, egy töréspontos egyenesek a belső évekre,
+    és Holt-simítás különböző paraméterekkel
+    :param x_values: a tanító x értékek, ezek közül kerülnek ki a töréspontok
+    :return: a jelöltek listája
+    """
+    x = np.sort(np.asarray(x_values))
+    candidates = [PolynomialForecast(degree) for degree in (1, 2, 3)]
+    candidates += [PiecewiseLinearForecast([float(breakpoint)]) for breakpoint in x[2:-2]]  # a szélső pontok kimaradnak
+    candidates += [HoltForecast(alpha, beta) for alpha in (0.2, 0.4, 0.6, 0.8, 1.0) for beta in (0.05, 0.1, 0.2, 0.4)]
+    return candidates
+
+
+def select_forecast_models(df: pd.DataFrame, x_col: str, y_cols: Iterable[str] | str = "all",
+                           holdout: int = FORECAST_HOLDOUT,
+                           candidates: list[ForecastModel] | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Modellválasztás: minden jelölt illesztése az utolsó holdout év nélkül, és a kihagyott éveken mért
+    átlagos abszolút hiba alapján a legjobb kiválasztása oszloponként. Családonként az összes jelölt és az azonos
+    sorokban kitöltött célváltozók egyetlen kötegelt számítással értékelődnek ki. A nyertes modellek a teljes adatra
+    illesztve kerülnek vissza.
+    A hiányzó (NaN) értékű sorok (pl. a növekedés és a mozgóátlagok első sorai) oszloponként kimaradnak, a holdout
+    az oszlop kitöltött soraiból számít. Az az oszlop, amelyben nincs legalább holdout + 2 kitöltött sor, kimarad
+    az eredményből.
+    :param df: a megadott DataFrame
+    :param x_col: x oszlop (pl. year_start)
+    :param y_cols: a prediktálandó oszlopok listája, vagy "all" esetén az összes numerikus oszlop
+    :param holdout: a tesztelésre félretett utolsó sorok száma, 1 és len(df) - 2 között
+    :param candidates: a jelöltek listája, alapértelmezetten a default_forecast_candidates eredménye, nem módosul
+    :return: (legjobb modellek táblázata oszloponként, az összes jelölt pontszáma és futásideje) pár
+    """
+    y_cols = select_target_columns(df, x_col, y_cols)
+    if not 1 <= holdout <= len(df) - 2:
+        raise ValueError(f"A holdout értéke 1 és {len(df) - 2} (a sorok száma - 2) között lehet, mert legalább egy "
+                         f"tesztsor és két tanítósor kell: {holdout}")
+    ordered = df.sort_values(x_col)
+    x = ordered[x_col].to_numpy(dtype=np.float64)
+    y = ordered[y_cols].to_numpy(dtype=np.float64)
+    finite = np.isfinite(y) & np.isfinite(x)[:, None]
+    patterns = {}  # a kitöltött sorok mintája -> az oszlopok sorszámai, az azonos mintájúak egy kötegben
+    for idx in range(len(y_cols)):
+        patterns.setdefault(finite[:, idx].tobytes(), []).append(idx)
+
+    rows = []
+    for column_indices in patterns.values():
+        mask = finite[:, column_indices[0]]
+        if mask.sum() < holdout + 2:
+            continue  # ennyi kitöltött sorból nem lehet tanítani és tesztelni
+        columns = [y_cols[idx] for idx in column_indices]
+        x_rows, y_rows = x[mask], y[mask][:, column_indices]
+        x_train, y_train, x_test, y_test = x_rows[:-holdout], y_rows[:-holdout], x_rows[-holdout:], y_rows[-holdout:]
+        families = {}  # családonként a jelöltek, a megadás sorrendjében
+        for candidate in candidates if candidates is not None else default_forecast_candidates(x_train):
+            families.setdefault(type(candidate), []).append(candidate)
+
+        for family, members in families.items():
+            wall_start, start = time.time(), time.perf_counter()
+            # (jelöltek) x (tesztsorok) x (oszlopok) méretű előrejelzés
+            predicted = family.batch_predict(members, x_train, y_train, x_test)
+            errors = np.abs(predicted - y_test[None, :, :]).mean(axis=1)  # (jelöltek) x (oszlopok)
+            elapsed = time.perf_counter() - start
+            metrics.record_timer("models_fit_seconds", elapsed, wall_start, function="select_forecast_models",
+                                 family=family.__name__)
+            metrics.count("models_fits", len(members) * len(columns), function="select_forecast_models",
+                          family=family.__name__)
+            for member, member_errors in zip(members, errors):
+                for column, error in zip(columns, member_errors):
+                    rows.append({"column": column, "family": member.family, "params": member.params(), "mae": error,
+                                 "candidate": member, "seconds": elapsed / len(members), "batch_seconds": elapsed})
+    if not rows:
+        raise ValueError(f"Egyik oszlopban sincs legalább {holdout + 2} kitöltött sor a modellválasztáshoz.")
+    scores = pd.DataFrame(rows)
+
+    scored = scores[np.isfinite(scores["mae"].to_numpy(dtype=np.float64))]  # pl. egy numerikusan instabil jelölt
+    best = scored.loc[scored.groupby("column", sort=False)["mae"].idxmin()].set_index("column")
+    best = best.loc[[column for column in y_cols if column in best.index]]  # a megadott oszlopsorrendben
+    # a nyertes jelölt újraillesztése az oszlop összes kitöltött sorára, oszloponként külön példányban
+    best["model"] = [copy.copy(candidate).fit(x[finite[:, y_cols.index(column)]],
+                                              y[finite[:, y_cols.index(column)], y_cols.index(column)])
+                     for column, candidate in best["candidate"].items()]
+    return best.drop(columns=["candidate"]), scores.drop(columns=["candidate"])
@@ -0,0 +1,212 @@
+"""
+A nyilvántartott adatkészletek (datasets.DATASETS) éjszakai feldolgozása: letöltés -> tisztítás -> származtatott
+mutatók -> illesztés -> diagram.
+Az adatkészletek egymástól függetlenek, ezért több folyamatban párhuzamosan futnak. Egy sikertelen adatkészlet
+néhányszor, növekvő várakozással újrapróbálkozik, és a végleges hibája sem állítja le a többit.
+Az illesztett együtthatók és az előrejelzések a serialization modul formátumában, a munkakönyvtárba kerülnek
+(<cache_name>.models.kshc, "coefficients" és "predictions" kulccsal).
+Minden sikeres futás után a bemenet hash-e (a letöltött file tartalma és az adatkészlet leírása) egy állapotfile-ba
+kerül, így a következő futás a változatlan bemenetű adatkészleteket kihagyja.
+Futtatás például: python scheduler.py --workers 8 --retries 2 --registry tablazatok.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import datasets
+import metrics
+
+PIPELINE_VERSION = 1  # a feldolgozás verziója, változáskor minden adatkészlet újra lefut
+DEFAULT_WORK_DIR = "pipeline"  # a letöltött, tisztított és elkészült file-ok könyvtára
+STATE_FILE_NAME = "state.json"  # az utolsó sikeres futások bemeneti hash-ei a munkakönyvtárban
+DEFAULT_RETRIES = 2  # az újrapróbálkozások száma adatkészletenként
+RETRY_DELAY = 5.0  # másodperc, az első újrapróbálkozás előtti várakozás, utána minden alkalommal duplázódik
+FORECAST_STEPS = 10  # az előrejelzés ennyi x értékkel (pl. évvel) tart tovább az utolsó adatnál
+
+_session = None  # a munkafolyamat HTTP sessionje, az első letöltéskor jön létre
+
+
+def input_hash(file_name: str, spec: dict) -> str:
+    """
+    Egy adatkészlet bemenetének hash-e: a letöltött file tartalma, az adatkészlet leírása és a feldolgozás verziója
+    :param file_name: a letöltött nyers file
+    :param spec: az adatkészlet leírása
+    :return: a hash hexadecimális alakban
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps({"version": PIPELINE_VERSION, "dataset": spec}, sort_keys=True).encode())
+    with open(file_name, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):  # darabonként, a file nem kerül egészében a memóriába
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_state(work_dir: str) -> dict:
+    """
+    Az utolsó sikeres futások adatainak beolvasása
+    :param work_dir: a munkakönyvtár
+    :return: adatkészletenként az input_hash, a sorok száma és a befejezés ideje, vagy üres dictionary
+    """
+    try:
+        with open(os.path.join(work_dir, STATE_FILE_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def process_dataset(spec: dict, work_dir: str, previous_hash: str | None) -> dict:
+    """
+    Egy adatkészlet teljes feldolgozása. Ha a bemenet hash-e megegyezik az előző sikeres futáséval, és a
+    gyorsítótár érvényes, a tisztítás, az illesztés és a rajzolás kimarad.
+    :param spec: az adatkészlet leírása
+    :param work_dir: a munkakönyvtár
+    :param previous_hash: az előző sikeres futás bemeneti hash-e, vagy None
+    :return: az eredmény: dataset, status ("processed" vagy "skipped"), input_hash, rows, files
+    """
+    global _session
+    import diagrams
+    import downloader
+    import ksh_data
+    import models
+    import serialization
+
+    if _session is None:
+        _session = downloader.create_session(1)
+    raw_dir = os.path.join(work_dir, "raw", spec["name"])  # adatkészletenként külön, az azonos file-nevek miatt
+    os.makedirs(raw_dir, exist_ok=True)
+    download = downloader.download_file(_session, spec["url"], raw_dir)  # feltételes kérés, ha már le van töltve
+    digest = input_hash(download["path"], spec)
+    cache_name = os.path.join(work_dir, spec["cache_name"])
+    schema = ksh_data.load_npy_schema(cache_name)
+    if digest == previous_hash and schema is not None:
+        return {"dataset": spec["name"], "status": "skipped", "input_hash": digest, "rows": schema["rows"],
+                "files": []}
+
+    # tisztítás a mutatókkal együtt a gyorsítótárba, nagy táblázatnál darabonként
+    df = ksh_data.clean_to_npy(download["path"], cache_name, download["encoding"], spec, spec["name"])
+    files = []
+    if spec["x_col"] is not None:
+        coefficients = models.fit_linear_models(df, spec["x_col"], spec["targets"] or "all")
+        x_values = df[spec["x_col"]]
+        predictions = models.predict_linear_models(coefficients, range(int(x_values.min()),
+                                                                       int(x_values.max()) + FORECAST_STEPS + 1))
+        # az együtthatók és az előrejelzések egy file-ban, kulcsonként külön is betölthetők (ksh_data.load_content)
+        ksh_data.save_content({"coefficients": coefficients, "predictions": predictions}, f"{cache_name}.models")
+        files.append(ksh_data.get_full_file_name(f"{cache_name}.models", serialization.EXTENSION))
+        charts_dir = os.path.join(work_dir, "charts")
+        os.makedirs(charts_dir, exist_ok=True)
+        job = diagrams.chart_job("line", spec["cache_name"], df[spec["x_col"]], df[coefficients.index.tolist()],
+                                 x_label=spec["x_col"], title=spec["title"])
+        files += diagrams.save_job(job, charts_dir)
+    return {"dataset": spec["name"], "status": "processed", "input_hash": digest, "rows": len(df), "files": files}
+
+
+def run_with_retries(spec: dict, work_dir: str, previous_hash: str | None, retries: int = DEFAULT_RETRIES,
+                     retry_delay: float = RETRY_DELAY) -> dict:
+    """
+    Egy adatkészlet feldolgozása újrapróbálkozással. Kivételt nem dob, a hiba az eredménybe kerül.
+    :param spec: az adatkészlet leírása
+    :param work_dir: a munkakönyvtár
+    :param previous_hash: az előző sikeres futás bemeneti hash-e, vagy None
+    :param retries: az újrapróbálkozások száma
+    :param retry_delay: az első újrapróbálkozás előtti várakozás másodpercben, utána duplázódik
+    :return: a process_dataset eredménye, vagy status="failed" és error, kiegészítve az attempts, start és
+             seconds értékekkel
+    """
+    start, counter = time.time(), time.perf_counter()
+    for attempt in range(retries + 1):
+        try:
+            result = process_dataset(spec, work_dir, previous_hash)
+            break
+        except Exception as e:
+            if attempt == retries:
+                result = {"dataset": spec["name"], "status": "failed", "error": f"{type(e).__name__}: {e}"}
+                break
+            time.sleep(retry_delay * 2 ** attempt)  # exponenciálisan növekvő várakozás, pl. átmeneti szerverhiba
+    result.update(attempts=attempt + 1, start=start, seconds=time.perf_counter() - counter)
+    return result
+
+
+def init_worker() -> None:
+    """
+    A munkafolyamatok inicializálása: megjelenítő nélküli backend és a szülőtől örökölt mérőpontok kikapcsolása
+    """
+    import diagrams
+
+    diagrams.init_batch_worker()
+
+
+def run_datasets(names: list[str] | None = None, work_dir: str = DEFAULT_WORK_DIR, max_workers: int | None = None,
+                 retries: int = DEFAULT_RETRIES, force: bool = False, retry_delay: float = RETRY_DELAY) -> list[dict]:
+    """
+    A megadott adatkészletek párhuzamos feldolgozása. Az állapotfile minden sikeres adatkészlet után frissül,
+    így egy megszakadt futás után is csak a hátralévők futnak le újra.
+    :param names: a feldolgozandó adatkészletek nevei, alapértelmezetten az összes nyilvántartott
+    :param work_dir: a munkakönyvtár, ha nem létezik, létrehozza
+    :param max_workers: a folyamatok száma, alapértelmezetten a processzormagok száma, 1 esetén nem indít új folyamatot
+    :param retries: az újrapróbálkozások száma adatkészletenként
+    :param force: ha igaz, a változatlan bemenetű adatkészletek is újra lefutnak
+    :param retry_delay: az első újrapróbálkozás előtti várakozás másodpercben
+    :return: adatkészletenként a run_with_retries eredménye, a megadás sorrendjében
+    """
+    import ksh_data
+
+    specs = [datasets.get_dataset(name) for name in names] if names else list(datasets.DATASETS.values())
+    os.makedirs(work_dir, exist_ok=True)
+    state = load_state(work_dir)
+    previous = {spec["name"]: None if force else state.get(spec["name"], {}).get("input_hash") for spec in specs}
+    results = {}
+
+    def finish(result: dict) -> None:
+        results[result["dataset"]] = result
+        metrics.record_timer("scheduler_dataset_seconds", result["seconds"], result["start"],
+                             dataset=result["dataset"], status=result["status"])
+        if result["status"] != "failed":
+            state[result["dataset"]] = {"input_hash": result["input_hash"], "rows": result["rows"],
+                                        "finished_at": time.time()}
+            ksh_data.write_json_atomic(state, os.path.join(work_dir, STATE_FILE_NAME))
+
+    if max_workers == 1:
+        init_worker()
+        for spec in specs:
+            finish(run_with_retries(spec, work_dir, previous[spec["name"]], retries, retry_delay))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker) as executor:
+            futures = {executor.submit(run_with_retries, spec, work_dir, previous[spec["name"]], retries,
+                                       retry_delay): spec for spec in specs}
+            for future in as_completed(futures):  # a befejezés sorrendjében, az állapot azonnal mentésre kerül
+                try:
+                    finish(future.result())
+                except Exception as e:  # pl. a munkafolyamat összeomlott
+                    finish({"dataset": futures[future]["name"], "status": "failed",
+                            "error": f"{type(e).__name__}: {e}", "attempts": 0, "start": time.time(), "seconds": 0.0})
+    return [results[spec["name"]] for spec in specs]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="A nyilvántartott KSH táblázatok párhuzamos feldolgozása")
+    parser.add_argument("--datasets", nargs="+", help="a feldolgozandó adatkészletek, alapértelmezetten az összes")
+    parser.add_argument("--registry", nargs="+", default=[], help="további adatkészletek leírása JSON file-okból")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="a munkakönyvtár")
+    parser.add_argument("--workers", type=int, default=None, help="a párhuzamos folyamatok száma")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="az újrapróbálkozások száma")
+    parser.add_argument("--retry-delay", type=float, default=RETRY_DELAY,
+                        help="az első újrapróbálkozás előtti várakozás másodpercben")
+    parser.add_argument("--force", action="store_true", help="a változatlan bemenetű adatkészletek is lefutnak")
+    arguments = parser.parse_args()
+
+    metrics.configure_from_env()  # mérőpontok bekapcsolása, ha a KSH_METRICS be van állítva
+    for registry_file in arguments.registry:
+        datasets.load_registry(registry_file)
+    run_results = run_datasets(arguments.datasets, arguments.work_dir, arguments.workers, arguments.retries,
+                               arguments.force, arguments.retry_delay)
+    for run_result in run_results:
+        detail = run_result.get("error") or f"{run_result['rows']} sor"
+        print(f"{run_result['dataset']}: {run_result['status']} ({detail}, {run_result['seconds']:.2f} s, "
+              f"{run_result['attempts']}. próbálkozás)")
+    if any(run_result["status"] == "failed" for run_result in run_results):
+        sys.exit(1)  # legalább egy adatkészlet feldolgozása sikertelen
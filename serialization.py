@@ -0,0 +1,319 @@
+"""
+Biztonságos és gyors mentési formátum a tárolt eredményekhez (DataFrame-ek, együttható-táblázatok, predikciók),
+a pickle helyett. A file szerkezete:
+    MAGIC | igazított nyers tömbök | JSON leíró | a leíró hossza, CRC32-je és a MAGIC (lábléc)
+A JSON leíró (manifest) tartalmazza a formátum verzióját, az objektum szerkezetét, és minden tömbhöz a helyét,
+típusát, alakját és CRC32 ellenőrzőösszegét. A betöltés nem futtat kódot, csak az itt felsorolt típusokat ismeri:
+None, bool, int, float, str, Fraction, list, tuple, dict, numpy tömb, pandas DataFrame, Series és Index.
+A tömbök memory-mappelve töltődnek be, a legfelső szintű dictionary elemei kulcsonként, a DataFrame-ek
+oszloponként is betölthetők, így egy nagy file-ból csak a szükséges rész kerül beolvasásra.
+A mentés egy ideiglenes file átnevezésével történik, így olvasáskor soha nem látszik félkész tartalom.
+"""
+import json
+import os
+import struct
+import zlib
+from fractions import Fraction
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1  # a formátum verziója, más verziójú file nem tölthető be
+EXTENSION = "kshc"  # a file-ok alapértelmezett kiterjesztése
+MAGIC = b"KSHCONT\x01"  # a file elején és végén álló azonosító
+ALIGNMENT = 64  # a tömbök kezdőcíme ennek többszöröse, így a memory-mappelt tömbök igazítottak
+FOOTER = struct.Struct("<QI8s")  # a leíró hossza, CRC32-je és a MAGIC
+ARRAY_KINDS = "biufcmMUS"  # a nyers bájtokként menthető numpy típusok (szám, dátum, szöveg)
+
+
+def encode_array(values: np.ndarray, buffers: list[np.ndarray]) -> dict:
+    """
+    Egy numpy tömb leírása, a tömb a buffers listába kerül
+    :param values: a mentendő tömb
+    :param buffers: a kiírandó tömbök listája, bővül
+    :return: a tömb leírása a manifestben
+    """
+    if values.dtype.hasobject:
+        items = values.ravel()
+        if pd.api.types.infer_dtype(items, skipna=False) == "string":  # csak szöveg, egyetlen gyors menetben
+            values = values.astype(str)  # szöveg: fix szélességű unicode tömbként, mint az npy gyorsítótárban
+        else:  # vegyes tartalom (pl. hiányzó értékek): elemenként, a leíróban
+            return {"type": "objects", "items": [encode(item, buffers) for item in items],
+                    "shape": list(values.shape)}
+    if values.dtype.kind not in ARRAY_KINDS:
+        raise TypeError(f"Nem menthető tömbtípus: {values.dtype}")
+    buffers.append(np.ascontiguousarray(values))
+    return {"type": "ndarray", "buffer": len(buffers) - 1}
+
+
+def encode_values(values: pd.Series | pd.Index, buffers: list[np.ndarray]) -> dict:
+    """
+    Egy pandas oszlop vagy index értékeinek leírása. A pandas saját típusai (pl. str, Int64) a típus
+    nevével együtt kerülnek mentésre, a hiányzó értékek None-ként, és betöltéskor a típus saját hiányjelölésével
+    (pl. str esetén NaN, Int64 esetén NA) térnek vissza. Az object típusú oszlopok értékei (a None és a NaN is)
+    változatlanok maradnak, a típus nevével együtt, mert a pandas egyébként str típusúnak ismerné fel őket.
+    A category típus a kódokkal, a kategóriákkal és a sorrendezéssel együtt kerül mentésre.
+    :param values: az oszlop vagy az index
+    :param buffers: a kiírandó tömbök listája, bővül
+    :return: az értékek leírása a manifestben
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # a kódok tömbként, a kategóriák (a nem használtak is) és a sorrendezés külön, így a típus pontosan visszaáll
+        return {"type": "categorical", "codes": encode_array(np.asarray(values.array.codes), buffers),
+                "categories": encode_values(values.dtype.categories, buffers), "ordered": values.dtype.ordered}
+    if values.dtype == object:
+        node = encode_array(values.to_numpy(), buffers)
+        node["pandas_dtype"] = "object"
+        return node
+    if isinstance(values.dtype, np.dtype):
+        return encode_array(values.to_numpy(), buffers)
+    node = encode_array(values.to_numpy(dtype=object, na_value=None), buffers)
+    node["pandas_dtype"] = str(values.dtype)
+    return node
+
+
+def encode_index(index: pd.Index, buffers: list[np.ndarray]) -> dict:
+    """
+    :param index: a DataFrame vagy Series indexe
+    :param buffers: a kiírandó tömbök listája, bővül
+    :return: az index leírása a manifestben, RangeIndex esetén tömb nélkül
+    """
+    if isinstance(index, pd.RangeIndex):
+        return {"type": "range", "start": index.start, "stop": index.stop, "step": index.step,
+                "name": encode(index.name, buffers)}
+    if isinstance(index, pd.MultiIndex):
+        raise TypeError("A MultiIndex nem menthető, előtte reset_index szükséges.")
+    return {"type": "index", "values": encode_values(index, buffers), "name": encode(index.name, buffers)}
+
+
+def encode(value: Any, buffers: list[np.ndarray]) -> Any:
+    """
+    Egy objektum leírása JSON-ként ábrázolható formában, a numpy tömbök a buffers listába kerülnek
+    :param value: a mentendő objektum
+    :param buffers: a kiírandó tömbök listája, bővül
+    :return: a leírás (a JSON alaptípusok változatlanul, a többi típus egy "type" kulcsú dictionary-ként)
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value  # a numpy skalárok közül a float64 és a str_ is ide tartozik, ezek Python típusként mentődnek
+    if isinstance(value, np.generic):
+        return encode(value.item(), buffers)  # numpy skalár Python értékként
+    if isinstance(value, Fraction):
+        return {"type": "fraction", "numerator": value.numerator, "denominator": value.denominator}
+    if isinstance(value, (list, tuple)):
+        return {"type": type(value).__name__, "items": [encode(item, buffers) for item in value]}
+    if isinstance(value, dict):
+        return {"type": "dict", "keys": [encode(key, buffers) for key in value],
+                "values": [encode(item, buffers) for item in value.values()]}
+    if isinstance(value, np.ndarray):
+        return encode_array(value, buffers)
+    if isinstance(value, pd.DataFrame):
+        return {"type": "dataframe", "columns": [encode(column, buffers) for column in value.columns],
+                "data": [encode_values(value.iloc[:, idx], buffers) for idx in range(value.shape[1])],
+                "index": encode_index(value.index, buffers), "attrs": encode(dict(value.attrs), buffers)}
+    if isinstance(value, pd.Series):
+        return {"type": "series", "name": encode(value.name, buffers), "data": encode_values(value, buffers),
+                "index": encode_index(value.index, buffers), "attrs": encode(dict(value.attrs), buffers)}
+    if isinstance(value, pd.Index):
+        return encode_index(value, buffers)
+    raise TypeError(f"Nem menthető típus: {type(value).__name__}")
+
+
+def save(data: Any, file_name: str) -> None:
+    """
+    Egy objektum kimentése, egy ideiglenes file-on keresztül
+    :param data: a mentendő objektum, a modul leírásában felsorolt típusokból összeállítva
+    :param file_name: a file teljes neve
+    """
+    buffers = []
+    root = encode(data, buffers)  # a nem menthető típusok már itt kiderülnek, a régi file érintetlen marad
+    temp_name = f"{file_name}.tmp"
+    with open(temp_name, "wb") as f:
+        f.write(MAGIC)
+        entries = []
+        for values in buffers:
+            f.write(b"\0" * (-f.tell() % ALIGNMENT))  # igazítás
+            raw = values.reshape(-1).view(np.uint8)  # a tömb nyers bájtjai, másolás nélkül
+            entries.append({"offset": f.tell(), "nbytes": raw.nbytes, "dtype": values.dtype.str,
+                            "shape": list(values.shape), "crc32": zlib.crc32(raw)})
+            f.write(raw)
+        manifest = json.dumps({"format_version": FORMAT_VERSION, "root": root, "buffers": entries},
+                              ensure_ascii=False).encode()
+        f.write(manifest)
+        f.write(FOOTER.pack(len(manifest), zlib.crc32(manifest), MAGIC))
+    os.replace(temp_name, file_name)  # az átnevezés atomi, a régi tartalmat egy lépésben cseréli le
+
+
+class Container:
+    """
+    Egy mentett file megnyitása. Megnyitáskor csak a lábléc és a leíró kerül beolvasásra, a tömbök
+    memory-mappelve, az első használatukkor töltődnek be (és ekkor ellenőrződik a CRC32-jük).
+    """
+
+    def __init__(self, file_name: str, verify: bool = True):
+        """
+        :param file_name: a file teljes neve
+        :param verify: ellenőrizze-e a tömbök CRC32 ellenőrzőösszegét az első használatukkor
+                       (a leíró ellenőrzőösszege mindig ellenőrzésre kerül)
+        """
+        self.file_name = file_name
+        self.verify = verify
+        with open(file_name, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size < len(MAGIC) + FOOTER.size:
+                raise ValueError(f"Sérült vagy ismeretlen formátumú file: {file_name}")
+            f.seek(size - FOOTER.size)
+            length, checksum, magic = FOOTER.unpack(f.read(FOOTER.size))
+            f.seek(0)
+            if magic != MAGIC or f.read(len(MAGIC)) != MAGIC or length > size - len(MAGIC) - FOOTER.size:
+                raise ValueError(f"Sérült vagy ismeretlen formátumú file: {file_name}")
+            f.seek(size - FOOTER.size - length)
+            manifest = f.read(length)
+        if zlib.crc32(manifest) != checksum:
+            raise ValueError(f"Hibás ellenőrzőösszeg: {file_name}")
+        manifest = json.loads(manifest)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Nem támogatott formátumverzió: {manifest.get('format_version')}")
+        self.root = manifest["root"]
+        self.buffers = manifest["buffers"]
+        self.arrays = {}  # a már megnyitott (és ellenőrzött) tömbök
+
+    def array(self, idx: int) -> np.ndarray:
+        """
+        :param idx: a tömb sorszáma a leíróban
+        :return: a memory-mappelt, csak olvasható tömb
+        """
+        if idx not in self.arrays:
+            entry = self.buffers[idx]
+            dtype, shape = np.dtype(entry["dtype"]), tuple(entry["shape"])
+            if entry["nbytes"] == 0:
+                values = np.empty(shape, dtype)  # üres tömb nem mappelhető
+            else:
+                values = np.memmap(self.file_name, dtype, mode="r", offset=entry["offset"], shape=shape)
+                values = values.view(np.ndarray)  # sima tömbként, a mappelt memóriát továbbra is használva
+            if self.verify and zlib.crc32(values.reshape(-1).view(np.uint8)) != entry["crc32"]:
+                raise ValueError(f"Hibás ellenőrzőösszeg: {self.file_name}, {idx}. tömb")
+            self.arrays[idx] = values
+        return self.arrays[idx]
+
+    def decode_values(self, node: dict):
+        """
+        :param node: egy tömb vagy pandas oszlop leírása
+        :return: numpy tömb, vagy pandas típus esetén pandas tömb
+        """
+        if node["type"] == "categorical":
+            categories = pd.Index(self.decode_values(node["categories"]), dtype=self.values_dtype(node["categories"]))
+            return pd.Categorical.from_codes(self.decode_values(node["codes"]),
+                                             dtype=pd.CategoricalDtype(categories, node["ordered"]))
+        if node["type"] == "ndarray":
+            values = self.array(node["buffer"])
+        else:
+            values = np.empty(len(node["items"]), dtype=object)
+            values[:] = [self.decode(item) for item in node["items"]]
+            values = values.reshape(node["shape"])
+        if node.get("pandas_dtype") == "object":
+            return values.astype(object, copy=False)  # a Series és az Index konstruktora dtype=object-tel kapja meg
+        if "pandas_dtype" in node:
+            return pd.array(values, dtype=node["pandas_dtype"])
+        return values
+
+    @staticmethod
+    def values_dtype(node: dict) -> str | None:
+        """
+        :param node: egy pandas oszlop vagy index leírása
+        :return: "object" az object típusú oszlopoknál, különben None (a típust az értékek határozzák meg)
+        """
+        return "object" if node.get("pandas_dtype") == "object" else None
+
+    def decode_index(self, node: dict) -> pd.Index:
+        """
+        :param node: az index leírása
+        :return: a visszaállított index
+        """
+        if node["type"] == "range":
+            return pd.RangeIndex(node["start"], node["stop"], node["step"], name=self.decode(node["name"]))
+        return pd.Index(self.decode_values(node["values"]), dtype=self.values_dtype(node["values"]),
+                        name=self.decode(node["name"]), copy=False)
+
+    def decode(self, node: Any, columns: list | None = None) -> Any:
+        """
+        Egy leírás visszaalakítása objektummá
+        :param node: a leírás
+        :param columns: DataFrame esetén opcionálisan a betöltendő oszlopok, a többi oszlop tömbje nem kerül megnyitásra
+        :return: a visszaállított objektum
+        """
+        if not isinstance(node, dict):
+            return node  # JSON alaptípus
+        kind = node["type"]
+        if kind == "fraction":
+            return Fraction(node["numerator"], node["denominator"])
+        if kind in ("list", "tuple"):
+            items = [self.decode(item) for item in node["items"]]
+            return tuple(items) if kind == "tuple" else items
+        if kind == "dict":
+            return {self.decode(key): self.decode(item) for key, item in zip(node["keys"], node["values"])}
+        if kind in ("ndarray", "objects"):
+            return self.decode_values(node)
+        if kind in ("range", "index"):
+            return self.decode_index(node)
+        if kind == "series":
+            series = pd.Series(self.decode_values(node["data"]), index=self.decode_index(node["index"]),
+                               dtype=self.values_dtype(node["data"]), name=self.decode(node["name"]), copy=False)
+            series.attrs.update(self.decode(node["attrs"]))
+            return series
+        if kind == "dataframe":
+            names = [self.decode(column) for column in node["columns"]]
+            selected = [idx for idx, name in enumerate(names) if columns is None or name in columns]
+            index = self.decode_index(node["index"])
+            # sorszámokkal felépítve, így az ismétlődő oszlopnevek is megmaradnak
+            df = pd.DataFrame({position: pd.Series(self.decode_values(node["data"][idx]), index=index,
+                                                   dtype=self.values_dtype(node["data"][idx]), copy=False)
+                               for position, idx in enumerate(selected)}, index=index, copy=False)
+            df.columns = pd.Index([names[idx] for idx in selected])
+            df.attrs.update(self.decode(node["attrs"]))
+            return df
+        raise ValueError(f"Ismeretlen típus a file-ban: {kind}")
+
+    def keys(self) -> list:
+        """
+        :return: a legfelső szintű dictionary kulcsai
+        """
+        if not isinstance(self.root, dict) or self.root["type"] != "dict":
+            raise TypeError("A mentett objektum nem dictionary, nem tölthető be kulcsonként.")
+        return [self.decode(key) for key in self.root["keys"]]
+
+    def get(self, key: Any, columns: list | None = None) -> Any:
+        """
+        A legfelső szintű dictionary egy elemének betöltése, a többi elem tömbjei nem kerülnek megnyitásra
+        :param key: a kulcs
+        :param columns: DataFrame esetén opcionálisan a betöltendő oszlopok
+        :return: a visszaállított elem
+        """
+        keys = self.keys()
+        if key not in keys:
+            raise KeyError(key)
+        return self.decode(self.root["values"][keys.index(key)], columns)
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.get(key)
+
+    def load(self) -> Any:
+        """
+        :return: a teljes mentett objektum
+        """
+        return self.decode(self.root)
+
+
+def load(file_name: str, key: Any = None, columns: list | None = None, verify: bool = True) -> Any:
+    """
+    Egy mentett objektum, vagy annak egy eleme betöltése
+    :param file_name: a file teljes neve
+    :param key: opcionálisan a legfelső szintű dictionary egy kulcsa, ekkor csak ez az elem töltődik be
+    :param columns: DataFrame esetén opcionálisan a betöltendő oszlopok
+    :param verify: ellenőrizze-e a tömbök CRC32 ellenőrzőösszegét
+    :return: a visszaállított objektum
+    """
+    container = Container(file_name, verify)
+    if key is not None:
+        return container.get(key, columns)
+    return container.decode(container.root, columns)
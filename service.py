@@ -0,0 +1,377 @@
+"""
+Szolgáltatás mód: a tisztított adatok, a lineáris előrejelzések és a diagramok kiszolgálása HTTP-n keresztül.
+Az adatok és a modellek egyszer töltődnek be, és a memóriában maradnak, így egy kérés nem fizeti meg az
+importok, a betöltés és az illesztés idejét. A diagramok egy külön folyamatkészletben (process pool) készülnek,
+az eseményhurok közben tovább szolgálja ki a többi kérést. Ha a gyorsítótár (school.npycache) megváltozik,
+az adatok a háttérben újratöltődnek, és a kész állapot egy lépésben cserélődik le.
+Futtatás például: python service.py --port 8080 --workers 2
+Végpontok:
+GET /health                               állapot, a betöltött sorok száma és a betöltés ideje
+GET /stats                                a kiválasztott oszlopok describe() statisztikája JSON-ként
+GET /predict?start=2020&end=2035&columns=number_of_students,number_of_teachers
+                                          a lineáris modellek előrejelzése a megadott évekre (a határokkal együtt)
+GET /charts                               az elérhető diagramok nevei
+GET /charts/<név>.png                     egy diagram PNG képként
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+import diagrams
+import ksh_data
+import main
+import metrics
+import models
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_WORKERS = 2  # a diagramokat rajzoló folyamatok száma
+DEFAULT_POLL = 5.0  # másodperc, a gyorsítótár változásának ellenőrzése ennyi időnként
+PREDICTION_CACHE_SIZE = 1024  # a memóriában tartott előrejelzés-válaszok maximális száma
+MAX_PREDICTION_YEARS = 1000  # egy előrejelzés kérésben megadható évek maximális száma
+MAX_HEADER_LINES = 100  # egy kérés fejléc-sorainak maximális száma
+
+logger = logging.getLogger("ksh.service")
+
+
+class RequestError(Exception):
+    """
+    Hibás kérés, a szöveg a válaszba kerül
+    """
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ServiceState:
+    """
+    A kiszolgált adatok egy betöltött állapota. Betöltés után nem változik, az újratöltés egy új példányt készít.
+    """
+    # a gyorsítótár írásai (betöltéskor a hiányzó mutatók, frissítéskor az új sorok) ezen a közös zárón sorakoznak,
+    # mert külön szálakban futnak, és az egyidejű hozzáfűzés elronthatná az oszlopfile-okat
+    cache_lock = threading.Lock()
+
+    def __init__(self, data: pd.DataFrame, source_mtime: int | None):
+        """
+        :param data: a tisztított DataFrame, a memóriába másolva
+        :param source_mtime: a gyorsítótár fejlécének módosítási ideje a betöltéskor (nanoszekundum)
+        """
+        self.data = data
+        self.source_mtime = source_mtime
+        self.loaded_at = time.time()
+        self.coefficients = models.fit_linear_models(data, "year_start")  # az összes numerikus oszlop egyenese
+        self.charts = {job["name"]: job for job in main.build_chart_jobs(data, main.build_prediction_frame(data))}
+        self.stats_body = data[main.COLUMNS_NEEDED].describe().to_json().encode()  # a válasz egyszer készül el
+        self.default_range = (int(data["year_start"].min()), int(data["year_start"].max()) + main.FUTURE_YEARS - 1)
+
+
+def source_mtime() -> int | None:
+    """
+    A gyorsítótár fejlécének módosítási ideje. A fejléc minden mentés és hozzáfűzés végén újraíródik.
+    :return: a módosítás ideje nanoszekundumban, vagy None, ha nincs gyorsítótár
+    """
+    schema_name = os.path.join(ksh_data.get_full_file_name(main.SAVE_FILE_NAME, ksh_data.CACHE_EXTENSION),
+                               ksh_data.SCHEMA_FILE_NAME)
+    try:
+        return os.stat(schema_name).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_state() -> ServiceState:
+    """
+    Az adatok betöltése (szükség esetén letöltése) és a modellek illesztése
+    :return: az új állapot
+    """
+    mtime = source_mtime()  # a betöltés előtt, így a betöltés közbeni változás a következő ellenőrzéskor látszik
+    with ServiceState.cache_lock:  # a load_data is írhat a gyorsítótárba (első mentés, hiányzó mutatók)
+        # mély másolat: a memory-mappelt file-okat a frissítés felülírhatja, amíg a szolgáltatás használja őket
+        data = main.load_data().copy(deep=True)
+    return ServiceState(data, mtime if mtime is not None else source_mtime())
+
+
+def update_source() -> None:
+    """
+    Az új tanévek letöltése és hozzáfűzése a gyorsítótárhoz (main.update_data), a betöltéssel nem egyidejűleg
+    """
+    with ServiceState.cache_lock:
+        main.update_data()
+
+
+@functools.lru_cache(maxsize=PREDICTION_CACHE_SIZE)
+def prediction_body(state: ServiceState, start: int, end: int, columns: tuple[str, ...]) -> bytes:
+    """
+    Az előrejelzés válasza JSON-ként. Az eredmény állapotonként és paraméterenként gyorsítótárba kerül.
+    :param state: a betöltött állapot
+    :param start: az első év
+    :param end: az utolsó év
+    :param columns: a kért oszlopok, üres esetén az összes
+    :return: a válasz tartalma
+    """
+    coefficients = state.coefficients.loc[list(columns)] if columns else state.coefficients
+    predicted = models.predict_linear_models(coefficients, range(start, end + 1))
+    body = {"year_start": predicted.index.tolist()}
+    body.update({column: predicted[column].tolist() for column in predicted.columns})
+    return json.dumps(body).encode()
+
+
+def parse_prediction_query(state: ServiceState, query: dict) -> tuple[int, int, tuple[str, ...]]:
+    """
+    Az előrejelzés paramétereinek ellenőrzése
+    :param state: a betöltött állapot
+    :param query: a parse_qs által feldolgozott paraméterek
+    :return: (első év, utolsó év, oszlopok) hármas
+    """
+    try:
+        start = int(query.get("start", [state.default_range[0]])[0])
+        end = int(query.get("end", [state.default_range[1]])[0])
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "A start és end paraméter egész szám kell legyen.")
+    if not 0 <= end - start < MAX_PREDICTION_YEARS:
+        raise RequestError(HTTPStatus.BAD_REQUEST,
+                           f"Az end nem lehet kisebb a startnál, és legfeljebb {MAX_PREDICTION_YEARS} év kérhető.")
+    columns = tuple(name for value in query.get("columns", []) for name in value.split(",") if name)
+    unknown = [name for name in columns if name not in state.coefficients.index]
+    if unknown:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Ismeretlen oszlop: {', '.join(unknown)}. "
+                                                   f"Választható: {', '.join(state.coefficients.index)}.")
+    return start, end, columns
+
+
+class Service:
+    """
+    Az aszinkron HTTP szerver, a betöltött állapottal és a rajzoló folyamatkészlettel
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, poll: float = DEFAULT_POLL, refresh: float = 0):
+        """
+        :param workers: a diagramokat rajzoló folyamatok száma
+        :param poll: a gyorsítótár változásának ellenőrzési ideje másodpercben
+        :param refresh: ha nagyobb 0-nál, ennyi másodpercenként letölti az új tanéveket (main.update_data)
+        """
+        self.workers = workers
+        self.poll = poll
+        self.refresh = refresh
+        self.state = None  # a betöltött ServiceState, a betöltés végéig None
+        self.executor = None  # a rajzoló folyamatkészlet
+        self.pngs = {}  # diagram neve -> a rajzolás Future-je, az aktuális állapothoz
+        self.tasks = []  # a háttérfeladatok
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.Server:
+        """
+        Az adatok betöltése, a folyamatkészlet és a háttérfeladatok indítása, majd a szerver elindítása
+        :param host: a figyelt cím
+        :param port: a figyelt port
+        :return: az elindított szerver
+        """
+        loop = asyncio.get_running_loop()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=diagrams.init_batch_worker)
+        self.set_state(await loop.run_in_executor(None, load_state))  # a betöltés egy szálban, nem blokkol
+        self.tasks.append(asyncio.create_task(self.watch_source()))
+        if self.refresh > 0:
+            self.tasks.append(asyncio.create_task(self.refresh_source()))
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self) -> None:
+        """
+        A háttérfeladatok és a folyamatkészlet leállítása
+        """
+        for task in self.tasks:
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    def set_state(self, state: ServiceState) -> None:
+        """
+        Az új állapot beállítása és az előző állapothoz tartozó gyorsítótárak ürítése
+        :param state: az új állapot
+        """
+        self.state = state
+        self.pngs = {}
+        prediction_body.cache_clear()  # a régi állapot válaszai már nem kellenek
+        logger.info("Adatok betöltve: %d sor", len(state.data))
+
+    async def watch_source(self) -> None:
+        """
+        A gyorsítótár figyelése, változás esetén az adatok újratöltése a háttérben.
+        Az újratöltés alatt a kérések a régi állapotból kapnak választ.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.poll)
+            if source_mtime() == self.state.source_mtime:
+                continue
+            try:
+                with metrics.timer("service_reload_seconds"):
+                    state = await loop.run_in_executor(None, load_state)
+            except Exception:
+                logger.exception("Az adatok újratöltése sikertelen, a korábbi állapot marad")
+                continue
+            self.set_state(state)
+
+    async def refresh_source(self) -> None:
+        """
+        Az új tanévek rendszeres letöltése és hozzáfűzése a gyorsítótárhoz.
+        Ha új sor került a gyorsítótárba, a watch_source tölti újra az adatokat.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.refresh)
+            try:
+                await loop.run_in_executor(None, update_source)
+            except (Exception, SystemExit):  # a download_raw_data letöltési hiba esetén kilépne
+                logger.exception("Az adatok frissítése sikertelen")
+
+    async def chart_png(self, name: str) -> bytes:
+        """
+        Egy diagram PNG képe. Az elkészült képek állapotonként megmaradnak, az egyidejű kérések egy rajzolást várnak.
+        :param name: a diagram neve
+        :return: a kép tartalma
+        """
+        state = self.state
+        if name not in state.charts:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"Nincs ilyen diagram: {name}")
+        future = self.pngs.get(name)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            # a munkafolyamatok a korábbi állapotok azonos nevű diagramjait frissítik, nem építik újra
+            future = loop.run_in_executor(self.executor, diagrams.render_reused, state.charts[name])
+            self.pngs[name] = future
+        try:
+            return await asyncio.shield(future)  # egy kérés megszakítása nem állítja le a közös rajzolást
+        except Exception:
+            if self.pngs.get(name) is future:
+                del self.pngs[name]  # sikertelen rajzolás, a következő kérés újrapróbálja
+            raise
+
+    async def respond(self, method: str, target: str) -> tuple[HTTPStatus, str, bytes]:
+        """
+        Egy kérés kiszolgálása
+        :param method: a HTTP metódus
+        :param target: a kért útvonal a paraméterekkel
+        :return: (státuszkód, tartalomtípus, tartalom) hármas
+        """
+        if method not in ("GET", "HEAD"):
+            raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, "Csak GET és HEAD kérés támogatott.")
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        state = self.state
+        if path in ("/", "/health"):
+            body = {"status": "ok", "rows": len(state.data), "loaded_at": state.loaded_at}
+            return HTTPStatus.OK, "application/json", json.dumps(body).encode()
+        if path == "/stats":
+            return HTTPStatus.OK, "application/json", state.stats_body
+        if path == "/predict":
+            start, end, columns = parse_prediction_query(state, parse_qs(url.query))
+            return HTTPStatus.OK, "application/json", prediction_body(state, start, end, columns)
+        if path == "/charts":
+            return HTTPStatus.OK, "application/json", json.dumps(list(state.charts)).encode()
+        if path.startswith("/charts/") and path.endswith(".png"):
+            return HTTPStatus.OK, "image/png", await self.chart_png(path[len("/charts/"):-len(".png")])
+        raise RequestError(HTTPStatus.NOT_FOUND, f"Ismeretlen útvonal: {path}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Egy kapcsolat kiszolgálása. HTTP/1.1 esetén a kapcsolat nyitva marad a következő kéréshez (keep-alive).
+        :param reader: a kapcsolat olvasási oldala
+        :param writer: a kapcsolat írási oldala
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break  # a kliens lezárta a kapcsolatot
+                parts = request_line.decode("latin-1").split()
+                headers = {}
+                for _ in range(MAX_HEADER_LINES):
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get("content-length", 0) or 0) > 0:
+                    await reader.readexactly(int(headers["content-length"]))  # a kérés törzse nem kell
+
+                wall_start, start = time.time(), time.perf_counter()
+                method, target, version = parts if len(parts) == 3 else ("", "", "HTTP/1.0")
+                try:
+                    if not method:
+                        raise RequestError(HTTPStatus.BAD_REQUEST, "Hibás kérés.")
+                    status, content_type, body = await self.respond(method, target)
+                except RequestError as e:
+                    status, content_type = e.status, "application/json"
+                    body = json.dumps({"error": str(e)}, ensure_ascii=False).encode()
+                except Exception:
+                    logger.exception("Hiba a kérés kiszolgálásakor: %s", target)
+                    status, content_type = HTTPStatus.INTERNAL_SERVER_ERROR, "application/json"
+                    body = b'{"error": "internal error"}'
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                head = (f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: {content_type}\r\n"
+                        f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+                writer.write(head.encode("latin-1") + (body if method != "HEAD" else b""))
+                await writer.drain()
+                endpoint = urlsplit(target).path.strip("/").split("/")[0]  # pl. predict vagy charts, a név nélkül
+                metrics.record_timer("service_request_seconds", time.perf_counter() - start, wall_start,
+                                     endpoint=endpoint, status=status.value)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # megszakadt vagy hibás kapcsolat, nincs kinek válaszolni
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int, workers: int, poll: float, refresh: float) -> None:
+    """
+    A szolgáltatás futtatása a leállításig (Ctrl+C vagy SIGTERM)
+    :param host: a figyelt cím
+    :param port: a figyelt port
+    :param workers: a diagramokat rajzoló folyamatok száma
+    :param poll: a gyorsítótár változásának ellenőrzési ideje másodpercben
+    :param refresh: az új tanévek letöltésének gyakorisága másodpercben, 0 esetén nincs letöltés
+    """
+    service = Service(workers, poll, refresh)
+    stop = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)  # leállítás pl. a systemd-től
+    except NotImplementedError:
+        pass  # Windowson nincs jelkezelés az eseményhurokban, ott csak a Ctrl+C állítja le
+    try:
+        server = await service.start(host, port)
+        logger.info("A szolgáltatás elindult: http://%s:%d", host, port)
+        async with server:
+            await stop.wait()
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="A tisztított adatok, előrejelzések és diagramok HTTP szolgáltatása")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="a figyelt cím")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="a figyelt port")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="a diagramokat rajzoló folyamatok száma")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL,
+                        help="a gyorsítótár változásának ellenőrzése ennyi másodpercenként")
+    parser.add_argument("--refresh", type=float, default=0,
+                        help="az új tanévek letöltése ennyi másodpercenként, 0 esetén kikapcsolva")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    metrics.configure_from_env()  # mérőpontok bekapcsolása, ha a KSH_METRICS be van állítva
+    diagrams.use_batch_backend()  # a szolgáltatás nem nyit ablakot
+    try:
+        asyncio.run(serve(arguments.host, arguments.port, arguments.workers, arguments.poll, arguments.refresh))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,8 @@
+"""
+A tesztek a projekt gyökerében lévő modulokat importálják, ezért a gyökér a keresési útvonalra kerül.
+Futtatás a projekt gyökeréből: python -m pytest -q
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,65 @@
+"""
+A származtatott mutatók hozzáfűzéses számolása (derived.extend_derived_metrics) és a teljes újraszámolás egyezése
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import datasets
+import derived
+
+CHAINED = [
+    datasets.growth("g", "v"),
+    datasets.rolling_mean("rg", "g", 3),  # a korábbi mutatóra épül
+    datasets.ratio("q", "rg", "w"),
+]
+GROUPED = [
+    datasets.rolling_mean("r", "v", 2),
+    datasets.growth("gr", "r", by="region"),  # csoportosítatlan mutatóra épülő csoportosított mutató
+    datasets.rolling_mean("rgr", "gr", 3, by="region"),
+]
+
+
+def make_frame(n_rows: int, seed: int) -> pd.DataFrame:
+    """
+    :param n_rows: a sorok száma
+    :param seed: seed a véletlenszám-generátor számára
+    :return: két numerikus és egy csoportosító oszlop
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"v": rng.uniform(1, 100, n_rows), "w": rng.uniform(1, 10, n_rows),
+                         "region": rng.choice(["a", "b", "c"], n_rows)})
+
+
+@pytest.mark.parametrize("specs", [CHAINED, GROUPED, datasets.get_dataset("okt0008")["derived"]])
+@pytest.mark.parametrize("split", [1, 4, 7, 19])
+def test_append_matches_full_recompute(specs, split):
+    df = make_frame(25, split)
+    if specs is not CHAINED and specs is not GROUPED:  # az okt0008 oszlopai
+        df = pd.DataFrame({"number_of_students": df["v"], "number_of_teachers": df["w"],
+                           "classroom_number": df["w"] * 2})
+    full = derived.add_derived_metrics(df, specs)
+    history = full.iloc[:split]
+    new_rows = df.iloc[split:].reset_index(drop=True)
+    for previous in (history, derived.history_tail(history, specs), df.iloc[:split]):  # a mutatók nélkül is
+        added = derived.extend_derived_metrics(previous, new_rows, specs)
+        pd.testing.assert_frame_equal(added, full.iloc[split:].reset_index(drop=True))
+
+
+def test_chained_first_appended_row():
+    df = make_frame(10, 0)
+    full = derived.add_derived_metrics(df, CHAINED)
+    added = derived.extend_derived_metrics(full.iloc[:6], df.iloc[6:].reset_index(drop=True), CHAINED)
+    assert not np.isnan(added["rg"].iloc[0])
+    assert added["rg"].iloc[0] == pytest.approx(full["rg"].iloc[6])
+
+
+def test_appending_in_chunks_matches_full_recompute():
+    df = make_frame(40, 1)
+    full = derived.add_derived_metrics(df, GROUPED)
+    history, parts = None, []
+    for start in range(0, len(df), 6):  # a ksh_data.stream_cleanup darabjaihoz hasonlóan
+        part = derived.extend_derived_metrics(history, df.iloc[start:start + 6].reset_index(drop=True), GROUPED)
+        parts.append(part)
+        history = derived.history_tail(part if history is None else pd.concat([history, part]), GROUPED)
+    pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), full)
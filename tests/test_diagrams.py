@@ -0,0 +1,101 @@
+"""
+A diagrams modul újrafelhasználható diagramjainak tesztjei: a frissített diagram képe megegyezik egy újonnan
+készített diagraméval, a blitting csak változatlan tengelyek mellett történik
+"""
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.image import imread
+
+import diagrams
+
+COLORS = ["red", "blue", "green", "black"]
+
+
+@pytest.fixture(autouse=True)
+def batch_backend():
+    diagrams.use_batch_backend()
+    diagrams._reused_charts.clear()
+    yield
+    diagrams._reused_charts.clear()
+
+
+def pixels(png: bytes) -> np.ndarray:
+    return imread(BytesIO(png))
+
+
+def make_jobs(kind: str, seed: int, **kwargs) -> dict:
+    """
+    :return: egy rajzolási feladat a megadott típussal, véletlen adatokkal
+    """
+    rng = np.random.default_rng(seed)
+    x = pd.Series(np.arange(1990, 2030), name="year_start")
+    columns = pd.DataFrame(rng.normal(100, 20, (40, 4)).cumsum(axis=0), columns=list("abcd"))
+    if kind == "scatter":
+        return diagrams.chart_job(kind, kind, x, columns["a"], "Év", "a", **kwargs)
+    if kind == "mixed":
+        return diagrams.chart_job(kind, kind, x, columns, "Előrejelzés", ["bal", "jobb"], COLORS, **kwargs)
+    return diagrams.chart_job(kind, kind, x, columns[["a", "b"]], x_label="Év", y_label="Érték", **kwargs)
+
+
+@pytest.mark.parametrize("kind", ["line", "scatter", "mixed"])
+def test_reused_chart_matches_new_chart(kind):
+    first = diagrams.render_reused(make_jobs(kind, 0))
+    chart = diagrams._reused_charts[kind][1]
+    updated = diagrams.render_reused(make_jobs(kind, 1))  # ugyanaz a diagram, új adatokkal
+    assert diagrams._reused_charts[kind][1] is chart and chart.full_draws == 2
+    assert not np.array_equal(pixels(first), pixels(updated))
+
+    diagrams._reused_charts.clear()
+    fresh = diagrams.render_reused(make_jobs(kind, 1))
+    np.testing.assert_array_equal(pixels(updated), pixels(fresh))
+    # a kép mérete megegyezik a draw_* függvényekkel készülőével
+    assert pixels(updated).shape == pixels(diagrams.render_job(make_jobs(kind, 1))).shape
+
+
+def test_changed_options_build_new_chart():
+    diagrams.render_reused(make_jobs("line", 0, title="Első"))
+    chart = diagrams._reused_charts["line"][1]
+    diagrams.render_reused(make_jobs("line", 0, title="Második"))
+    assert diagrams._reused_charts["line"][1] is not chart
+
+
+def test_not_reusable_kind_falls_back():
+    x = pd.Series(np.arange(10))
+    job = diagrams.chart_job("multiline", "multiline", x, pd.DataFrame({"a": x * 2, "b": x * 3}), "x")
+    assert diagrams.render_reused(job) == diagrams.render_job(job)
+    assert "multiline" not in diagrams._reused_charts
+
+
+def test_blit_only_when_limits_unchanged():
+    x = np.arange(50, dtype=np.float64)
+    first = pd.DataFrame({"a": np.sin(x / 5), "b": np.cos(x / 5)})
+    second = first.copy()
+    second.loc[10:20, "a"] = 0.0  # a határok (a szélső értékek) nem változnak
+    chart = diagrams.LineChart(["a", "b"], COLORS)
+    chart.update(x, first)
+    chart.update(x, second)
+    assert (chart.full_draws, chart.blits) == (1, 1)
+    blitted = BytesIO()
+    chart.save(blitted)
+
+    fresh = diagrams.LineChart(["a", "b"], COLORS)
+    fresh.update(x, second)
+    expected = BytesIO()
+    fresh.save(expected)
+    np.testing.assert_array_equal(pixels(blitted.getvalue()), pixels(expected.getvalue()))
+
+    chart.update(x, second)  # változatlan adat: nincs rajzolás
+    assert (chart.full_draws, chart.blits) == (1, 1)
+    chart.update(x, second * 3)  # új határok: teljes újrarajzolás
+    assert (chart.full_draws, chart.blits) == (2, 1)
+
+
+def test_scatter_points_extend_limits():
+    chart = diagrams.ScatterChart("x", "y")
+    chart.update(np.arange(5.0), np.arange(5.0))
+    chart.update(np.arange(5.0), np.arange(5.0) * 100)
+    ax = chart.fig.axes[0]
+    assert ax.get_ylim()[1] >= 400  # a pontdiagram is igazítja a tengelyt
@@ -0,0 +1,118 @@
+"""
+A downloader modul tesztje egy helyi HTTP szerverrel (http.server), hálózati hozzáférés nélkül
+"""
+import os
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import downloader
+
+CONTENT = "Tanév;Iskolák\n1990/1991;3 500\n".encode("utf-8")
+ETAG = '"okt0008-v1"'
+LAST_MODIFIED = formatdate(0, usegmt=True)
+
+
+class StadatHandler(BaseHTTPRequestHandler):
+    """
+    A KSH szerverét utánzó kérésfeldolgozó: ETag és Last-Modified fejlécet küld, feltételes kérésre 304-gyel válaszol,
+    az okt0008.csv-n kívül minden útvonalra 404-gyel
+    """
+    validator = "etag"  # a feltételes kéréskor ellenőrzött fejléc: "etag" vagy "last_modified"
+    truncated = False  # a válasz a megadott Content-Length előtt megszakad
+    requests_seen = []  # a kapott kérések (útvonal, fejlécek)
+
+    def do_GET(self):
+        type(self).requests_seen.append((self.path, dict(self.headers)))
+        if not self.path.endswith("/okt0008.csv"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.validator == "etag" and self.headers.get("If-None-Match") == ETAG or \
+                self.validator == "last_modified" and self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8")
+        self.send_header("Content-Length", str(len(CONTENT) + 100 * self.truncated))
+        if self.validator == "etag":
+            self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(CONTENT)
+        if self.truncated:
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass  # a tesztek kimenete ne teljen meg a szerver naplójával
+
+
+@pytest.fixture
+def server():
+    StadatHandler.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StadatHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.parametrize("validator", ["etag", "last_modified"])
+def test_download_then_not_modified(server, tmp_path, monkeypatch, validator):
+    monkeypatch.setattr(StadatHandler, "validator", validator)
+    url = f"{server}/stadat_files/okt/hu/okt0008.csv"
+
+    first = downloader.download_many([url], str(tmp_path))[url]
+    assert first["status"] == "downloaded"
+    assert first["bytes"] == len(CONTENT)
+    assert first["encoding"] == "utf-8"
+    with open(first["path"], "rb") as f:
+        assert f.read() == CONTENT
+
+    second = downloader.download_many([url], str(tmp_path))[url]
+    assert second["status"] == "not_modified"
+    assert second["path"] == first["path"]
+    assert second["encoding"] == "utf-8"
+    header = "If-None-Match" if validator == "etag" else "If-Modified-Since"
+    assert header in StadatHandler.requests_seen[-1][1]
+    assert not os.path.exists(f"{first['path']}.part")
+    assert sorted(os.listdir(tmp_path)) == ["okt0008.csv", f"okt0008.csv.{downloader.META_EXTENSION}"]
+
+
+def test_interrupted_download_leaves_previous_file(server, tmp_path, monkeypatch):
+    url = f"{server}/stadat_files/okt/hu/okt0008.csv"
+    first = downloader.download_many([url], str(tmp_path))[url]
+    metadata = downloader.load_metadata(first["path"])
+    monkeypatch.setattr(StadatHandler, "truncated", True)
+    monkeypatch.setattr(StadatHandler, "validator", "none")  # feltételes kérésre is teljes (megszakadó) válasz
+    with pytest.raises(requests.exceptions.RequestException):
+        downloader.download_many([url], str(tmp_path))
+    assert not os.path.exists(f"{first['path']}.part")  # a félbeszakadt letöltés törlődött
+    with open(first["path"], "rb") as f:
+        assert f.read() == CONTENT  # a korábbi file és metaadat érintetlen
+    assert downloader.load_metadata(first["path"]) == metadata
+
+
+def test_missing_file(server, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        downloader.download_many([f"{server}/stadat_files/okt/hu/okt9999.csv"], str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_conflicting_targets_rejected(server, tmp_path):
+    urls = [f"{server}/stadat_files/okt/hu/okt0008.csv", f"{server}/stadat_files/okt/en/okt0008.csv"]
+    with pytest.raises(ValueError):
+        downloader.download_many(urls, str(tmp_path))
+    assert StadatHandler.requests_seen == []  # egyik letöltés sem indult el
+
+
+def test_duplicate_urls_downloaded_once(server, tmp_path):
+    url = f"{server}/stadat_files/okt/hu/okt0008.csv"
+    results = downloader.download_many([url, url], str(tmp_path))
+    assert list(results) == [url]
+    assert len(StadatHandler.requests_seen) == 1
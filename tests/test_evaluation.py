@@ -0,0 +1,85 @@
+"""
+Az evaluation modul tesztjei: a módszerek kiértékelésszáma, a folyamatszámtól független eredmény és az
+intervallumok
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import evaluation
+
+
+def make_frame(n_rows: int = 30, noise: float = 2.0, seed: int = 0) -> pd.DataFrame:
+    """
+    :return: DataFrame egy lineáris összefüggéssel (y = 3x + 5) és normális eloszlású zajjal
+    """
+    rng = np.random.default_rng(seed)
+    x = np.arange(n_rows, dtype=np.float64)
+    return pd.DataFrame({"x": x, "y": 3 * x + 5 + rng.normal(0, noise, n_rows)})
+
+
+@pytest.mark.parametrize("scheme, n_repeats, evaluations", [
+    ("kfold", 100, 5), ("repeated_kfold", 40, 200), ("loo", 100, 30), ("bootstrap", 300, 300)])
+def test_same_result_with_any_worker_count(scheme, n_repeats, evaluations):
+    df = make_frame()
+    single = evaluation.cross_validate(df, "x", "y", scheme, n_repeats=n_repeats, seed=7, max_workers=1)
+    parallel = evaluation.cross_validate(df, "x", "y", scheme, n_repeats=n_repeats, seed=7, max_workers=3)
+    assert single["evaluations"] == parallel["evaluations"] == evaluations
+    for metric_name in ("mae", "rmse"):
+        np.testing.assert_array_equal(single[f"{metric_name}_values"], parallel[f"{metric_name}_values"])
+        assert single[metric_name] == parallel[metric_name]
+        assert single[f"{metric_name}_ci"] == parallel[f"{metric_name}_ci"]
+
+
+def test_kfold_partitions_every_row_once():
+    df = make_frame(23)
+    result = evaluation.cross_validate(df, "x", "y", "kfold", n_splits=4, max_workers=1)
+    assert result["repetitions"] == 1 and result["evaluations"] == 4
+    _, test_masks = evaluation.scheme_masks("kfold", 23, 4, 0, 0, 1)
+    np.testing.assert_array_equal(test_masks.sum(axis=0), np.ones(23))  # minden sor pontosan egyszer teszt
+
+
+def test_loo_matches_direct_computation():
+    df = make_frame(15)
+    result = evaluation.cross_validate(df, "x", "y", "loo", max_workers=1)
+    errors = []
+    for idx in range(len(df)):
+        train = df.drop(index=idx)
+        slope, intercept = np.polyfit(train["x"], train["y"], 1)
+        errors.append(abs(slope * df["x"][idx] + intercept - df["y"][idx]))
+    np.testing.assert_allclose(result["mae_values"], errors)
+    np.testing.assert_allclose(result["mae"], np.mean(errors))
+    np.testing.assert_allclose(result["rmse_values"], errors)  # egy tesztsorra a két mérőszám azonos
+
+
+def test_bootstrap_seed_and_interval():
+    df = make_frame(60, noise=2.0)
+    result = evaluation.cross_validate(df, "x", "y", "bootstrap", n_repeats=400, seed=1, max_workers=1)
+    assert result["repetitions"] == 400
+    for metric_name in ("mae", "rmse"):
+        low, high = result[f"{metric_name}_ci"]
+        assert low < result[metric_name] < high
+    assert 1.0 < result["rmse"] < 3.5  # a zaj szórása 2
+    wide = evaluation.cross_validate(df, "x", "y", "bootstrap", n_repeats=400, seed=1, confidence=0.99,
+                                     max_workers=1)
+    assert wide["mae_ci"][0] <= result["mae_ci"][0] and wide["mae_ci"][1] >= result["mae_ci"][1]
+    other = evaluation.cross_validate(df, "x", "y", "bootstrap", n_repeats=400, seed=2, max_workers=1)
+    assert not np.array_equal(other["mae_values"], result["mae_values"])
+
+
+def test_noise_free_data_has_no_error():
+    result = evaluation.cross_validate(make_frame(noise=0.0), "x", "y", "repeated_kfold", n_repeats=10,
+                                       max_workers=1)
+    assert result["mae"] < 1e-9 and result["rmse_ci"][1] < 1e-9
+
+
+@pytest.mark.parametrize("n_splits", [0, 1, 31])
+@pytest.mark.parametrize("scheme", ["kfold", "repeated_kfold"])
+def test_invalid_split_count(scheme, n_splits):
+    with pytest.raises(ValueError, match="n_splits"):
+        evaluation.cross_validate(make_frame(30), "x", "y", scheme, n_splits=n_splits, max_workers=1)
+
+
+def test_unknown_scheme():
+    with pytest.raises(ValueError, match="Ismeretlen"):
+        evaluation.cross_validate(make_frame(), "x", "y", "holdout")
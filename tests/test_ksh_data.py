@@ -0,0 +1,180 @@
+"""
+A ksh_data modul tesztjei: a nyers csv tisztítása egyben és darabonként, és a bináris gyorsítótár kezelése
+"""
+import os
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import datasets
+import ksh_data
+
+
+def write_raw_csv(file_name: str, n_rows: int, seed: int = 0, float_from: int | None = None) -> None:
+    """
+    Az okt0008 táblázat szerkezetű nyers csv írása véletlen számokkal, a KSH exportjához hasonlóan szóközös és
+    nem törhető szóközös ezres elválasztóval
+    :param file_name: a file neve
+    :param n_rows: a sorok száma
+    :param seed: a véletlenszám-generátor kezdőértéke
+    :param float_from: ettől a sortól kezdve a pedagógusok száma tizedesvesszős (a típus darabközben változik)
+    """
+    rng = np.random.default_rng(seed)
+    with open(file_name, "w", encoding="utf-8") as f:
+        f.write("2.1.8. Az oktatás adatai;;;;;\n")
+        f.write("Tanév;Iskolák;Osztálytermek;Pedagógusok;Tanulók;Megjegyzés\n")
+        for idx in range(n_rows):
+            year = 1990 + idx
+            teachers = f"{rng.integers(70_000, 90_000):,}".replace(",", "\xa0")
+            if float_from is not None and idx >= float_from:
+                teachers += ",5"
+            students = f"{rng.integers(700_000, 1_200_000):,}".replace(",", " ")
+            f.write(f"{year}/{year + 1};{rng.integers(3000, 4000)};{rng.integers(40_000, 50_000)};{teachers};"
+                    f"{students};x\n")
+
+
+@pytest.fixture
+def dataset():
+    return datasets.get_dataset(datasets.DEFAULT_DATASET)
+
+
+@pytest.mark.parametrize("float_from", [None, 0, 45])
+def test_chunked_cleanup_matches_full(tmp_path, dataset, float_from):
+    raw_name = str(tmp_path / "raw.csv")
+    write_raw_csv(raw_name, 100, float_from=float_from)
+    full = ksh_data.clean_to_npy(raw_name, str(tmp_path / "full"), dataset=dataset, stream_bytes=2 ** 40)
+    chunked = ksh_data.clean_to_npy(raw_name, str(tmp_path / "chunked"), dataset=dataset, stream_bytes=0,
+                                    chunksize=7)
+    pd.testing.assert_frame_equal(chunked.copy(deep=True), full, check_dtype=False)
+    pd.testing.assert_frame_equal(chunked, ksh_data.load_npy(str(tmp_path / "full")))  # a mentett típusok is
+    assert str(chunked["number_of_teachers"].dtype) == ("int64" if float_from is None else "float64")
+
+
+def stream_peak(tmp_path, n_rows: int, chunksize: int) -> int:
+    """
+    :return: a darabonkénti tisztítás legnagyobb memóriafoglalása bájtban (tracemalloc)
+    """
+    raw_name = str(tmp_path / f"raw_{n_rows}.csv")
+    write_raw_csv(raw_name, n_rows)
+    tracemalloc.start()
+    try:
+        rows = ksh_data.stream_cleanup(raw_name, str(tmp_path / f"cache_{n_rows}"), chunksize)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert rows == n_rows
+    return peak
+
+
+def test_stream_cleanup_memory_is_bounded(tmp_path):
+    chunksize = 1000
+    small, large = stream_peak(tmp_path, 24_000, chunksize), stream_peak(tmp_path, 48_000, chunksize)
+    # kétszer annyi sor mellett a csúcs a darabmérettől függ, nem a bemenettől
+    assert large < 1.25 * small
+    cleaned = ksh_data.load_npy(str(tmp_path / "cache_48000"))
+    assert large < cleaned.memory_usage(deep=True).sum()  # kevesebb, mint a teljes tisztított adat
+
+
+def test_clean_to_npy_threshold(tmp_path, dataset, monkeypatch):
+    raw_name = str(tmp_path / "raw.csv")
+    write_raw_csv(raw_name, 20)
+    calls = []
+    monkeypatch.setattr(ksh_data, "stream_cleanup",
+                        lambda *args, **kwargs: calls.append(args) or ksh_data.save_content_as_npy(
+                            pd.DataFrame({"a": [1]}), args[1]))
+    ksh_data.clean_to_npy(raw_name, str(tmp_path / "small"), dataset=dataset)
+    assert not calls  # kis bemenet egyben
+    ksh_data.clean_to_npy(raw_name, str(tmp_path / "large"), dataset=dataset, stream_bytes=10)
+    assert len(calls) == 1
+
+
+def npy_header(file_name: str) -> tuple:
+    """
+    :return: a .npy file fejlécéből a sorok száma és a típus
+    """
+    with open(file_name, "rb") as f:
+        np.lib.format.read_magic(f)
+        shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+    return shape[0], dtype
+
+
+def test_append_column_in_place(tmp_path):
+    file_name = str(tmp_path / "0.npy")
+    np.save(file_name, np.arange(5, dtype=np.int64))
+    inode = os.stat(file_name).st_ino
+    with open(file_name, "ab") as f:
+        f.write(b"\xff" * 3)  # egy félbeszakadt korábbi hozzáfűzés maradéka
+    assert ksh_data.append_npy_column(file_name, np.array([5, 6], dtype=np.int64)) == np.dtype(np.int64)
+    assert os.stat(file_name).st_ino == inode  # ugyanaz a file, csak a végére íródott és a fejléce frissült
+    assert npy_header(file_name) == (7, np.dtype(np.int64))
+    np.testing.assert_array_equal(np.load(file_name), np.arange(7))
+
+
+@pytest.mark.parametrize("old, new, expected", [
+    (np.arange(3, dtype=np.int64), np.array([1.5]), np.dtype(np.float64)),  # int64 -> float64
+    (np.array(["ab", "cd"]), np.array(["hosszabb"]), np.dtype("<U8")),  # hosszabb szöveg
+])
+def test_append_column_rewrites_on_wider_type(tmp_path, old, new, expected):
+    file_name = str(tmp_path / "0.npy")
+    np.save(file_name, old)
+    mapped = np.load(file_name, mmap_mode="r")  # egy korábbi load_npy eredménye
+    inode = os.stat(file_name).st_ino
+    assert ksh_data.append_npy_column(file_name, new) == expected
+    assert os.stat(file_name).st_ino != inode  # új file cserélte le a régit
+    np.testing.assert_array_equal(np.load(file_name), np.concatenate([old, new]).astype(expected))
+    np.testing.assert_array_equal(mapped, old)  # a régi memory-map érvényes marad
+    assert not os.path.exists(f"{file_name}.tmp")
+
+
+def test_append_to_npy_matches_full_save(tmp_path):
+    df = pd.DataFrame({"school_year": [f"{year}/{year + 1}" for year in range(1990, 2000)],
+                       "students": np.arange(10, dtype=np.int64) * 1000,
+                       "ratio": np.linspace(10, 12, 10)})
+    df.loc[8:, "students"] = np.nan  # az új sorokban hiányzó érték: az oszlop float64-re bővül
+    name = str(tmp_path / "cache")
+    ksh_data.save_content_as_npy(df.iloc[:6].astype({"students": np.int64}), name)
+    assert ksh_data.append_to_npy(df.iloc[6:], name) == 10
+    loaded = ksh_data.load_npy(name)
+    pd.testing.assert_frame_equal(loaded, df)
+    assert ksh_data.load_npy_schema(name)["columns"][1]["dtype"] == "<f8"
+
+    with pytest.raises(ValueError):
+        ksh_data.append_to_npy(df[["students", "school_year", "ratio"]], name)
+    with pytest.raises(FileNotFoundError):
+        ksh_data.append_to_npy(df, str(tmp_path / "missing"))
+
+
+def test_append_no_new_rows(tmp_path, dataset):
+    raw_name = str(tmp_path / "raw.csv")
+    write_raw_csv(raw_name, 12)
+    raw_df = ksh_data.read_raw_csv(raw_name)
+    name = str(tmp_path / "cache")
+    df = ksh_data.clean_to_npy(raw_name, name, dataset=dataset)
+    added = ksh_data.new_rows(raw_df, df["year_start"])
+    assert len(added) == 0
+    assert ksh_data.append_to_npy(df.iloc[:0], name) == 12  # üres hozzáfűzés: a fejléc és az adatok változatlanok
+    pd.testing.assert_frame_equal(ksh_data.load_npy(name).copy(deep=True), df)
+    assert list(ksh_data.new_rows(raw_df, df["year_start"][:10]).index) == [10, 11]
+
+
+def test_update_command(tmp_path, monkeypatch, capsys):
+    import main
+
+    monkeypatch.chdir(tmp_path)
+    raw_name = str(tmp_path / "raw.csv")
+    monkeypatch.setattr(main, "download_raw_content", lambda: open(raw_name, encoding="utf-8").read())
+    write_raw_csv(raw_name, 30)
+    main.run(["update"])  # nincs gyorsítótár, teljes számolás
+    write_raw_csv(raw_name, 34)  # négy új tanév, a korábbi sorok változatlanok
+    main.run(["update"])
+    assert "34 sor van a gyorsítótárban" in capsys.readouterr().out
+
+    updated = ksh_data.load_npy(main.SAVE_FILE_NAME)
+    full = ksh_data.clean_to_npy(raw_name, str(tmp_path / "full"), dataset=main.DATASET)
+    pd.testing.assert_frame_equal(updated, ksh_data.load_npy(str(tmp_path / "full")))
+    main.run(["update"])  # nincs új sor
+    assert len(ksh_data.load_npy(main.SAVE_FILE_NAME)) == len(full)
+    with pytest.raises(SystemExit):
+        main.run(["--format", "csv", "update"])
@@ -0,0 +1,112 @@
+"""
+A memo modul tesztjei: a memória- és a lemeztalálatok, a kulcsba kerülő oszlopok és a méretkorlát
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import memo
+import models
+
+
+def column_sum(df: pd.DataFrame, x_col: str, y_col: str, backend: str = "numpy", scale: float = 1.0) -> float:
+    column_sum.calls += 1
+    return float((df[x_col] + df[y_col]).sum() * scale)
+
+
+def columns_total(df: pd.DataFrame, columns: list[str], seeds=None) -> float:
+    columns_total.calls += 1
+    return float(df[columns].to_numpy().sum() + sum(seeds or ()))
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    column_sum.calls = columns_total.calls = 0
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({"x": np.arange(10.0), "y": np.arange(10.0) * 2, "numpy": np.zeros(10),
+                         "other": list("abcdefghij")})
+
+
+def test_memory_and_disk_hits(tmp_path, frame):
+    cache = memo.ResultCache(str(tmp_path))
+    cached = cache.memoize(column_sum, columns=("x_col", "y_col"))
+    assert cached(frame, "x", "y") == cached(frame, x_col="x", y_col="y") == 135.0
+    assert column_sum.calls == 1  # a kulcsszavas hívás is ugyanazt a kulcsot adja
+    assert cache.stats == {"memory_hits": 1, "disk_hits": 0, "misses": 1}
+
+    other = memo.ResultCache(str(tmp_path))  # egy új folyamat: üres memória, ugyanaz a könyvtár
+    assert other.memoize(column_sum, columns=("x_col", "y_col"))(frame, "x", "y") == 135.0
+    assert column_sum.calls == 1 and other.stats["disk_hits"] == 1
+
+
+def test_key_depends_on_used_columns_only(tmp_path, frame):
+    cached = memo.ResultCache(str(tmp_path)).memoize(column_sum, columns=("x_col", "y_col"))
+    cached(frame, "x", "y")
+    # a nem használt oszlopok, köztük a backend paraméterrel azonos nevű sem számít
+    cached(frame.assign(other=list("zzzzzzzzzz"), numpy=np.ones(10)), "x", "y")
+    assert column_sum.calls == 1
+    changed = frame.copy()
+    changed.loc[3, "y"] = -1.0
+    assert cached(changed, "x", "y") == 135.0 - 7.0
+    assert column_sum.calls == 2
+    cached(frame, "x", "y", scale=2.0)  # a többi paraméter is a kulcs része
+    assert column_sum.calls == 3
+
+
+def test_list_of_columns_and_one_shot_iterables(tmp_path, frame):
+    cached = memo.ResultCache(str(tmp_path)).memoize(columns_total, columns=("columns",))
+    assert cached(frame, ["x", "y"], iter([1, 2])) == 138.0
+    assert cached(frame, ["x", "y"], (seed for seed in [1, 2])) == 138.0  # a generátor is tuple-ként kerül a kulcsba
+    assert columns_total.calls == 1
+    assert cached(frame.assign(y=frame["y"] + 1), ["x", "y"], [1, 2]) == 148.0  # a lista eleme is hash-elődik
+    assert columns_total.calls == 2
+
+
+def test_all_columns_without_column_arguments(tmp_path, frame):
+    cached = memo.ResultCache(None).memoize(column_sum)
+    cached(frame, "x", "y")
+    cached(frame.assign(other=list("zzzzzzzzzz")), "x", "y")  # oszlopnevek nélkül minden oszlop számít
+    assert column_sum.calls == 2
+    with pytest.raises(ValueError, match="x_column"):
+        memo.ResultCache(None).memoize(column_sum, columns=("x_column",))
+
+
+def test_memory_lru(frame):
+    cache = memo.ResultCache(None, max_memory_items=2)
+    cached = cache.memoize(column_sum, columns=("x_col", "y_col"))
+    for scale in (1.0, 2.0, 1.0, 3.0):  # a 3.0 az 2.0-t dobja el, az 1.0 közben friss lett
+        cached(frame, "x", "y", scale=scale)
+    assert column_sum.calls == 3
+    cached(frame, "x", "y", scale=1.0)
+    assert column_sum.calls == 3
+    cached(frame, "x", "y", scale=2.0)
+    assert column_sum.calls == 4
+
+
+def test_disk_budget_evicts_least_recently_used(tmp_path):
+    value = list(range(300))
+    size = len(json.dumps(value))  # egy eredmény file mérete
+    cache = memo.ResultCache(str(tmp_path), max_memory_items=1, max_disk_bytes=7 * size)
+    for idx in range(6):
+        cache.put(f"key{idx}", value)
+        os.utime(cache.file_name(f"key{idx}"), (idx, idx))  # egyértelmű használati sorrend
+    assert cache.get("key0")[0]  # lemeztalálat, a legrégebbi használata frissíti az időpontját
+    cache.put("key6", value)
+    assert len(os.listdir(tmp_path)) == 7  # még a korláton belül
+    cache.put("key7", value)  # túllépés: a korlát 90%-a alá, a legrégebben használtak törlésével
+    assert sorted(os.listdir(tmp_path)) == [f"key{idx}.json" for idx in (0, 3, 4, 5, 6, 7)]
+    assert cache.disk_bytes == 6 * size <= 0.9 * cache.max_disk_bytes
+
+    cache.clear()
+    assert not os.listdir(tmp_path) and cache.stats["misses"] == 0
+
+
+def test_model_cache_dir_is_absolute():
+    assert os.path.isabs(models.MODEL_CACHE_DIR)
+    assert os.path.dirname(models.MODEL_CACHE_DIR) == os.path.dirname(os.path.abspath(models.__file__))
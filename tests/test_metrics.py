@@ -0,0 +1,109 @@
+"""
+A metrics modul tesztjei: a kimenetek formátuma, lezárása és cseréje
+"""
+import json
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    yield
+    metrics.disable()  # a többi teszt kikapcsolt mérőpontokkal fut
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("okt0008.csv", "okt0008.csv"),
+    ('say "hi"', 'say \\"hi\\"'),
+    ("C:\\temp\\x", "C:\\\\temp\\\\x"),
+    ("első\nmásodik", "első\\nmásodik"),
+    ('\\"', '\\\\\\"'),  # előbb a \\ escape-elése, különben a \\" rossz lenne
+    (42, "42"),
+])
+def test_escape_label(value, expected):
+    assert metrics.escape_label(value) == expected
+
+
+def test_prometheus_output(tmp_path):
+    file_name = str(tmp_path / "metrics.prom")
+    metrics.configure(metrics.PrometheusSink(file_name))
+    metrics.record_timer("ksh_fit_seconds", 0.5, 0.0, model="linear")
+    metrics.record_timer("ksh_fit_seconds", 1.5, 0.0, model="linear")
+    metrics.count("ksh_download_bytes", 100, url='http://x/"a"\n')
+    metrics.count("ksh_download_bytes", 20, url='http://x/"a"\n')
+    metrics.observe("ksh_rows_per_second", 10.0)
+    metrics.observe("ksh_rows_per_second", 12.0)
+    metrics.flush()
+    with open(file_name, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines == [
+        "# TYPE ksh_download_bytes_total counter",
+        'ksh_download_bytes_total{url="http://x/\\"a\\"\\n"} 120',
+        "# TYPE ksh_fit_seconds summary",
+        'ksh_fit_seconds_count{model="linear"} 2',
+        'ksh_fit_seconds_sum{model="linear"} 2.0',
+        "# TYPE ksh_rows_per_second gauge",
+        "ksh_rows_per_second 12.0",
+    ]
+    assert not (tmp_path / "metrics.prom.tmp").exists()
+
+
+def test_timer_event(tmp_path):
+    file_name = str(tmp_path / "metrics.jsonl")
+    metrics.configure(metrics.JsonLinesSink(file_name))
+    with metrics.timer("ksh_step_seconds", step="clean"):
+        pass
+    with pytest.raises(KeyError):
+        with metrics.timer("ksh_step_seconds", step="fit"):
+            raise KeyError("x")
+    metrics.disable()
+    with open(file_name, encoding="utf-8") as f:
+        events = [json.loads(line) for line in f]
+    assert [event["labels"] for event in events] == [{"step": "clean"}, {"step": "fit", "error": "KeyError"}]
+    assert all(event["type"] == "timer" and event["value"] >= 0 and "start" in event for event in events)
+
+
+def test_configure_closes_replaced_sinks(tmp_path):
+    first = metrics.JsonLinesSink(str(tmp_path / "first.jsonl"))
+    kept = metrics.PrometheusSink(str(tmp_path / "kept.prom"))
+    metrics.configure(first, kept)
+    metrics.count("ksh_cache_hits")
+    second = metrics.JsonLinesSink(str(tmp_path / "second.jsonl"))
+    metrics.configure(second, kept)
+    assert first.file.closed and not second.file.closed
+    assert (tmp_path / "kept.prom").exists()  # a megtartott kimenet ürítésre került
+    metrics.count("ksh_cache_hits")
+    metrics.disable()
+    assert second.file.closed
+    assert (tmp_path / "first.jsonl").read_text(encoding="utf-8").count("\n") == 1
+    assert (tmp_path / "second.jsonl").read_text(encoding="utf-8").count("\n") == 1
+    assert "ksh_cache_hits_total 2" in (tmp_path / "kept.prom").read_text(encoding="utf-8")
+    metrics.flush()  # a program végén (atexit) sem hibázik
+
+
+def test_disable_without_close(tmp_path):
+    sink = metrics.PrometheusSink(str(tmp_path / "worker.prom"))
+    metrics.configure(sink)
+    metrics.count("ksh_cache_hits")
+    metrics.disable(close=False)  # munkafolyamat: az örökölt kimenet nem íródik ki
+    assert not metrics.is_enabled()
+    assert not (tmp_path / "worker.prom").exists()
+
+
+def test_configure_from_env(tmp_path, monkeypatch):
+    jsonl_name, prom_name = str(tmp_path / "m.jsonl"), str(tmp_path / "m.prom")
+    monkeypatch.setenv(metrics.METRICS_ENV, f"log,jsonl:{jsonl_name},prometheus:{prom_name}")
+    metrics.configure_from_env()
+    assert metrics.is_enabled()
+    opened = [sink for sink in metrics._sinks if isinstance(sink, metrics.JsonLinesSink)]
+    assert [type(sink).__name__ for sink in metrics._sinks] == ["LogSink", "JsonLinesSink", "PrometheusSink"]
+    monkeypatch.setenv(metrics.METRICS_ENV, "")
+    metrics.configure_from_env()  # az újrakonfigurálás lezárja a korábbi file-t
+    assert not metrics.is_enabled() and opened[0].file.closed
+
+    monkeypatch.setenv(metrics.METRICS_ENV, f"jsonl:{jsonl_name},statsd")
+    with pytest.raises(ValueError, match="statsd"):
+        metrics.configure_from_env()
+    assert not metrics.is_enabled()
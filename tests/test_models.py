@@ -0,0 +1,111 @@
+"""
+A models modul sklearn és numpy backendjének egyezése
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import models
+
+pytest.importorskip("sklearn")  # a sklearn backend nélkül nincs mivel összehasonlítani
+
+
+def make_frame(n_rows: int, seed: int) -> pd.DataFrame:
+    """
+    :param n_rows: a sorok száma
+    :param seed: seed a véletlenszám-generátor számára
+    :return: tanévenkénti, zajos lineáris trendet követő adatok
+    """
+    rng = np.random.default_rng(seed)
+    year_start = np.arange(1990, 1990 + n_rows)
+    return pd.DataFrame({"year_start": year_start,
+                         "number_of_students": 1_500_000 - 8_000 * (year_start - 1990) + rng.normal(0, 20_000, n_rows)})
+
+
+@pytest.mark.parametrize("n_rows", [10, 35, 1_000])
+@pytest.mark.parametrize("seed", [0, 1, 42])
+def test_linear_accuracy_backends_match(n_rows, seed):
+    df = make_frame(n_rows, seed)
+    results = [models.calculate_linear_accuracy(df, "year_start", "number_of_students", seed, backend=backend)
+               for backend in models.BACKENDS]
+    np.testing.assert_allclose(results[0], results[1], rtol=1e-9)
+
+
+@pytest.mark.parametrize("n_rows", [10, 35, 1_000])
+@pytest.mark.parametrize("seeds", [None, range(5, 25)])
+def test_multiple_models_backends_match(n_rows, seeds):
+    df = make_frame(n_rows, n_rows)
+    results = [models.calculate_multiple_models(df, "year_start", "number_of_students", seeds, backend=backend)
+               for backend in models.BACKENDS]
+    np.testing.assert_allclose(results[0], results[1], rtol=1e-9)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        models.calculate_linear_accuracy(make_frame(10, 0), "year_start", "number_of_students", 0, backend="gpu")
+
+
+def make_series(n_rows: int, seed: int) -> pd.DataFrame:
+    """
+    :param n_rows: a sorok száma
+    :param seed: seed a véletlenszám-generátor számára
+    :return: évenkénti adatok egy töréspontos (a) és egy másodfokú (b) trenddel
+    """
+    rng = np.random.default_rng(seed)
+    year = np.arange(2000, 2000 + n_rows, dtype=np.float64)
+    return pd.DataFrame({"year_start": year,
+                         "a": 100 + 2 * (year - 2000) + 5 * np.maximum(year - 2010, 0) + rng.normal(0, 0.1, n_rows),
+                         "b": 50 + 0.5 * (year - 2000) ** 2 + rng.normal(0, 0.1, n_rows)})
+
+
+FORECAST_FAMILIES = [
+    [models.PolynomialForecast(degree) for degree in (1, 2, 3)],
+    [models.PiecewiseLinearForecast([breakpoint]) for breakpoint in (2004.0, 2010.0, 2013.0)] +
+    [models.PiecewiseLinearForecast([2005.0, 2012.0])],
+    [models.HoltForecast(alpha, beta) for alpha in (0.3, 1.0) for beta in (0.1, 0.5)],
+]
+
+
+@pytest.mark.parametrize("candidates", FORECAST_FAMILIES, ids=lambda members: members[0].family)
+def test_batch_predict_matches_fit_predict(candidates):
+    df = make_series(20, 0)
+    x, y = df["year_start"].to_numpy(), df[["a", "b"]].to_numpy()
+    x_new = np.arange(2015, 2025, dtype=np.float64)
+    batched = type(candidates[0]).batch_predict(candidates, x[:15], y[:15], x_new)
+    for candidate, predicted in zip(candidates, batched):
+        np.testing.assert_allclose(predicted, candidate.fit(x[:15], y[:15]).predict(x_new), rtol=1e-7, atol=1e-6)
+        np.testing.assert_allclose(predicted[:, 0], candidate.fit(x[:15], y[:15, 0]).predict(x_new),
+                                   rtol=1e-7, atol=1e-6)  # egy oszlopra illesztve is ugyanaz
+
+
+def test_batch_predict_does_not_modify_candidates():
+    candidates = [models.PiecewiseLinearForecast([2010.0]), models.PolynomialForecast(2)]
+    states = [dict(vars(candidate)) for candidate in candidates]
+    models.select_forecast_models(make_series(20, 1), "year_start", candidates=candidates)
+    assert [vars(candidate) for candidate in candidates] == states
+
+
+def test_selection_finds_generating_model():
+    best, scores = models.select_forecast_models(make_series(25, 2), "year_start", holdout=5)
+    assert list(best.index) == ["a", "b"]
+    assert best.loc["a", "family"] == "piecewise" and best.loc["a", "params"] == {"breakpoints": (2010.0,)}
+    assert best.loc["b", "family"] == "polynomial" and best.loc["b", "params"]["degree"] >= 2
+    assert len(scores) == 2 * len(models.default_forecast_candidates(np.arange(2000, 2020)))
+    assert best.loc["a", "model"].predict([2030.0]) == pytest.approx(100 + 60 + 100, rel=1e-2)  # a teljes adatra
+
+
+def test_selection_skips_missing_values():
+    df = make_series(20, 3)
+    df.loc[0, "b"] = np.nan
+    df["growth"] = df["a"].pct_change()  # az első sor mindig NaN, ahogy a származtatott mutatóknál
+    df["empty"] = np.nan
+    best, scores = models.select_forecast_models(df, "year_start")
+    assert list(best.index) == ["a", "b", "growth"]  # az üres oszlop kimarad
+    assert np.isfinite(best["mae"].to_numpy(dtype=np.float64)).all()
+    assert set(scores["column"]) == {"a", "b", "growth"}
+
+
+@pytest.mark.parametrize("holdout", [0, -1, 19, 20, 25])
+def test_selection_rejects_invalid_holdout(holdout):
+    with pytest.raises(ValueError, match="holdout"):
+        models.select_forecast_models(make_series(20, 0), "year_start", holdout=holdout)
@@ -0,0 +1,137 @@
+"""
+A serialization modul mentése és betöltése: a típusok visszaállítása, a részleges betöltés és a sérülések felismerése
+"""
+import os
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ksh_data
+import serialization
+
+
+def make_frame() -> pd.DataFrame:
+    """
+    :return: DataFrame a gyorsítótárban előforduló és a pandas saját típusaival, hiányzó értékekkel
+    """
+    df = pd.DataFrame({
+        "year_start": np.arange(1990, 1995, dtype=np.int64),
+        "ratio": [1.5, np.nan, 2.0, 3.25, -1.0],
+        "school_year": ["1990/1991", "1991/1992", None, "1993/1994", "1994/1995"],
+        "mixed": pd.Series(["a", None, np.nan, 4, "e"], dtype=object),
+        "text_object": pd.Series(["a", None, "c", "d", "e"], dtype=object),
+        "nullable": pd.Series([1, None, 3, 4, 5], dtype="Int64"),
+        "region": pd.Series(["Pest", "Győr", "Pest", None, "Győr"], dtype="category"),
+        "level": pd.Categorical(["low", "high", "low", "low", None], categories=["low", "mid", "high"], ordered=True),
+        "date": pd.date_range("2024-01-01", periods=5, freq="D"),
+        "flag": [True, False, True, True, False],
+    }, index=pd.Index(list("vwxyz"), name="key"))
+    df.attrs["x_col"] = "year_start"
+    return df
+
+
+@pytest.fixture
+def file_name(tmp_path):
+    return str(tmp_path / f"data.{serialization.EXTENSION}")
+
+
+def test_round_trip(file_name):
+    df = make_frame()
+    series = pd.Series([1.0, 2.5], index=pd.Index([2020, 2021], name="year"), name="predicted")
+    labels = pd.Series(["a", None, np.nan], dtype=object)
+    data = {
+        "frame": df,
+        "series": series,
+        "labels": labels,
+        "index": pd.Index(["a", None], dtype=object),
+        "range": pd.RangeIndex(3, 30, 3, name="r"),
+        "fraction": Fraction(1, 3),
+        "array": np.arange(12, dtype=np.float32).reshape(3, 4),
+        "nested": {"list": [1, "két", None, Fraction(-7, 2)], "tuple": (1.5, {"inner": np.int64(3)}), 5: True},
+    }
+    serialization.save(data, file_name)
+    loaded = serialization.load(file_name)
+
+    assert list(loaded) == list(data)
+    pd.testing.assert_frame_equal(loaded["frame"], df)
+    assert loaded["frame"].attrs == df.attrs
+    assert loaded["frame"]["text_object"].dtype == object
+    pd.testing.assert_series_equal(loaded["series"], series)
+    pd.testing.assert_series_equal(loaded["labels"], labels)
+    assert loaded["labels"][1] is None and np.isnan(loaded["labels"][2])  # az object oszlopban a None nem lesz NaN
+    pd.testing.assert_index_equal(loaded["index"], data["index"])
+    assert loaded["index"][1] is None
+    pd.testing.assert_index_equal(loaded["range"], data["range"], exact=True)
+    assert loaded["fraction"] == Fraction(1, 3)
+    np.testing.assert_array_equal(loaded["array"], data["array"])
+    assert loaded["array"].dtype == np.float32
+    assert loaded["nested"] == {"list": [1, "két", None, Fraction(-7, 2)], "tuple": (1.5, {"inner": 3}), 5: True}
+
+
+def test_lazy_load_by_key_and_columns(file_name):
+    df = make_frame()
+    serialization.save({"data": df, "other": np.arange(1000)}, file_name)
+
+    container = serialization.Container(file_name)
+    assert container.keys() == ["data", "other"]
+    part = container.get("data", columns=["ratio", "year_start"])
+    assert list(part.columns) == ["year_start", "ratio"]  # a mentett sorrendben
+    pd.testing.assert_frame_equal(part, df[["year_start", "ratio"]])
+    assert len(container.arrays) == 3  # csak a két oszlop és az index tömbje került megnyitásra
+
+    np.testing.assert_array_equal(serialization.load(file_name, key="other"), np.arange(1000))
+    with pytest.raises(KeyError):
+        serialization.load(file_name, key="missing")
+
+
+def test_unsupported_types_leave_old_file(file_name):
+    serialization.save([1, 2], file_name)
+    with pytest.raises(TypeError):
+        serialization.save({"bad": object()}, file_name)
+    with pytest.raises(TypeError):
+        serialization.save(pd.DataFrame({"a": [1]}, index=pd.MultiIndex.from_tuples([(1, 2)])), file_name)
+    assert serialization.load(file_name) == [1, 2]
+
+
+def test_corrupted_array_detected(file_name):
+    serialization.save({"values": np.arange(100, dtype=np.int64)}, file_name)
+    offset = serialization.Container(file_name).buffers[0]["offset"]
+    with open(file_name, "r+b") as f:
+        f.seek(offset + 10)
+        f.write(b"\xff")
+    container = serialization.Container(file_name)  # a leíró ép, a tömb csak használatkor ellenőrződik
+    with pytest.raises(ValueError, match="ellenőrzőösszeg"):
+        container["values"]
+    serialization.load(file_name, verify=False)  # ellenőrzés nélkül betölthető
+
+
+@pytest.mark.parametrize("cut", [1, 20, 200])
+def test_truncated_file_detected(file_name, cut):
+    serialization.save({"values": np.arange(100), "text": "szöveg"}, file_name)
+    size = os.path.getsize(file_name)
+    with open(file_name, "r+b") as f:
+        f.truncate(size - cut)
+    with pytest.raises(ValueError):
+        serialization.load(file_name)
+
+
+def test_corrupted_manifest_detected(file_name):
+    serialization.save({"values": np.arange(10)}, file_name)
+    size = os.path.getsize(file_name)
+    with open(file_name, "r+b") as f:
+        f.seek(size - serialization.FOOTER.size - 5)
+        f.write(b"#")
+    with pytest.raises(ValueError, match="ellenőrzőösszeg"):
+        serialization.load(file_name)
+
+
+def test_ksh_data_content_helpers(tmp_path):
+    name = str(tmp_path / "school.models")
+    assert ksh_data.load_content(name) is None  # nincs még mentés
+    coefficients = pd.DataFrame({"intercept": [1.0], "slope": [2.0]}, index=pd.Index(["students"], name="column"))
+    ksh_data.save_content({"coefficients": coefficients, "predictions": coefficients * 2}, name)
+    pd.testing.assert_frame_equal(ksh_data.load_content(name, key="coefficients"), coefficients)
+    pd.testing.assert_frame_equal(ksh_data.load_content(name, key="predictions", columns=["slope"]),
+                                  coefficients[["slope"]] * 2)
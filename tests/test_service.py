@@ -0,0 +1,138 @@
+"""
+A service modul tesztje egy véletlen porton elindított szolgáltatással: a meleg /predict kérések ideje,
+a diagramok közös rajzolása és az adatok háttérbeli frissítése
+"""
+import asyncio
+import json
+import statistics
+import time
+
+import pytest
+
+import main
+import service
+from test_ksh_data import write_raw_csv
+
+PREDICT_TARGET_SECONDS = 0.010  # a meleg /predict kérések mediánjának célértéke
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, path: str) -> tuple[int, bytes]:
+    """
+    Egy GET kérés egy nyitott (keep-alive) kapcsolaton
+    :return: (státuszkód, tartalom) pár
+    """
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, await reader.readexactly(int(headers["content-length"]))
+
+
+async def get(port: int, path: str) -> tuple[int, bytes]:
+    """
+    Egy kérés egy új kapcsolaton
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        return await request(reader, writer, path)
+    finally:
+        writer.close()
+
+
+@pytest.fixture
+def raw_source(tmp_path, monkeypatch):
+    """
+    A letöltés helyett egy helyi nyers csv, a gyorsítótár a teszt könyvtárában készül
+    :return: a nyers csv neve, a tartalma a teszt közben cserélhető
+    """
+    monkeypatch.chdir(tmp_path)
+    raw_name = str(tmp_path / "raw.csv")
+    write_raw_csv(raw_name, 30)
+    monkeypatch.setattr(main, "download_raw_content", lambda: open(raw_name, encoding="utf-8").read())
+    return raw_name
+
+
+def run_service(check, **options) -> None:
+    """
+    A szolgáltatás elindítása egy véletlen porton, a check(service, port) korutin futtatása, majd leállítás
+    """
+    async def scenario():
+        instance = service.Service(workers=1, **options)
+        server = await instance.start("127.0.0.1", 0)
+        try:
+            async with server:
+                await check(instance, server.sockets[0].getsockname()[1])
+        finally:
+            instance.close()
+
+    asyncio.run(scenario())
+
+
+def test_warm_predict_latency(raw_source):
+    async def check(instance, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        path = "/predict?start=2020&end=2035&columns=number_of_students,number_of_teachers"
+        status, body = await request(reader, writer, path)  # hideg kérés, a válasz a gyorsítótárba kerül
+        assert status == 200
+        predicted = json.loads(body)
+        assert predicted["year_start"] == list(range(2020, 2036))
+        assert set(predicted) == {"year_start", "number_of_students", "number_of_teachers"}
+        durations = []
+        for _ in range(200):
+            start = time.perf_counter()
+            assert await request(reader, writer, path) == (200, body)
+            durations.append(time.perf_counter() - start)
+        writer.close()
+        assert statistics.median(durations) < PREDICT_TARGET_SECONDS
+        assert (await get(port, "/predict?start=2030&end=2020"))[0] == 400
+        assert (await get(port, "/predict?columns=unknown"))[0] == 400
+
+    run_service(check)
+
+
+def test_concurrent_chart_requests_share_one_render(raw_source):
+    async def check(instance, port):
+        submits = []
+        submit = instance.executor.submit
+        instance.executor.submit = lambda *args, **kwargs: submits.append(args[1:]) or submit(*args, **kwargs)
+        names = json.loads((await get(port, "/charts"))[1])
+        responses = await asyncio.gather(*(get(port, f"/charts/{names[0]}.png") for _ in range(4)))
+        assert len(submits) == 1  # négy egyidejű kérés, egy rajzolás
+        assert all(status == 200 and body == responses[0][1] for status, body in responses)
+        assert responses[0][1].startswith(b"\x89PNG")
+        await get(port, f"/charts/{names[0]}.png")
+        assert len(submits) == 1  # a kész kép az állapothoz megmarad
+        assert (await get(port, "/charts/unknown.png"))[0] == 404
+
+    run_service(check)
+
+
+def test_refresh_source_reloads_new_rows(raw_source, monkeypatch):
+    async def wait_for_rows(port, rows, timeout=20.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            health = json.loads((await get(port, "/health"))[1])
+            if health["rows"] == rows:
+                return health
+            await asyncio.sleep(0.05)
+        raise AssertionError(f"A szolgáltatás nem töltötte be a {rows} sort.")
+
+    async def check(instance, port):
+        await wait_for_rows(port, 30)
+        before = (await get(port, "/predict?start=2030&end=2030"))[1]
+        # sikertelen letöltés: a frissítés naplóz, a szolgáltatás a régi állapottal fut tovább
+        monkeypatch.setattr(main, "download_raw_content", lambda: exit(1))
+        await asyncio.sleep(0.3)
+        assert (await get(port, "/health"))[0] == 200
+        write_raw_csv(raw_source, 36)  # hat új tanév
+        monkeypatch.setattr(main, "download_raw_content", lambda: open(raw_source, encoding="utf-8").read())
+        state = instance.state
+        await wait_for_rows(port, 36)
+        assert instance.state is not state and instance.pngs == {}
+        after = (await get(port, "/predict?start=2030&end=2030"))[1]
+        assert after != before  # az új állapot előrejelzése, nem a régi gyorsítótárazott válasz
+
+    run_service(check, poll=0.05, refresh=0.05)